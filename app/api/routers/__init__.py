@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routers import auth, users, shifts, violence_detection, notifications
+from app.api.routers import auth, users, shifts, violence_detection, detection_jobs, notifications, streams
 
 router = APIRouter()
 
@@ -8,4 +8,6 @@ router.include_router(auth.router, prefix="/auth", tags=["Auth"])
 router.include_router(users.router, prefix="/users", tags=["Users"])
 router.include_router(shifts.router, prefix="/shifts", tags=["Shifts"])
 router.include_router(violence_detection.router, prefix="/detect", tags=['Violence'])
+router.include_router(detection_jobs.router, prefix="/detect/jobs", tags=['Violence'])
+router.include_router(streams.router, prefix="/detect/streams", tags=['Violence'])
 router.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
\ No newline at end of file
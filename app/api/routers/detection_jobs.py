@@ -0,0 +1,55 @@
+import os
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlmodel import Session
+
+from app.api.dependencies import CurrentUserDep
+from app.api.routers.violence_detection import detection_options_from_form, upload_request_body
+from app.api.services.auth_service import CurrentUserToken
+from app.api.services.detection_job_service import DetectionJobService
+from app.core.config import settings
+from app.core.database import get_session
+from app.schemas.detection_job import DetectionJobResponse, DetectionJobsResponse, DetectionJobResultsResponse
+from app.utils.uploads import receive_upload
+
+router = APIRouter()
+
+
+@router.post("/", response_model=DetectionJobResponse, status_code=202, openapi_extra=upload_request_body())
+async def create_detection_job(current_user: CurrentUserDep, token: CurrentUserToken, request: Request,
+                               db: Session = Depends(get_session)):
+    """
+    Queue a video for background detection and return the job straight away.
+
+    Poll `GET /detect/jobs/{job_id}` for progress and `GET /detect/jobs/{job_id}/results` for per-frame results.
+    """
+    # Jobs outlive the request (and possibly the process), so the video goes to persistent storage
+    upload = await receive_upload(request, directory=settings.VIDEO_JOB_DIR)
+    try:
+        if not upload.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail="File must be a video")
+        options = detection_options_from_form(upload.fields)
+        return await DetectionJobService.create_job(upload, options, db, current_user.id)
+    except Exception:
+        os.unlink(upload.path)
+        raise
+
+
+@router.get("/", response_model=DetectionJobsResponse, status_code=200)
+async def read_detection_jobs(current_user: CurrentUserDep, token: CurrentUserToken, db: Session = Depends(get_session)):
+    return await DetectionJobService.get_jobs(db, current_user.id)
+
+
+@router.get("/{job_id}", response_model=DetectionJobResponse, status_code=200)
+async def read_detection_job(job_id: uuid.UUID, current_user: CurrentUserDep, token: CurrentUserToken,
+                             db: Session = Depends(get_session)):
+    return await DetectionJobService.get_job(job_id, db, current_user.id)
+
+
+@router.get("/{job_id}/results", response_model=DetectionJobResultsResponse, status_code=200)
+async def read_detection_job_results(job_id: uuid.UUID, current_user: CurrentUserDep, token: CurrentUserToken,
+                                     offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                                     db: Session = Depends(get_session)):
+    """Return the per-frame results available so far (partial while the job is running)."""
+    return await DetectionJobService.get_job_results(job_id, db, current_user.id, offset, limit)
@@ -1,21 +1,119 @@
+import json
+from contextlib import aclosing
+from typing import AsyncIterator
 from uuid import UUID
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.params import Depends
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
-from app.api.dependencies import CurrentUserDep
+from app.api.dependencies import CurrentUserDep, get_current_user
 from app.api.services.auth_service import CurrentUserToken
+from app.api.services.notification_hub import decode_cursor
 from app.api.services.notification_service import NotificationService
-from app.core.database import get_session
+from app.constants.messages import MESSAGE
+from app.core.database import engine, get_session
+from app.core.exceptions import AppException
+from app.models.user import User
 from app.schemas.notification import NotificationsResponse, NotificationResponse, NotificationDeleteResponse
+from app.utils.helpers import extract_bearer_token
 
 router = APIRouter()
 
 
 @router.get("/", response_model=NotificationsResponse, status_code=200)
-async def get_notifications(current_user: CurrentUserDep, token: CurrentUserToken, db: Session = Depends(get_session)):
-    return await NotificationService.get_notifications(current_user.id, db)
+async def get_notifications(current_user: CurrentUserDep, token: CurrentUserToken,
+                            since: str | None = Query(None), limit: int | None = Query(None, ge=1, le=1000),
+                            db: Session = Depends(get_session)):
+    """
+    List your notifications, oldest first.
+
+    - **since**: Only return notifications after this cursor (the `cursor` of the last
+      notification you have, or of the previous response)
+    - **limit**: Return at most this many
+    """
+    return await NotificationService.get_notifications(current_user.id, db, since, limit)
+
+
+async def _authenticate(authorization: str | None, token: str | None) -> User:
+    """
+    Resolve the user of a push connection.
+
+    Browsers can't set headers on EventSource or WebSocket connections, so the access token
+    may come as a `token` query parameter instead of the Authorization header.
+    """
+    if authorization:
+        token = extract_bearer_token(authorization)
+    with Session(engine) as db:
+        return await get_current_user(token or "", db)
+
+
+def _valid_cursor(cursor: str | None) -> str | None:
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise AppException(MESSAGE.INVALID_CURSOR, 400)
+    return cursor or None
+
+
+@router.get("/stream", status_code=200)
+async def stream_notifications(request: Request, since: str | None = Query(None), token: str | None = Query(None),
+                               last_event_id: str | None = Header(None)):
+    """
+    Receive notifications as they are created, as Server-Sent Events.
+
+    Each `notification` event carries the notification and has its cursor as event id, so a
+    reconnecting EventSource sends it back as `Last-Event-ID` and gets what it missed. The
+    catch-up may repeat notifications from the last few seconds before the cursor, so clients
+    should ignore ids they already have. **since** does the same for the first connection.
+    Comments are sent as keep-alives.
+    """
+    user = await _authenticate(request.headers.get("Authorization"), token)
+    since = _valid_cursor(last_event_id or since)
+
+    async def events() -> AsyncIterator[str]:
+        # Closed explicitly so a dropped client unsubscribes straight away
+        async with aclosing(NotificationService.feed(user.id, since)) as feed:
+            async for payload in feed:
+                if payload is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"id: {payload['cursor']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/ws")
+async def notifications_websocket(websocket: WebSocket, since: str | None = Query(None),
+                                  token: str | None = Query(None)):
+    """
+    Receive notifications as they are created over a WebSocket.
+
+    Messages are `{"event": "notification", "data": {...}}` (the notification, including its
+    `cursor`) or `{"event": "ping"}` keep-alives. Reconnect with `?since=<last cursor>` to
+    get what was missed first (ignoring ids already received, as for the event stream).
+    """
+    try:
+        user = await _authenticate(websocket.headers.get("Authorization"), token)
+        since = _valid_cursor(since)
+    except (HTTPException, AppException) as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION,
+                              reason=str(e.detail if isinstance(e, HTTPException) else e.message))
+        return
+
+    await websocket.accept()
+    try:
+        async with aclosing(NotificationService.feed(user.id, since)) as feed:
+            async for payload in feed:
+                if payload is None:
+                    await websocket.send_json({"event": "ping"})
+                else:
+                    await websocket.send_json({"event": "notification", "data": payload})
+    except WebSocketDisconnect:
+        pass
 
 
 @router.get("/{notification_id}", response_model=NotificationResponse, status_code=200)
@@ -0,0 +1,63 @@
+import uuid
+
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+
+from app.api.dependencies import CurrentUserDep
+from app.api.services.auth_service import CurrentUserToken
+from app.api.services.stream_monitor_service import StreamMonitorService
+from app.constants.messages import MESSAGE
+from app.constants.user_roles import UserRoleEnum
+from app.core.database import get_session
+from app.core.exceptions import ForbiddenException
+from app.schemas.stream import StreamCreate, StreamUpdate, StreamResponse, StreamsResponse, StreamDeleteResponse
+
+router = APIRouter()
+
+
+def _require_admin(current_user: CurrentUserDep):
+    if current_user.role != UserRoleEnum.ADMIN:
+        raise ForbiddenException(MESSAGE.ADMIN_ONLY)
+
+
+@router.post("/", response_model=StreamResponse, status_code=201)
+async def create_stream(data: StreamCreate, current_user: CurrentUserDep, token: CurrentUserToken,
+                        db: Session = Depends(get_session)):
+    """
+    Start monitoring a live feed.
+
+    - **url**: `rtsp://`, `http(s)://` (MJPEG/HLS) URL of the camera. Where the server allows
+      local sources, a video file path (set **loop** to replay it endlessly) or a device index
+    - **options**: Detection options, as for `/detect/video`
+
+    Sampled frames are run through the model continuously; a notification is created when an
+    incident starts. Per-stream FPS, lag and drop counters are reported under `stats`.
+    """
+    _require_admin(current_user)
+    return await StreamMonitorService.create_stream(data, db, current_user.id)
+
+
+@router.get("/", response_model=StreamsResponse, status_code=200)
+async def read_streams(current_user: CurrentUserDep, token: CurrentUserToken, db: Session = Depends(get_session)):
+    return await StreamMonitorService.get_streams(db)
+
+
+@router.get("/{stream_id}", response_model=StreamResponse, status_code=200)
+async def read_stream(stream_id: uuid.UUID, current_user: CurrentUserDep, token: CurrentUserToken,
+                      db: Session = Depends(get_session)):
+    return await StreamMonitorService.get_stream(stream_id, db)
+
+
+@router.patch("/{stream_id}", response_model=StreamResponse, status_code=200)
+async def update_stream(stream_id: uuid.UUID, data: StreamUpdate, current_user: CurrentUserDep,
+                        token: CurrentUserToken, db: Session = Depends(get_session)):
+    """Pause (`is_active: false`) or resume monitoring a stream."""
+    _require_admin(current_user)
+    return await StreamMonitorService.update_stream(stream_id, data, db)
+
+
+@router.delete("/{stream_id}", response_model=StreamDeleteResponse, status_code=200)
+async def delete_stream(stream_id: uuid.UUID, current_user: CurrentUserDep, token: CurrentUserToken,
+                        db: Session = Depends(get_session)):
+    _require_admin(current_user)
+    return await StreamMonitorService.delete_stream(stream_id, db)
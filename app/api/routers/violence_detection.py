@@ -1,92 +1,387 @@
+import asyncio
+import hashlib
+import json
 import os
-import tempfile
-from typing import Any
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal
 
-import cv2
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Header, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from starlette.types import Receive, Scope, Send
 
+from app.api.dependencies import CurrentUserDep
 from app.api.services.auth_service import CurrentUserToken
+from app.api.services.image_batch_service import detect_images, read_items
+from app.api.services.micro_batcher import image_batcher
+from app.api.services.model_resolver import reloadable_model_path
+from app.api.services.notification_dispatcher import notification_dispatcher
+from app.api.services.notification_hub import notification_hub
 from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.constants.messages import MESSAGE
+from app.constants.user_roles import UserRoleEnum
+from app.core.config import settings
+from app.core.cpu_resources import cpu_resources
+from app.core.exceptions import AppException, ForbiddenException
+from app.core.inference_executor import inference_executor
+from app.core.result_cache import result_cache
+from app.schemas.detection import DetectionOptions, VideoOutput
+from app.utils.columnar import (JSON_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, encode_json, encode_msgpack,
+                                negotiate_media_type, to_columnar)
+from app.utils.uploads import receive_upload
 
 router = APIRouter()
 
 
-def get_service():
-    """Dependency to get the YOLOv8 detection service."""
-    return ViolenceDetectionService()
+def get_detection_options(
+        confidence: float = Form(0.25, ge=0.0, le=1.0),
+        frame_stride: int = Form(10, ge=1),
+        sample_fps: float | None = Form(None, gt=0),
+        sample_interval_seconds: float | None = Form(None, gt=0),
+        adaptive_sampling: bool = Form(False),
+        tracking: bool = Form(False),
+        track_fill_stride: int | None = Form(None, ge=1),
+        input_size: int = Form(320, ge=32, le=1280),
+        batch_size: int = Form(4, ge=1, le=64),
+        max_detections: int = Form(300, ge=1, le=1000),
+) -> DetectionOptions:
+    """Dependency building the immutable per-request detection options from the form fields."""
+    return DetectionOptions(confidence=confidence, frame_stride=frame_stride, sample_fps=sample_fps,
+                            sample_interval_seconds=sample_interval_seconds,
+                            adaptive_sampling=adaptive_sampling, tracking=tracking,
+                            track_fill_stride=track_fill_stride, input_size=input_size,
+                            batch_size=batch_size, max_detections=max_detections)
 
 
-@router.post("/video", response_model=dict[str, list[dict[str, Any]]], status_code=200)
-async def detect_violence_from_video(token: CurrentUserToken, file: UploadFile = File(...), confidence: float | None = Form(0.25),
-                                     service: ViolenceDetectionService = Depends(get_service)):
+def _form_errors(error: ValidationError, prefix: tuple = ()) -> RequestValidationError:
+    return RequestValidationError([{**e, "loc": ("body", *prefix, *e["loc"])} for e in error.errors(include_url=False)])
+
+
+def detection_options_from_form(fields: dict[str, str]) -> DetectionOptions:
+    """
+    DetectionOptions from the form fields of a streamed upload, validated like
+    get_detection_options (a 422 for bad values).
+    """
+    try:
+        # Empty fields mean "not set", as with regular form parameters
+        return DetectionOptions.model_validate({name: value for name, value in fields.items()
+                                                if name in DetectionOptions.model_fields and value != ""})
+    except ValidationError as e:
+        raise _form_errors(e)
+
+
+def form_field(fields: dict[str, str], name: str, annotation: Any, default: Any) -> Any:
+    """A single validated form field of a streamed upload."""
+    if fields.get(name, "") == "":
+        return default
+    try:
+        return TypeAdapter(annotation).validate_python(fields[name])
+    except ValidationError as e:
+        raise _form_errors(e, (name,))
+
+
+def upload_request_body(**properties: dict[str, Any]) -> dict[str, Any]:
+    """
+    OpenAPI request body of an endpoint that parses its own multipart upload (so FastAPI
+    doesn't spool it first): the `file`, the detection option fields and `properties`.
+    """
+    schema_properties = {"file": {"type": "string", "format": "binary"},
+                         **DetectionOptions.model_json_schema()["properties"], **properties}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {
+        "schema": {"type": "object", "required": ["file"], "properties": schema_properties}}}}}
+
+
+# Video metadata that describes one run rather than the analysis; never served from the cache
+_RUN_METADATA = ("timings", "file_size_mb", "cached")
+
+_OUTPUT_PROPERTY = {"output": {"type": "string", "enum": ["frames", "incidents", "both"], "default": "frames"}}
+
+
+def _cache_key(kind: str, content_hash: str, options: DetectionOptions, **extra: Any) -> str | None:
+    """Result cache key for this content, or None when caching is off or no model is loaded to key on."""
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    info = inference_executor.model_info()
+    if not info["loaded"]:
+        return None
+    model = f"{info['sha256'] or info['model_path']}:{info['backend']}"
+    return result_cache.make_key(kind, content_hash, model, options, **extra)
+
+
+@router.post("/video", response_model=dict[str, Any], status_code=200,
+             openapi_extra=upload_request_body(**_OUTPUT_PROPERTY))
+async def detect_violence_from_video(token: CurrentUserToken, request: Request, response: Response,
+                                     accept: str | None = Header(None)):
     """
        Detect violence/crime in a video file.
 
        - **file**: The video file to analyze
        - **confidence**: Optional confidence threshold (default: 0.25)
+       - **frame_stride**: Process every Nth frame (default: 10)
+       - **sample_fps**: Sample this many frames per second of video instead of using frame_stride
+       - **sample_interval_seconds**: Sample one frame every this many seconds of video instead
+       - **adaptive_sampling**: Skip static frames and sample densely during motion (default: false)
+       - **tracking**: Give detections stable `track_id`s across frames and report per-track durations
+       - **track_fill_stride**: With tracking, add tracked boxes every Nth frame between inferred frames
+       - **input_size**: Side length frames are resized to before inference (default: 320)
+       - **batch_size**: Frames per forward pass (default: 4)
+       - **max_detections**: Maximum detections kept per frame (default: 300)
+       - **output**: `frames` (per-frame results), `incidents` (consecutive hits merged into
+         time-ranged incidents) or `both` (default: frames)
 
-       Returns a list of results for processed frames.
+       Returns a list of results for processed frames. Clients can opt into a columnar layout
+       (parallel arrays plus one shared metadata header) with `Accept: application/vnd.columnar+json`
+       for compact JSON or `Accept: application/msgpack` for MessagePack. Re-submitting the same
+       video with the same options is answered from the result cache (`X-Cache: HIT`); its
+       `metadata.cached` is true and `metadata.timings` only covers the cache lookup.
     """
-    # Validate file type
-    if not file.content_type.startswith('video/'):
-        raise HTTPException(status_code=400, detail="File must be a video")
-
-    # Update confidence threshold if provided
-    service.confidence_threshold = confidence
-
-    # Save the uploaded file temporarily
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    # Stream the request body straight to a temporary file, hashing the video on the way
+    upload = await receive_upload(request, hash_content=True)
+    video_path = upload.path
     try:
-        contents = await file.read()
-        with open(temp_file.name, 'wb') as f:
-            f.write(contents)
-
-        # Get video info
-        cap = cv2.VideoCapture(temp_file.name)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.release()
-
-        # Process the video
-        results = service.process_video(temp_file.name)
-
-        print('results', results)
-        return {"results": results, "metadata": {
-            "total_frames": total_frames,
-            "processed_frames": len(results),
-            "file_size_mb": round(os.path.getsize(temp_file.name) / (1024 * 1024), 2)
-        }}
+        # Validate file type
+        if not upload.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail="File must be a video")
+        options = detection_options_from_form(upload.fields)
+        output = form_field(upload.fields, "output", VideoOutput, "frames")
+
+        started = time.perf_counter()
+        cache_key = _cache_key("video", upload.sha256, options, output=output)
+        analysis = await result_cache.get(cache_key) if cache_key else None
+        cache_status = "HIT" if analysis is not None else "MISS"
+        if analysis is None:
+            # Process the video on the inference pool so the event loop stays free
+            analysis = await inference_executor.run("analyze_video", video_path, options, output)
+            if cache_key:
+                metadata = {key: value for key, value in analysis["metadata"].items() if key not in _RUN_METADATA}
+                await result_cache.put("video", cache_key, {**analysis, "metadata": metadata})
+        else:
+            # What this request spent, not the timings of the run that filled the cache
+            analysis["metadata"]["timings"] = {"cache_lookup": round(time.perf_counter() - started, 4)}
+        analysis["metadata"]["file_size_mb"] = round(upload.size / (1024 * 1024), 2)
+        analysis["metadata"]["cached"] = cache_status == "HIT"
     finally:
         # Clean up the temp file
-        temp_file.close()
-        os.unlink(temp_file.name)
+        os.unlink(video_path)
+
+    media_type = negotiate_media_type(accept)
+    if media_type == JSON_MEDIA_TYPE:
+        response.headers["X-Cache"] = cache_status
+        return analysis
+
+    columnar = to_columnar(analysis.get("results", []), analysis["metadata"])
+    for key in ("incidents", "tracks"):
+        if key in analysis:
+            columnar[key] = analysis[key]
+    encode = encode_json if media_type == COLUMNAR_JSON_MEDIA_TYPE else encode_msgpack
+    return Response(content=encode(columnar), media_type=media_type, headers={"Vary": "Accept", "X-Cache": cache_status})
+
+
+class _CleanupStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always runs `cleanup` once it is done, including when the client
+    went away before the body was iterated and the body generator's own `finally` never ran.
+    """
+
+    def __init__(self, content: AsyncIterator[str], cleanup: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self._cleanup = cleanup
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._cleanup()
+
+
+def _encode_stream_event(stream_format: str, event: str, data: dict[str, Any]) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    # NDJSON: frame results as-is, anything else wrapped under its event name
+    return json.dumps(data if event == "frame" else {event: data}) + "\n"
+
+
+@router.post("/video/stream", status_code=200, openapi_extra=upload_request_body(
+    format={"type": "string", "enum": ["ndjson", "sse"], "default": "ndjson"}, **_OUTPUT_PROPERTY))
+async def stream_violence_from_video(token: CurrentUserToken, request: Request):
+    """
+    Detect violence/crime in a video file, streaming frame results as each batch is processed.
+
+    - **file**: The video file to analyze
+    - **format**: `ndjson` (one JSON object per line) or `sse` (Server-Sent Events)
+    - **output**: `frames`, `incidents` (an `incident` message as each one ends) or `both`
+
+    Accepts the same tuning fields as `/detect/video`. The first message describes the video,
+    the last one carries the processing metadata.
+    """
+    upload = await receive_upload(request)
+    video_path = upload.path
+    try:
+        if not upload.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail="File must be a video")
+        options = detection_options_from_form(upload.fields)
+        stream_format = form_field(upload.fields, "format", Literal["ndjson", "sse"], "ndjson")
+        output = form_field(upload.fields, "output", VideoOutput, "frames")
+        # Reserve an inference slot before the response starts so overload can still be a 503
+        items = inference_executor.stream("stream_video", video_path, options, output)
+    except Exception:
+        os.unlink(video_path)
+        raise
+
+    async def events() -> AsyncIterator[str]:
+        metadata: dict[str, Any] = {}
+        timings: dict[str, Any] = {}
+        tracks: list[dict[str, Any]] | None = None
+        frames_decoded = 0
+        processed_frames = 0
+        try:
+            async for kind, payload in items:
+                if kind == "metadata":
+                    metadata = payload
+                    yield _encode_stream_event(stream_format, "video", payload)
+                    continue
+                if kind == "timings":
+                    timings = payload
+                    continue
+                if kind == "tracks":
+                    tracks = payload
+                    continue
+                if kind == "incidents":
+                    for incident in payload:
+                        yield _encode_stream_event(stream_format, "incident", incident)
+                    continue
+                frames_decoded, batch_results = payload
+                processed_frames += len(batch_results)
+                if output == "incidents":
+                    continue
+                for result in batch_results:
+                    yield _encode_stream_event(stream_format, "frame", result)
+            yield _encode_stream_event(stream_format, "metadata", {
+                **metadata,
+                "total_frames": max(metadata.get("total_frames", 0), frames_decoded),
+                "processed_frames": processed_frames,
+                "file_size_mb": round(upload.size / (1024 * 1024), 2),
+                "timings": timings,
+                **({"tracks": tracks} if tracks is not None else {}),
+            })
+        except Exception as e:
+            yield _encode_stream_event(stream_format, "error", {"error": str(e)})
+
+    body = events()
+
+    async def cleanup():
+        # Frees the inference slot and the upload whether or not the body was ever iterated
+        try:
+            await body.aclose()
+            await items.aclose()
+        finally:
+            os.unlink(video_path)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return _CleanupStreamingResponse(body, cleanup, media_type=media_type,
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.post("/image", response_model=dict[str, Any], status_code=200)
 async def detect_from_image(
+        response: Response,
         file: UploadFile = File(...),
-        confidence: float | None = Form(0.25),
-        service: ViolenceDetectionService = Depends(get_service)
+        options: DetectionOptions = Depends(get_detection_options),
 ):
     """
     Detect violence/crime in an image.
 
     - **file**: The image file to analyze
     - **confidence**: Optional confidence threshold (default: 0.25)
+    - **input_size**: Side length the image is resized to before inference (default: 320)
+    - **max_detections**: Maximum detections kept (default: 300)
 
-    Returns detection results for the image.
+    Returns detection results for the image. Re-submitting the same image with the same
+    options is answered from the result cache (`X-Cache: HIT`).
     """
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
 
-    # Update confidence threshold if provided
-    service.confidence_threshold = confidence
-
     # Read the image file
     contents = await file.read()
-    result = service.detect_from_image(contents)
+    cache_key = _cache_key("image", hashlib.sha256(contents).hexdigest(), options)
+    if cache_key and (cached := await result_cache.get(cache_key)) is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+
+    if settings.IMAGE_BATCHING_ENABLED:
+        # Decode here and let the batcher share one forward pass with other concurrent requests
+        image = await asyncio.to_thread(ViolenceDetectionService.decode_image, contents)
+        if image is None:
+            raise HTTPException(status_code=400, detail="Could not decode image")
+        result = await image_batcher.detect(image, options)
+    else:
+        result = await inference_executor.run("detect_from_image", contents, options)
 
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
 
+    if cache_key:
+        await result_cache.put("image", cache_key, result)
+        response.headers["X-Cache"] = "MISS"
     return result
+
+
+@router.post("/images", response_model=dict[str, Any], status_code=200)
+async def detect_from_images(
+        token: CurrentUserToken,
+        files: list[UploadFile] = File(...),
+        options: DetectionOptions = Depends(get_detection_options),
+):
+    """
+    Detect violence/crime in many images at once.
+
+    - **files**: Images to analyze; zip archives of images are expanded
+    - **confidence**, **input_size**, **max_detections**: as for `/detect/image`, applied to every image
+
+    Returns `results` keyed by filename (`archive.zip/path/in/archive.jpg` for zipped images,
+    with `#2`, `#3`, ... appended to repeated names) plus a `summary`. An image that can't be
+    decoded or processed gets an `error` entry instead of failing the whole request.
+    """
+    items = await read_items(files)
+    return await detect_images(items, options, lambda content_hash: _cache_key("image", content_hash, options))
+
+
+@router.get("/metrics", response_model=dict[str, Any], status_code=200)
+async def get_metrics(token: CurrentUserToken):
+    """Return runtime metrics of the detection pipeline."""
+    return {"inference_executor": inference_executor.stats(), "image_batcher": image_batcher.stats(),
+            "result_cache": result_cache.stats(), "cpu": cpu_resources.stats(),
+            "notifications": notification_dispatcher.stats(), "notification_push": notification_hub.stats()}
+
+
+@router.get("/model", response_model=dict[str, Any], status_code=200)
+async def get_model_info(token: CurrentUserToken):
+    """Return information about the currently loaded detection model."""
+    return inference_executor.model_info()
+
+
+@router.post("/model/reload", response_model=dict[str, Any], status_code=200)
+async def reload_model(current_user: CurrentUserDep, token: CurrentUserToken, model_path: str | None = Form(None)):
+    """
+    Hot-swap the detection model. Requests already running keep using the previous model.
+
+    - **model_path**: Optional path to the new weights inside `MODEL_RELOAD_DIR`, absolute or
+      relative to it (defaults to the configured source)
+    """
+    if current_user.role != UserRoleEnum.ADMIN:
+        raise ForbiddenException(MESSAGE.ADMIN_ONLY)
+    if model_path:
+        # Loading weights runs pickle, so only files an operator placed there are accepted
+        model_path = reloadable_model_path(model_path)
+        if model_path is None:
+            raise ForbiddenException(MESSAGE.MODEL_PATH_NOT_ALLOWED)
+
+    try:
+        info = await inference_executor.reload_model(model_path)
+    except RuntimeError as e:
+        # The weights couldn't be found or failed their checksum
+        raise AppException(str(e), 400)
+    return {"success": True, "message": MESSAGE.MODEL_RELOADED, "data": info}
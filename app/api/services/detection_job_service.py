@@ -0,0 +1,302 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import update
+from sqlmodel import Session, select, delete, func
+
+from app.constants.job_status import JobStatusEnum
+from app.constants.messages import MESSAGE
+from app.api.services.notification_dispatcher import DetectionAlert, notification_dispatcher
+from app.core.config import settings
+from app.core.database import engine
+from app.core.exceptions import NotFoundException
+from app.core.inference_executor import InferenceExecutorStopped, inference_executor
+from app.models.detection_job import DetectionJob, DetectionJobFrame
+from app.schemas.detection import DetectionOptions
+from app.schemas.detection_job import DetectionJobResponse, DetectionJobsResponse, DetectionJobResultsResponse
+from app.utils.uploads import StoredUpload
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionJobService:
+    @staticmethod
+    async def _find_by_id(job_id: uuid.UUID, db: Session, user_id: uuid.UUID) -> DetectionJob:
+        job = db.exec(select(DetectionJob).where(DetectionJob.id == job_id)).first()
+
+        if not job or job.user_id != user_id:
+            raise NotFoundException(message=MESSAGE.JOB_NOT_FOUND)
+
+        return job
+
+    @staticmethod
+    async def create_job(upload: StoredUpload, options: DetectionOptions, db: Session,
+                         user_id: uuid.UUID) -> DetectionJobResponse:
+        """Queue a job for a video already received into VIDEO_JOB_DIR."""
+        job = DetectionJob(user_id=user_id, filename=upload.filename, video_path=upload.path,
+                           options=options.model_dump())
+
+        # save to database
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        detection_job_worker.submit(job.id)
+        return DetectionJobResponse(data=job, message=MESSAGE.JOB_CREATED)
+
+    @staticmethod
+    async def get_jobs(db: Session, user_id: uuid.UUID) -> DetectionJobsResponse:
+        query = select(DetectionJob).where(DetectionJob.user_id == user_id).order_by(DetectionJob.created_at.desc())
+        results = db.exec(query).all()
+
+        return DetectionJobsResponse(data=results)
+
+    @staticmethod
+    async def get_job(job_id: uuid.UUID, db: Session, user_id: uuid.UUID) -> DetectionJobResponse:
+        job = await DetectionJobService._find_by_id(job_id, db, user_id)
+
+        return DetectionJobResponse(data=job)
+
+    @staticmethod
+    async def get_job_results(job_id: uuid.UUID, db: Session, user_id: uuid.UUID, offset: int = 0,
+                              limit: int = 100) -> DetectionJobResultsResponse:
+        """Return the per-frame results written so far, in frame order."""
+        job = await DetectionJobService._find_by_id(job_id, db, user_id)
+
+        total = db.exec(select(func.count()).select_from(DetectionJobFrame)
+                        .where(DetectionJobFrame.job_id == job_id)).one()
+        query = (select(DetectionJobFrame).where(DetectionJobFrame.job_id == job_id)
+                 .order_by(DetectionJobFrame.frame).offset(offset).limit(limit))
+        frames = db.exec(query).all()
+
+        return DetectionJobResultsResponse(status=job.status, data=[frame.result for frame in frames],
+                                           offset=offset, limit=limit, total=total)
+
+
+class _JobProgress:
+    """Accumulates results of a running job and writes them to the database in batches."""
+
+    def __init__(self, db: Session, job: DetectionJob):
+        self.db = db
+        self.job = job
+        self.incidents: list[dict[str, Any]] = []
+        self.pending: list[dict[str, Any]] = []
+        self.last_flush = time.monotonic()
+        self.summary = {"processed_frames": 0, "violent_frames": 0, "max_confidence": 0.0,
+                        "first_violent_frame": None, "last_violent_frame": None}
+
+    def update(self, frames_decoded: int, batch_results: list[dict[str, Any]]):
+        self.job.frames_decoded = frames_decoded
+        self.pending.extend(batch_results)
+        self._summarise(batch_results)
+        if time.monotonic() - self.last_flush >= settings.VIDEO_JOB_FLUSH_SECONDS:
+            self.flush()
+
+    def add_incidents(self, incidents: list[dict[str, Any]]):
+        self.incidents.extend(incidents)
+        for incident in incidents:
+            notification_dispatcher.publish(DetectionAlert(
+                key=f"job:{self.job.id}",
+                title=f"Violence detected in {self.job.filename or 'an uploaded video'}",
+                body=f"Confidence {incident['peak_confidence']:.2f} between "
+                     f"{_timestamp(incident['start_seconds'], incident['start_frame'])} and "
+                     f"{_timestamp(incident['end_seconds'], incident['end_frame'])}",
+                confidence=incident["peak_confidence"],
+                detected_at=datetime.now(),
+                owner_id=self.job.user_id,
+            ))
+
+    def _summarise(self, batch_results: list[dict[str, Any]]):
+        summary = self.summary
+        summary["processed_frames"] += len(batch_results)
+        for result in batch_results:
+            if not result.get("violence_detected"):
+                continue
+            summary["violent_frames"] += 1
+            summary["max_confidence"] = max(summary["max_confidence"], result["confidence"])
+            if summary["first_violent_frame"] is None:
+                summary["first_violent_frame"] = result["frame"]
+            summary["last_violent_frame"] = result["frame"]
+
+    def flush(self):
+        self.db.add_all(DetectionJobFrame(job_id=self.job.id, frame=result["frame"], result=result)
+                        for result in self.pending)
+        self.job.processed_frames += len(self.pending)
+        self.job.updated_at = datetime.now()
+        self.db.add(self.job)
+        self.db.commit()
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+
+class _JobHeartbeat:
+    """
+    Touches a running job's updated_at every third of VIDEO_JOB_STALE_SECONDS from its own
+    thread and session, so a job stuck on a slow decode or waiting for an inference slot
+    still looks alive to resume_pending; progress flushes alone can be far apart.
+    """
+
+    def __init__(self, job_id: uuid.UUID):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"detection-job-{job_id}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        while not self._stop.wait(settings.VIDEO_JOB_STALE_SECONDS / 3):
+            try:
+                with Session(engine) as db:
+                    db.exec(update(DetectionJob)
+                            .where((DetectionJob.id == self.job_id) & (DetectionJob.status == JobStatusEnum.RUNNING))
+                            .values(updated_at=datetime.now()))
+                    db.commit()
+            except Exception as e:
+                logger.error(f"Heartbeat of detection job {self.job_id} failed: {e}")
+
+
+def _timestamp(seconds: float | None, frame: int) -> str:
+    if seconds is None:
+        return f"frame {frame}"
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:04.1f}"
+
+
+class DetectionJobWorker:
+    """
+    Runs detection jobs on a small thread pool, outside of the request that created them.
+    Their inference goes through the shared inference executor.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool: ThreadPoolExecutor | None = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="detection-job")
+        self.resume_pending()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, job_id: uuid.UUID):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="detection-job")
+        self._pool.submit(self._run_safely, job_id)
+
+    def resume_pending(self):
+        """Re-queue jobs left behind by a previous run of the API."""
+        stale_before = datetime.now() - timedelta(seconds=settings.VIDEO_JOB_STALE_SECONDS)
+        with Session(engine) as db:
+            # Running jobs keep a heartbeat going, so those without one belonged to a process that died
+            db.exec(update(DetectionJob)
+                    .where((DetectionJob.status == JobStatusEnum.RUNNING) & (DetectionJob.updated_at < stale_before))
+                    .values(status=JobStatusEnum.PENDING, updated_at=datetime.now()))
+            db.commit()
+            job_ids = db.exec(select(DetectionJob.id).where(DetectionJob.status == JobStatusEnum.PENDING)).all()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} detection job(s)")
+
+    @staticmethod
+    def _claim(db: Session, job_id: uuid.UUID) -> bool:
+        """Atomically move a pending job to running so only one worker process picks it up."""
+        result = db.exec(update(DetectionJob)
+                         .where((DetectionJob.id == job_id) & (DetectionJob.status == JobStatusEnum.PENDING))
+                         .values(status=JobStatusEnum.RUNNING, updated_at=datetime.now()))
+        db.commit()
+        return result.rowcount == 1
+
+    def _run_safely(self, job_id: uuid.UUID):
+        try:
+            self._run(job_id)
+        except Exception as e:
+            logger.error(f"Detection job {job_id} crashed: {e}")
+
+    def _run(self, job_id: uuid.UUID):
+        with Session(engine) as db:
+            if not self._claim(db, job_id):
+                return
+            job = db.get(DetectionJob, job_id)
+            video_path = job.video_path
+
+            try:
+                with _JobHeartbeat(job_id):
+                    self._process(db, job)
+                job.status = JobStatusEnum.COMPLETED
+            except InferenceExecutorStopped:
+                # The API is shutting down; the next start picks the job up again
+                db.rollback()
+                job.status = JobStatusEnum.PENDING
+                job.updated_at = datetime.now()
+                db.add(job)
+                db.commit()
+                return
+            except Exception as e:
+                db.rollback()
+                job.status = JobStatusEnum.FAILED
+                job.error = str(e)
+
+            job.finished_at = datetime.now()
+            job.updated_at = job.finished_at
+            db.add(job)
+            db.commit()
+
+        if os.path.exists(video_path):
+            os.unlink(video_path)
+
+    @staticmethod
+    def _process(db: Session, job: DetectionJob):
+        """
+        Run the job's video on the inference executor, writing progress as it goes.
+
+        Inference shares the executor's workers and admission limit with requests, so jobs
+        don't oversubscribe the CPU; a job waits for a free slot instead of being rejected.
+        """
+        # A resumed job starts over, so drop whatever a previous attempt had written
+        db.exec(delete(DetectionJobFrame).where(DetectionJobFrame.job_id == job.id))
+        job.frames_decoded = 0
+        job.processed_frames = 0
+        db.add(job)
+        db.commit()
+
+        options = DetectionOptions(**job.options)
+        progress = _JobProgress(db, job)
+        summary: dict[str, Any] = {}
+        for kind, payload in inference_executor.stream_threadsafe("stream_video", job.video_path, options,
+                                                                  "incidents"):
+            if kind == "metadata":
+                job.total_frames = payload["total_frames"]
+            elif kind == "batch":
+                frames_decoded, batch_results = payload
+                if frames_decoded == 0 and batch_results and "error" in batch_results[0]:
+                    raise RuntimeError(batch_results[0]["error"])
+                progress.update(frames_decoded, batch_results)
+            elif kind == "incidents":
+                progress.add_incidents(payload)
+            else:
+                summary[kind] = payload  # "tracks" and "timings"
+
+        progress.flush()
+        job.frames_decoded = max(job.frames_decoded, job.total_frames)
+        job.summary = {**progress.summary, "incidents": progress.incidents, **summary}
+
+
+detection_job_worker = DetectionJobWorker(max_workers=settings.VIDEO_JOB_WORKERS)
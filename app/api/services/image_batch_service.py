@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import io
+import pathlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+from fastapi import UploadFile
+
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.core.config import settings
+from app.core.cpu_resources import available_cores, plan
+from app.core.exceptions import AppException, FileTooLargeException, ServiceOverloadedException
+from app.core.inference_executor import inference_executor
+from app.core.result_cache import result_cache
+from app.schemas.detection import DetectionOptions
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+# cv2.imdecode releases the GIL, so a plain thread pool decodes on all cores
+_decode_pool: ThreadPoolExecutor | None = None
+
+
+def _decoder() -> ThreadPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=settings.IMAGES_DECODE_WORKERS or len(available_cores()),
+                                          thread_name_prefix="image-decode")
+    return _decode_pool
+
+
+def chunk_size() -> int:
+    """Images per forward pass: IMAGES_CHUNK_SIZE, or two per inference thread of this host's CPU plan."""
+    return settings.IMAGES_CHUNK_SIZE or min(32, max(2, 2 * plan().intra_op_threads))
+
+
+@dataclass
+class BatchItem:
+    name: str
+    data: bytes | None = None
+    error: str | None = None
+    cache_key: str | None = None
+
+
+class _Budget:
+    """Caps the number of images and their total size across all files of one request."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, size: int):
+        self.files += 1
+        self.bytes += size
+        if self.files > settings.IMAGES_MAX_FILES:
+            raise AppException(f"Too many images, the limit is {settings.IMAGES_MAX_FILES}", 413)
+        if self.bytes > settings.UPLOAD_MAX_BYTES:
+            raise FileTooLargeException(settings.UPLOAD_MAX_BYTES)
+
+
+def _is_zip(file: UploadFile) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or pathlib.Path(file.filename or '').suffix.lower() == ".zip"
+
+
+def _unzip(name: str, data: bytes, budget: _Budget) -> list[BatchItem]:
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        return [BatchItem(name=name, error="Not a valid zip archive")]
+
+    items = []
+    with archive:
+        for member in archive.infolist():
+            path = pathlib.PurePosixPath(member.filename)
+            # Folders and the metadata archivers like to add aren't images anyone uploaded
+            if member.is_dir() or path.parts[0] == "__MACOSX" or path.name.startswith("."):
+                continue
+            member_name = f"{name}/{member.filename}"
+            if path.suffix.lower() not in IMAGE_SUFFIXES:
+                items.append(BatchItem(name=member_name, error="Not an image"))
+                continue
+            # Checked against the declared size before inflating anything
+            budget.add(member.file_size)
+            try:
+                items.append(BatchItem(name=member_name, data=archive.read(member)))
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                items.append(BatchItem(name=member_name, error=f"Could not extract: {e}"))
+    return items
+
+
+async def read_items(files: list[UploadFile]) -> list[BatchItem]:
+    """Read the uploaded images, expanding zip archives, into one flat list with unique names."""
+    budget = _Budget()
+    items: list[BatchItem] = []
+    for index, file in enumerate(files):
+        name = file.filename or f"file-{index}"
+        if _is_zip(file):
+            data = await file.read()
+            if len(data) > settings.UPLOAD_MAX_BYTES:
+                raise FileTooLargeException(settings.UPLOAD_MAX_BYTES)
+            items.extend(await asyncio.to_thread(_unzip, name, data, budget))
+            continue
+        if not (file.content_type or '').startswith('image/'):
+            items.append(BatchItem(name=name, error="File must be an image"))
+            continue
+        data = await file.read()
+        budget.add(len(data))
+        items.append(BatchItem(name=name, data=data))
+
+    # Results are keyed by name, so repeated names get a numbered suffix
+    seen: dict[str, int] = {}
+    for item in items:
+        count = seen.get(item.name, 0)
+        seen[item.name] = count + 1
+        if count:
+            item.name = f"{item.name}#{count + 1}"
+    return items
+
+
+async def _decode(items: list[BatchItem]) -> list[np.ndarray | None]:
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_decoder(), ViolenceDetectionService.decode_image, item.data)
+                                  for item in items))
+
+
+async def detect_images(items: list[BatchItem], options: DetectionOptions,
+                        cache_key: Callable[[str], str | None]) -> dict[str, Any]:
+    """
+    Detect on every item, returning results keyed by item name.
+
+    Cached results are answered straight away. The rest are decoded on the thread pool and run
+    through the model in chunks, decoding the next chunk while the current one is inferred. An
+    item that can't be read, decoded or inferred gets an `error` entry; the others are unaffected.
+    Only a 503 on the first chunk fails the request; after that the remaining items get errors.
+    """
+    results: dict[str, Any] = {item.name: {"error": item.error} for item in items if item.error}
+    pending = []
+    for item in items:
+        if item.error:
+            continue
+        item.cache_key = cache_key(hashlib.sha256(item.data).hexdigest())
+        cached = await result_cache.get(item.cache_key) if item.cache_key else None
+        if cached is not None:
+            results[item.name] = cached
+        else:
+            pending.append(item)
+
+    size = chunk_size()
+    chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+    decoding = asyncio.ensure_future(_decode(chunks[0])) if chunks else None
+    for index, chunk in enumerate(chunks):
+        images = await decoding
+        if index + 1 < len(chunks):
+            decoding = asyncio.ensure_future(_decode(chunks[index + 1]))
+
+        decoded = []
+        for item, image in zip(chunk, images):
+            item.data = None  # the encoded bytes aren't needed anymore
+            if image is None:
+                results[item.name] = {"error": "Could not decode image"}
+            else:
+                decoded.append((item, image))
+        if not decoded:
+            continue
+
+        try:
+            batch_results = await inference_executor.run("detect_batch", [image for _, image in decoded],
+                                                         [options] * len(decoded))
+        except ServiceOverloadedException as e:
+            if index + 1 < len(chunks):
+                decoding.cancel()
+            if index == 0:
+                # Nothing has run yet, so the whole request can be retried
+                raise
+            # Keep what the earlier chunks produced; the rest are reported like any other failure
+            for item in (item for later in chunks[index:] for item in later):
+                results.setdefault(item.name, {"error": e.message})
+            break
+        except Exception as e:
+            for item, _ in decoded:
+                results[item.name] = {"error": str(e)}
+            continue
+
+        for (item, _), result in zip(decoded, batch_results):
+            results[item.name] = result
+            if item.cache_key and "error" not in result:
+                await result_cache.put("image", item.cache_key, result)
+
+    ordered = {item.name: results[item.name] for item in items}
+    failed = sum(1 for result in ordered.values() if "error" in result)
+    return {
+        "results": ordered,
+        "summary": {
+            "images": len(ordered),
+            "succeeded": len(ordered) - failed,
+            "failed": failed,
+            "violent": sum(1 for result in ordered.values() if result.get("violence_detected")),
+            "chunk_size": size,
+        },
+    }
@@ -0,0 +1,110 @@
+from typing import Any, Iterable
+
+from app.core.config import settings
+
+
+class _OpenIncident:
+    def __init__(self, frame: int):
+        self.start_frame = frame
+        self.end_frame = frame
+        self.positive_frames = 0
+        self.peak_confidence = 0.0
+        self.peak_frame = frame
+        self.classes: dict[str, dict[str, Any]] = {}
+
+    def add(self, result: dict[str, Any]):
+        frame = result["frame"]
+        self.end_frame = frame
+        self.positive_frames += 1
+        if result["confidence"] > self.peak_confidence:
+            self.peak_confidence = result["confidence"]
+            self.peak_frame = frame
+        for detection in result["detections"]:
+            stats = self.classes.setdefault(detection["class_name"], {"detections": 0, "peak_confidence": 0.0})
+            stats["detections"] += 1
+            stats["peak_confidence"] = max(stats["peak_confidence"], detection["confidence"])
+
+
+class IncidentAggregator:
+    """
+    Merges per-frame detection results into time-ranged violence incidents as they arrive.
+
+    An incident opens on a frame whose confidence reaches `start_confidence` and is extended
+    by later frames reaching the lower `end_confidence` (hysteresis, so a score hovering
+    around one threshold doesn't split it). It closes once no such frame has been seen for
+    more than `gap_seconds` of video. Only the open incident is kept in memory; closed ones
+    are handed back straight away.
+    """
+
+    def __init__(self, fps: float, frame_stride: int = 1, start_confidence: float | None = None,
+                 end_confidence: float | None = None, gap_seconds: float | None = None,
+                 min_frames: int | None = None):
+        self.fps = fps if fps > 0 else None
+        self.start_confidence = settings.INCIDENT_START_CONFIDENCE if start_confidence is None else start_confidence
+        self.end_confidence = settings.INCIDENT_END_CONFIDENCE if end_confidence is None else end_confidence
+        self.end_confidence = min(self.end_confidence, self.start_confidence)
+        gap_seconds = settings.INCIDENT_GAP_SECONDS if gap_seconds is None else gap_seconds
+        # Without a usable FPS the gap is measured in sampling strides instead
+        self.gap_frames = round(gap_seconds * self.fps) if self.fps else frame_stride
+        # Never close an incident just because the sampler hasn't looked at a frame yet
+        self.gap_frames = max(self.gap_frames, frame_stride)
+        self.min_frames = settings.INCIDENT_MIN_FRAMES if min_frames is None else min_frames
+
+        self._open: _OpenIncident | None = None
+        self.incident_count = 0
+        self.opened_count = 0
+        # Incidents that reached `min_frames`; lets live callers alert as soon as one is certain
+        # to be reported, rather than when it ends (or on a blip that never will be)
+        self.confirmed_count = 0
+
+    def update(self, results: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Feed frame results in frame order; returns the incidents they closed."""
+        closed = []
+        for result in results:
+            if "error" in result:
+                continue
+            frame = result["frame"]
+            confidence = result["confidence"] if result.get("violence_detected") else 0.0
+
+            if self._open is not None and frame - self._open.end_frame > self.gap_frames:
+                closed.extend(self._close())
+
+            if self._open is None:
+                if confidence >= self.start_confidence:
+                    self._open = _OpenIncident(frame)
+                    self.opened_count += 1
+                    self._add(result)
+            elif confidence >= self.end_confidence:
+                self._add(result)
+        return closed
+
+    def _add(self, result: dict[str, Any]):
+        self._open.add(result)
+        if self._open.positive_frames == max(self.min_frames, 1):
+            self.confirmed_count += 1
+
+    def finish(self) -> list[dict[str, Any]]:
+        """Close whatever incident is still open at the end of the video."""
+        return self._close()
+
+    def _close(self) -> list[dict[str, Any]]:
+        incident, self._open = self._open, None
+        if incident is None or incident.positive_frames < self.min_frames:
+            return []
+        self.incident_count += 1
+        return [{
+            "incident": self.incident_count,
+            "start_frame": incident.start_frame,
+            "end_frame": incident.end_frame,
+            "start_seconds": self._seconds(incident.start_frame),
+            "end_seconds": self._seconds(incident.end_frame),
+            "duration_seconds": self._seconds(incident.end_frame - incident.start_frame),
+            "positive_frames": incident.positive_frames,
+            "peak_confidence": incident.peak_confidence,
+            "peak_frame": incident.peak_frame,
+            "peak_seconds": self._seconds(incident.peak_frame),
+            "classes": incident.classes,
+        }]
+
+    def _seconds(self, frame: int) -> float | None:
+        return round(frame / self.fps, 3) if self.fps else None
@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Callable, Iterator
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def artifact_path(weights_path: str, weights_sha256: str | None, suffix: str) -> pathlib.Path:
+    """
+    Where the exported form of `weights_path` is cached: next to the weights (or in
+    MODEL_EXPORT_DIR), tagged with the weights' hash so replacing best.pt never picks up a
+    stale export.
+    """
+    weights = pathlib.Path(weights_path)
+    directory = pathlib.Path(settings.MODEL_EXPORT_DIR) if settings.MODEL_EXPORT_DIR else weights.parent
+    tag = weights_sha256[:12] if weights_sha256 else "export"
+    return directory / f"{weights.stem}.{tag}{suffix}"
+
+
+def _publish(source: str | pathlib.Path, target: pathlib.Path):
+    """Move a freshly exported file or directory into place atomically."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    shutil.move(str(source), staging)
+    try:
+        os.replace(staging, target)
+    except OSError:
+        # Another worker published the same export first (directories can't be replaced)
+        if not target.exists():
+            raise
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _export(weights_path: str, export_format: str) -> tuple[tempfile.TemporaryDirectory, str]:
+    """Export a copy of the weights in a scratch directory, so concurrent exports never collide."""
+    scratch = tempfile.TemporaryDirectory()
+    source = pathlib.Path(scratch.name) / pathlib.Path(weights_path).name
+    shutil.copyfile(weights_path, source)
+    # Dynamic axes: batch size and input_size vary per request
+    exported = YOLO(str(source)).export(format=export_format, dynamic=True, simplify=True,
+                                        opset=settings.ONNX_OPSET, verbose=False)
+    return scratch, exported
+
+
+def _prepare_torch(weights_path: str, weights_sha256: str | None) -> str:
+    return weights_path
+
+
+def _prepare_onnx(weights_path: str, weights_sha256: str | None) -> str:
+    target = artifact_path(weights_path, weights_sha256, ".onnx")
+    if not target.is_file():
+        logger.info(f"Exporting {weights_path} to ONNX")
+        scratch, exported = _export(weights_path, "onnx")
+        with scratch:
+            _publish(exported, target)
+    return str(target)
+
+
+def _prepare_onnx_int8(weights_path: str, weights_sha256: str | None) -> str:
+    """ONNX with weights quantized to int8 ahead of time and activations quantized on the fly."""
+    target = artifact_path(weights_path, weights_sha256, ".int8.onnx")
+    if not target.is_file():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        fp32_model = _prepare_onnx(weights_path, weights_sha256)
+        logger.info(f"Quantizing {fp32_model} to int8")
+        with tempfile.TemporaryDirectory() as scratch:
+            quantized = pathlib.Path(scratch) / target.name
+            quantize_dynamic(fp32_model, quantized, weight_type=QuantType.QUInt8)
+            _publish(quantized, target)
+    return str(target)
+
+
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def media_sources(path: str | pathlib.Path) -> list[pathlib.Path]:
+    """The files of an image/video file or directory of them, in a stable order."""
+    path = pathlib.Path(path)
+    return sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+
+
+def _calibration_sources() -> list[pathlib.Path]:
+    path = pathlib.Path(settings.QUANT_CALIBRATION_PATH or "")
+    if not settings.QUANT_CALIBRATION_PATH or not path.exists():
+        raise RuntimeError("INFERENCE_BACKEND=onnx-int8-static needs QUANT_CALIBRATION_PATH "
+                           "(an image/video file or a directory of them) to calibrate with")
+    return media_sources(path)
+
+
+def _calibration_tag(sources: list[pathlib.Path]) -> str:
+    """Short fingerprint of the calibration set, so changing it produces a new artifact."""
+    material = "|".join(f"{p}:{p.stat().st_size}:{settings.QUANT_CALIBRATION_FRAMES}:{settings.QUANT_CALIBRATION_SIZE}"
+                        for p in sources)
+    return hashlib.sha256(material.encode()).hexdigest()[:8]
+
+
+def sample_frames(sources: list[pathlib.Path], count: int) -> list[np.ndarray]:
+    """Up to `count` BGR frames spread over the images and videos in `sources`."""
+    images = [p for p in sources if p.suffix.lower() in _IMAGE_SUFFIXES]
+    videos = [p for p in sources if p.suffix.lower() not in _IMAGE_SUFFIXES]
+    frames = [frame for frame in (cv2.imread(str(p)) for p in images[:count]) if frame is not None]
+    per_video = (count - len(frames)) // len(videos) if videos else 0
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in np.linspace(0, max(total - 1, 0), per_video).astype(int).tolist():
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+
+class _CalibrationReader:
+    """onnxruntime CalibrationDataReader feeding frames preprocessed the way ultralytics does."""
+
+    def __init__(self, input_name: str, frames: list[np.ndarray], size: int):
+        letterbox = LetterBox(new_shape=(size, size), auto=False)
+        self._batches: Iterator[dict[str, np.ndarray]] = iter([
+            {input_name: np.ascontiguousarray(letterbox(image=frame)[..., ::-1].transpose(2, 0, 1)[None],
+                                              dtype=np.float32) / 255}
+            for frame in frames
+        ])
+
+    def get_next(self) -> dict[str, np.ndarray] | None:
+        return next(self._batches, None)
+
+
+def _head_nodes_to_exclude(model_path: str) -> list[str]:
+    """
+    Nodes of the detection head that decode boxes (DFL softmax, anchor arithmetic, concat).
+    Quantizing those costs far more accuracy than it saves, so only the backbone/neck and the
+    head's convolutions are quantized.
+    """
+    import onnx
+
+    graph = onnx.load(model_path).graph
+    output_names = {output.name for output in graph.output}
+    producer = next(node for node in graph.node if output_names & set(node.output))
+    head_prefix = "/".join(producer.name.split("/")[:2]) + "/"
+    return [node.name for node in graph.node if node.name.startswith(head_prefix)
+            and (node.op_type != "Conv" or "/dfl/" in node.name)]
+
+
+def _prepare_onnx_int8_static(weights_path: str, weights_sha256: str | None) -> str:
+    """ONNX with weights and activations quantized to int8, calibrated on sample frames."""
+    sources = _calibration_sources()
+    target = artifact_path(weights_path, weights_sha256, f".int8-static-{_calibration_tag(sources)}.onnx")
+    if not target.is_file():
+        import onnxruntime
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+
+        fp32_model = _prepare_onnx(weights_path, weights_sha256)
+        frames = sample_frames(sources, settings.QUANT_CALIBRATION_FRAMES)
+        if not frames:
+            raise RuntimeError(f"No usable calibration frames in {settings.QUANT_CALIBRATION_PATH}")
+        logger.info(f"Calibrating int8 quantization of {fp32_model} on {len(frames)} frames")
+        input_name = onnxruntime.InferenceSession(fp32_model, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+        with tempfile.TemporaryDirectory() as scratch:
+            prepared = pathlib.Path(scratch) / "prepared.onnx"
+            quant_pre_process(fp32_model, prepared, skip_symbolic_shape=True)
+            quantized = pathlib.Path(scratch) / target.name
+            quantize_static(prepared, quantized,
+                            _CalibrationReader(input_name, frames, settings.QUANT_CALIBRATION_SIZE),
+                            quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                            weight_type=QuantType.QInt8, per_channel=True,
+                            calibrate_method=CalibrationMethod.MinMax,
+                            nodes_to_exclude=_head_nodes_to_exclude(str(prepared)))
+            _publish(quantized, target)
+    return str(target)
+
+
+def _prepare_openvino(weights_path: str, weights_sha256: str | None) -> str:
+    target = artifact_path(weights_path, weights_sha256, "_openvino_model")
+    if not target.is_dir():
+        logger.info(f"Exporting {weights_path} to OpenVINO")
+        scratch, exported = _export(weights_path, "openvino")
+        with scratch:
+            _publish(exported, target)
+    return str(target)
+
+
+# Backend name -> function turning the PyTorch weights into the artifact that backend loads.
+# Every artifact is loaded through ultralytics.YOLO, so predictions keep the same Results format.
+BACKENDS: dict[str, Callable[[str, str | None], str]] = {
+    "torch": _prepare_torch,
+    "onnx": _prepare_onnx,
+    "onnx-int8": _prepare_onnx_int8,
+    "onnx-int8-static": _prepare_onnx_int8_static,
+    "openvino": _prepare_openvino,
+}
+
+
+def prepare_model(weights_path: str, backend: str, weights_sha256: str | None = None) -> str:
+    """Return the path of the model artifact for `backend`, exporting it on first use."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend](weights_path, weights_sha256)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedException
+from app.core.inference_executor import inference_executor
+from app.schemas.detection import DetectionOptions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingImage:
+    image: np.ndarray
+    options: DetectionOptions
+    future: asyncio.Future = field(repr=False)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent image detection requests into batched forward passes.
+
+    Requests wait until either `max_batch_size` images are pending or the oldest one has
+    waited `max_wait_ms`; the batch then runs in one call to the model and each waiting
+    request gets its own parsed result back. Up to one batch per inference worker runs at
+    a time; while they are all busy the next batch keeps filling up.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float, max_queue_size: int):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self._queue: asyncio.Queue[_PendingImage] | None = None
+        self._task: asyncio.Task | None = None
+        # Free inference workers; sized from the executor when the batcher starts
+        self._slots: asyncio.Semaphore | None = None
+        self._in_flight: dict[asyncio.Task, list[_PendingImage]] = {}
+
+        self.batch_size_histogram: Counter[int] = Counter()
+        # Queue depth seen when each batch was cut, bucketed by powers of two
+        self.queue_depth_histogram: Counter[int] = Counter()
+        self.images_processed = 0
+        self.batches_processed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(inference_executor.max_workers)
+        self._task = asyncio.create_task(self._run(), name="image-micro-batcher")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        in_flight, self._in_flight = self._in_flight, {}
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+        # Fail whatever is still queued instead of leaving requests hanging
+        pending_images = [pending for batch in in_flight.values() for pending in batch]
+        while not self._queue.empty():
+            pending_images.append(self._queue.get_nowait())
+        retry_after = inference_executor.retry_after()
+        for pending in pending_images:
+            if not pending.future.done():
+                pending.future.set_exception(ServiceOverloadedException(retry_after=retry_after))
+
+    async def detect(self, image: np.ndarray, options: DetectionOptions) -> dict[str, Any]:
+        """Queue a decoded image and wait for its detection result."""
+        if not self.is_running:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingImage(image=image, options=options, future=future))
+        except asyncio.QueueFull:
+            raise ServiceOverloadedException(retry_after=inference_executor.retry_after())
+        return await future
+
+    async def _collect_batch(self) -> list[_PendingImage]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain what's already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            # Requests whose clients went away don't need inference
+            batch = [pending for pending in batch if not pending.future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            self.batch_size_histogram[len(batch)] += 1
+            self.queue_depth_histogram[_bucket(self._queue.qsize() + len(batch))] += 1
+            task = asyncio.create_task(self._dispatch(batch), name="image-micro-batch")
+            self._in_flight[task] = batch
+
+    async def _dispatch(self, batch: list[_PendingImage]):
+        try:
+            results = await inference_executor.run("detect_batch", [pending.image for pending in batch],
+                                                   [pending.options for pending in batch])
+        except Exception as e:
+            logger.error(f"Batched image inference failed: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+        else:
+            self.images_processed += len(batch)
+            self.batches_processed += 1
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
+        finally:
+            self._slots.release()
+            self._in_flight.pop(asyncio.current_task(), None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batches_in_flight": len(self._in_flight),
+            "images_processed": self.images_processed,
+            "batches_processed": self.batches_processed,
+            "mean_batch_size": self.images_processed / self.batches_processed if self.batches_processed else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_depth_histogram": {f"<={depth}": count for depth, count in sorted(self.queue_depth_histogram.items())},
+        }
+
+
+def _bucket(value: int) -> int:
+    """Round up to the next power of two."""
+    bucket = 1
+    while bucket < value:
+        bucket *= 2
+    return bucket
+
+
+image_batcher = MicroBatcher(
+    max_batch_size=settings.IMAGE_BATCH_MAX_SIZE,
+    max_wait_ms=settings.IMAGE_BATCH_MAX_WAIT_MS,
+    max_queue_size=settings.IMAGE_BATCH_QUEUE_SIZE,
+)
@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import pathlib
+import time
+from dataclasses import dataclass
+
+from huggingface_hub import hf_hub_download
+from huggingface_hub.errors import LocalEntryNotFoundError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResolvedModel:
+    path: str
+    source: str  # "local", "hf-cache" or "hf-download"
+    sha256: str
+    resolve_seconds: float
+    checksum_seconds: float
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _from_hub(local_files_only: bool) -> str:
+    return hf_hub_download(repo_id=settings.HUGGING_REPO_ID, filename=settings.MODEL_FILENAME,
+                           revision=settings.MODEL_REVISION, cache_dir=settings.MODEL_CACHE_DIR,
+                           local_files_only=local_files_only)
+
+
+def reloadable_model_path(model_path: str) -> str | None:
+    """
+    `model_path` resolved inside MODEL_RELOAD_DIR (relative paths are taken from there), or
+    None when it points anywhere else, including through a symlink, or no directory is set.
+    """
+    if not settings.MODEL_RELOAD_DIR:
+        return None
+    directory = pathlib.Path(settings.MODEL_RELOAD_DIR).resolve()
+    path = (directory / model_path).resolve()
+    return str(path) if path.is_relative_to(directory) else None
+
+
+def resolve_model(model_path: str | None = None) -> ResolvedModel:
+    """
+    Find the model weights without touching the network unless it's unavoidable and allowed.
+
+    Order: the explicit `model_path` (or MODEL_PATH), then the HuggingFace cache, then, only
+    with MODEL_ALLOW_DOWNLOAD, the hub itself. The file is checked against MODEL_SHA256 when
+    that is set.
+    """
+    started = time.perf_counter()
+    model_path = model_path or settings.MODEL_PATH
+    if model_path:
+        if not pathlib.Path(model_path).is_file():
+            raise RuntimeError(f"Model weights not found at {model_path}")
+        path, source = model_path, "local"
+    else:
+        try:
+            path, source = _from_hub(local_files_only=True), "hf-cache"
+        except LocalEntryNotFoundError:
+            if not settings.MODEL_ALLOW_DOWNLOAD:
+                raise RuntimeError(f"{settings.HUGGING_REPO_ID}/{settings.MODEL_FILENAME} is not in the HuggingFace "
+                                   f"cache and MODEL_ALLOW_DOWNLOAD is off; set MODEL_PATH or pre-populate the cache")
+            logger.info(f"Downloading {settings.HUGGING_REPO_ID}/{settings.MODEL_FILENAME} from HuggingFace")
+            try:
+                path, source = _from_hub(local_files_only=False), "hf-download"
+            except Exception as e:
+                raise RuntimeError(f"Failed to download model from HuggingFace: {e}")
+    resolved_at = time.perf_counter()
+
+    sha256 = file_sha256(path)
+    if settings.MODEL_SHA256 and sha256 != settings.MODEL_SHA256.lower():
+        raise RuntimeError(f"Checksum mismatch for {path}: expected {settings.MODEL_SHA256}, got {sha256}")
+
+    resolved = ResolvedModel(path=path, source=source, sha256=sha256, resolve_seconds=resolved_at - started,
+                             checksum_seconds=time.perf_counter() - resolved_at)
+    logger.info(f"Model resolved from {source}: {path}")
+    return resolved
@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.api.services.notification_hub import notification_hub
+from app.core.config import settings
+from app.core.database import engine
+from app.models.notification import Notification
+from app.models.shift import Shift
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DetectionAlert:
+    key: str  # what deduplication is keyed on, e.g. "stream:<id>" or "job:<id>"
+    title: str
+    body: str
+    confidence: float
+    detected_at: datetime
+    owner_id: uuid.UUID | None = None  # whoever set up the source; notified even when off shift
+
+
+class NotificationDispatcher:
+    """
+    Turns detection alerts into notifications for the users on shift when they happened.
+
+    `publish` is cheap and thread-safe: alerts below NOTIFY_MIN_CONFIDENCE are ignored and an
+    alert for a key that already notified within NOTIFY_DEDUP_SECONDS is only counted, so a
+    long incident doesn't flood anyone. Accepted alerts are buffered and a background thread
+    writes them every NOTIFY_FLUSH_SECONDS: one query finds the recipients of the whole
+    buffer and the rows go in as multi-row inserts in a single transaction. A flush that
+    fails puts its alerts back in front of the buffer for the next one (up to
+    NOTIFY_MAX_BUFFERED alerts), so an alert that was let through dedup is not lost with it.
+    """
+
+    def __init__(self):
+        self._buffer: list[DetectionAlert] = []
+        self._last_sent: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}  # alerts deduplicated since the key last notified
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.published = 0
+        self.below_threshold = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.notifications_written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop the flusher, writing whatever is still buffered."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+
+    def publish(self, alert: DetectionAlert) -> bool:
+        """Queue `alert` for delivery; False if it was below the threshold or deduplicated."""
+        now = time.monotonic()
+        with self._lock:
+            self.published += 1
+            if alert.confidence < settings.NOTIFY_MIN_CONFIDENCE:
+                self.below_threshold += 1
+                return False
+            last_sent = self._last_sent.get(alert.key)
+            if last_sent is not None and now - last_sent < settings.NOTIFY_DEDUP_SECONDS:
+                self._suppressed[alert.key] = self._suppressed.get(alert.key, 0) + 1
+                self.deduplicated += 1
+                return False
+            self._last_sent[alert.key] = now
+            suppressed = self._suppressed.pop(alert.key, 0)
+            if suppressed:
+                alert.body += f" ({suppressed} similar alert(s) suppressed since the last notification)"
+            self._buffer.append(alert)
+            # Forget keys whose window has passed so the map doesn't grow with every job and stream
+            if len(self._last_sent) > settings.NOTIFY_DEDUP_MAX_KEYS:
+                self._last_sent = {key: sent for key, sent in self._last_sent.items()
+                                   if now - sent < settings.NOTIFY_DEDUP_SECONDS}
+            full = len(self._buffer) >= settings.NOTIFY_BATCH_SIZE
+
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if full:
+            self._wake.set()
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(settings.NOTIFY_FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            alerts, self._buffer = self._buffer, []
+        if not alerts:
+            return
+
+        started = time.perf_counter()
+        try:
+            with Session(engine) as db:
+                rows = self._rows(db, alerts)
+                for i in range(0, len(rows), settings.NOTIFY_BATCH_SIZE):
+                    db.exec(insert(Notification), params=rows[i:i + settings.NOTIFY_BATCH_SIZE])
+                notification_hub.notify(db, rows)
+                db.commit()
+        except Exception as e:
+            self._requeue(alerts)
+            logger.error(f"Failed to write {len(alerts)} detection notification(s), retrying: {e}")
+            return
+
+        self.flushes += 1
+        self.notifications_written += len(rows)
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def _requeue(self, alerts: list[DetectionAlert]):
+        """Put the alerts of a failed flush back ahead of those published since."""
+        with self._lock:
+            self.failed_flushes += 1
+            self._buffer = alerts + self._buffer
+            overflow = len(self._buffer) - settings.NOTIFY_MAX_BUFFERED
+            if overflow > 0:
+                dropped, self._buffer = self._buffer[:overflow], self._buffer[overflow:]
+                self.dropped += overflow
+                # Never delivered, so the next alert for these keys should notify again
+                for alert in dropped:
+                    self._last_sent.pop(alert.key, None)
+        if overflow > 0:
+            logger.warning(f"Dropped {overflow} undeliverable detection alert(s)")
+
+    @staticmethod
+    def _rows(db: Session, alerts: list[DetectionAlert]) -> list[dict[str, Any]]:
+        """One notification row per alert and recipient."""
+        earliest = min(alert.detected_at for alert in alerts)
+        latest = max(alert.detected_at for alert in alerts)
+        query = select(Shift.user_id, Shift.start_time, Shift.end_time).where(
+            (Shift.start_time <= latest) & (Shift.end_time >= earliest))
+        if settings.NOTIFY_APPROVED_SHIFTS_ONLY:
+            query = query.where(Shift.is_approved == True)  # noqa: E712
+        shifts = db.exec(query).all()
+
+        now = datetime.now()
+        rows = []
+        for alert in alerts:
+            recipients = {user_id for user_id, start_time, end_time in shifts
+                          if start_time <= alert.detected_at <= end_time}
+            if alert.owner_id is not None:
+                recipients.add(alert.owner_id)
+            rows.extend({"id": uuid.uuid4(), "title": alert.title, "body": alert.body, "is_read": False,
+                         "user_id": user_id, "created_at": now, "updated_at": now} for user_id in recipients)
+        # Inserted and published in cursor order, so a feed sees them in the order a replay would
+        rows.sort(key=lambda row: (row["created_at"], row["id"]))
+        return rows
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "published": self.published,
+            "below_threshold": self.below_threshold,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "buffered": len(self._buffer),
+            "notifications_written": self.notifications_written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import select as os_select
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Mapping
+
+from sqlalchemy import event, text
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.notification import Notification
+from app.schemas.notification import NotificationBaseResponse
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay under 8000 bytes; bigger notifications are sent by id and re-read
+PG_PAYLOAD_MAX_BYTES = 7900
+# Put in a subscriber's queue when it overflowed; the feed then re-reads what it missed
+RESYNC = object()
+# Wait before reconnecting a dropped LISTEN connection
+LISTEN_RETRY_SECONDS = 2.0
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Split a NotificationBaseResponse.cursor back into the (created_at, id) it orders by."""
+    created_at, notification_id = cursor.split("|", 1)
+    return datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%S.%f"), uuid.UUID(notification_id)
+
+
+def to_payload(notification: Mapping[str, Any]) -> dict[str, Any]:
+    """What clients receive for a notification: the REST representation plus its owner."""
+    payload = NotificationBaseResponse.model_validate(dict(notification)).model_dump(mode="json")
+    payload["user_id"] = str(notification["user_id"])
+    return payload
+
+
+class NotificationHub:
+    """
+    In-process pub/sub pushing new notifications to the connected users' feeds.
+
+    Writers call `notify` with their session before committing; delivery only happens once
+    the transaction commits. With NOTIFY_PUSH_BACKEND "postgres" notifications travel through
+    LISTEN/NOTIFY instead, so every API worker (each with its own hub) sees the ones written
+    by the others.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[uuid.UUID, set[asyncio.Queue]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping = threading.Event()
+        self._listener: threading.Thread | None = None
+        self.listening = False
+
+        self.published = 0
+        self.delivered = 0
+        self.overflowed = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping.clear()
+        if settings.NOTIFY_PUSH_BACKEND == "postgres" and self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name="notification-listener", daemon=True)
+            self._listener.start()
+
+    def shutdown(self):
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join(5)
+            self._listener = None
+        self._loop = None
+
+    def subscribe(self, user_id: uuid.UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.NOTIFY_PUSH_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: uuid.UUID, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def notify(self, db: Session, notifications: list[Mapping[str, Any]]):
+        """Announce `notifications` being written in `db`'s transaction; call before committing."""
+        if not notifications:
+            return
+        payloads = [to_payload(notification) for notification in notifications]
+        if settings.NOTIFY_PUSH_BACKEND == "postgres":
+            messages = [json.dumps(payload) for payload in payloads]
+            messages = [message if len(message.encode()) <= PG_PAYLOAD_MAX_BYTES else
+                        json.dumps({"id": payload["id"], "user_id": payload["user_id"], "partial": True})
+                        for message, payload in zip(messages, payloads)]
+            # One round trip for the whole batch; Postgres delivers them when the transaction commits
+            db.exec(text("SELECT pg_notify(:channel, message) FROM unnest(CAST(:messages AS text[])) AS message"),
+                    params={"channel": settings.NOTIFY_PUSH_CHANNEL, "messages": messages})
+        else:
+            event.listen(db, "after_commit", lambda session: self.publish(payloads), once=True)
+
+    def publish(self, payloads: list[dict[str, Any]]):
+        """Hand committed notifications to this process's subscribers; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        self.published += len(payloads)
+        loop.call_soon_threadsafe(self._deliver, payloads)
+
+    def _deliver(self, payloads: list[dict[str, Any]]):
+        for payload in payloads:
+            for queue in list(self._subscribers.get(uuid.UUID(payload["user_id"]), ())):
+                try:
+                    queue.put_nowait(payload)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    # A consumer this far behind catches up from the database instead
+                    self.overflowed += 1
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(RESYNC)
+
+    def _listen(self):
+        """Forward NOTIFY messages to the local subscribers, reconnecting if the connection drops."""
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                # Keep the listening connection out of the pool for good
+                connection.detach()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{settings.NOTIFY_PUSH_CHANNEL}"')
+                self.listening = True
+                while not self._stopping.is_set():
+                    if os_select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    messages = [json.loads(message.payload) for message in dbapi_connection.notifies]
+                    dbapi_connection.notifies.clear()
+                    self.publish(self._complete(messages))
+            except Exception as e:
+                logger.error(f"Notification listener failed, reconnecting: {e}")
+                self._stopping.wait(LISTEN_RETRY_SECONDS)
+            finally:
+                self.listening = False
+                if connection is not None:
+                    connection.close()
+
+    @staticmethod
+    def _complete(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Re-read notifications that were too big to send whole."""
+        partial = [uuid.UUID(message["id"]) for message in messages if message.get("partial")]
+        if not partial:
+            return messages
+        with Session(engine) as db:
+            rows = {notification.id: to_payload(notification.model_dump()) for notification in
+                    db.exec(select(Notification).where(Notification.id.in_(partial))).all()}
+        # Deleted in the meantime if it isn't there anymore
+        return [rows.get(uuid.UUID(message["id"])) if message.get("partial") else message for message in messages
+                if not message.get("partial") or uuid.UUID(message["id"]) in rows]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": settings.NOTIFY_PUSH_BACKEND,
+            "listening": self.listening,
+            "connected_users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflowed": self.overflowed,
+        }
+
+
+notification_hub = NotificationHub()
@@ -1,10 +1,17 @@
+import asyncio
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, AsyncIterator
 from uuid import UUID
 
 from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session, select, delete
 
+from app.api.services.notification_hub import RESYNC, decode_cursor, notification_hub, to_payload
 from app.constants.messages import MESSAGE
-from app.core.exceptions import NotFoundException
+from app.core.config import settings
+from app.core.database import engine
+from app.core.exceptions import AppException, NotFoundException
 from app.models.notification import Notification
 from app.schemas.notification import NotificationCreateResponse, NotificationCreate, NotificationsResponse, \
     NotificationResponse, NotificationDeleteResponse
@@ -28,17 +35,108 @@ class NotificationService:
 
         # save to database
         db.add(notification)
+        notification_hub.notify(db, [notification.model_dump()])
         db.commit()
         db.refresh(notification)
 
         return NotificationCreateResponse()
 
     @staticmethod
-    async def get_notifications(user_id: str, db: Session) -> NotificationsResponse:
+    def _since(user_id: UUID, db: Session, since: str | None, limit: int | None,
+               overlap: float = 0.0) -> list[Notification]:
+        """
+        The user's notifications after the `since` cursor, oldest first. With `overlap`, also
+        those created up to that many seconds before it.
+        """
         query = select(Notification).where(Notification.user_id == user_id)
-        results = db.exec(query).all()
+        if since:
+            try:
+                created_at, notification_id = decode_cursor(since)
+            except ValueError:
+                raise AppException(MESSAGE.INVALID_CURSOR, 400)
+            if overlap:
+                query = query.where(Notification.created_at >= created_at - timedelta(seconds=overlap))
+            else:
+                query = query.where((Notification.created_at > created_at) |
+                                    ((Notification.created_at == created_at) & (Notification.id > notification_id)))
+        query = query.order_by(Notification.created_at, Notification.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return db.exec(query).all()
 
-        return NotificationsResponse(data=results)
+    @staticmethod
+    async def get_notifications(user_id: UUID, db: Session, since: str | None = None,
+                                limit: int | None = None) -> NotificationsResponse:
+        results = NotificationService._since(user_id, db, since, limit)
+        response = NotificationsResponse(data=results)
+        response.cursor = response.data[-1].cursor if response.data else since
+
+        return response
+
+    @staticmethod
+    def _missed(user_id: UUID, since: str | None, overlap: float) -> list[dict[str, Any]]:
+        with Session(engine) as db:
+            return [to_payload(notification.model_dump()) for notification in
+                    NotificationService._since(user_id, db, since, settings.NOTIFY_REPLAY_PAGE_SIZE, overlap)]
+
+    @staticmethod
+    async def feed(user_id: UUID, since: str | None) -> AsyncIterator[dict[str, Any] | None]:
+        """
+        Notifications for a connected client: first whatever came after `since`, then new ones
+        as they are created. Yields None when nothing happened for a heartbeat interval.
+
+        Cursors are taken before commit, so a notification written by another worker can commit
+        after one with a later cursor was already seen. Catching up therefore starts
+        NOTIFY_REPLAY_OVERLAP_SECONDS before `since`, and a client may get a notification it
+        already had from just before it reconnected; each is sent once per connection.
+        """
+        queue = notification_hub.subscribe(user_id)
+        sent: OrderedDict[str, None] = OrderedDict()  # ids recently yielded, oldest first
+        try:
+            catching_up = since is not None
+            overlap = settings.NOTIFY_REPLAY_OVERLAP_SECONDS
+            while True:
+                if catching_up:
+                    # Subscribed first, so nothing created while this runs is lost
+                    page = await asyncio.to_thread(NotificationService._missed, user_id, since, overlap)
+                    # Only the first page reaches back; the following ones continue from the last row read
+                    overlap = 0.0
+                    for payload in page:
+                        since = payload["cursor"]
+                        if payload["id"] in sent:
+                            continue
+                        NotificationService._remember(sent, payload["id"])
+                        yield payload
+                    catching_up = len(page) == settings.NOTIFY_REPLAY_PAGE_SIZE
+                    continue
+
+                try:
+                    payload = await asyncio.wait_for(queue.get(), settings.NOTIFY_PUSH_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if payload is RESYNC:
+                    # What was dropped may sort before notifications already delivered
+                    catching_up = True
+                    overlap = settings.NOTIFY_REPLAY_OVERLAP_SECONDS
+                    continue
+                # Already sent while catching up
+                if payload["id"] in sent:
+                    continue
+                NotificationService._remember(sent, payload["id"])
+                # Live notifications don't arrive in cursor order, so keep the furthest one
+                if since is None or decode_cursor(payload["cursor"]) > decode_cursor(since):
+                    since = payload["cursor"]
+                yield payload
+        finally:
+            notification_hub.unsubscribe(user_id, queue)
+
+    @staticmethod
+    def _remember(sent: OrderedDict[str, None], notification_id: str):
+        sent[notification_id] = None
+        # Duplicates come from the live queue or a replay page, so this many ids covers them
+        if len(sent) > settings.NOTIFY_PUSH_QUEUE_SIZE + settings.NOTIFY_REPLAY_PAGE_SIZE:
+            sent.popitem(last=False)
 
     @staticmethod
     async def get_notification(notification_id: UUID, db: Session, user_id: UUID):
@@ -0,0 +1,579 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+from sqlalchemy import update
+from sqlmodel import Session, select, func
+
+from app.api.services.incident_aggregator import IncidentAggregator
+from app.api.services.notification_dispatcher import DetectionAlert, notification_dispatcher
+from app.api.services.video_pipeline import MotionGate, StageTimings
+from app.constants.messages import MESSAGE
+from app.core.config import settings
+from app.core.database import engine
+from app.core.exceptions import AppException, NotFoundException, ServiceOverloadedException
+from app.core.inference_executor import InferenceExecutorStopped, inference_executor
+from app.models.monitored_stream import MonitoredStream
+from app.schemas.detection import DetectionOptions
+from app.schemas.stream import (StreamCreate, StreamUpdate, StreamBaseResponse, StreamResponse, StreamsResponse,
+                                StreamDeleteResponse)
+
+logger = logging.getLogger(__name__)
+
+REMOTE_SCHEMES = {"rtsp", "rtsps", "rtmp", "http", "https"}
+# Assumed when a feed doesn't report its frame rate
+DEFAULT_STREAM_FPS = 25.0
+
+
+def is_local_source(url: str) -> bool:
+    return urlsplit(url).scheme.lower() not in REMOTE_SCHEMES
+
+
+class StreamMonitorService:
+    @staticmethod
+    async def _find_by_id(stream_id: uuid.UUID, db: Session) -> MonitoredStream:
+        stream = db.exec(select(MonitoredStream).where(MonitoredStream.id == stream_id)).first()
+
+        if not stream:
+            raise NotFoundException(message=MESSAGE.STREAM_NOT_FOUND)
+
+        return stream
+
+    @staticmethod
+    def _to_response(stream: MonitoredStream) -> StreamBaseResponse:
+        return StreamBaseResponse.model_validate(stream).model_copy(update={"stats": stream_monitor.stats(stream.id)})
+
+    @staticmethod
+    def _check_capacity(db: Session):
+        active = db.exec(select(func.count()).select_from(MonitoredStream)
+                         .where(MonitoredStream.is_active == True)).one()  # noqa: E712
+        if active >= settings.STREAM_MAX_ACTIVE:
+            raise AppException(MESSAGE.STREAM_LIMIT_REACHED, 409)
+
+    @staticmethod
+    async def create_stream(data: StreamCreate, db: Session, user_id: uuid.UUID) -> StreamResponse:
+        if is_local_source(data.url) and not settings.STREAM_ALLOW_LOCAL_SOURCES:
+            raise AppException(MESSAGE.STREAM_LOCAL_SOURCE_FORBIDDEN, 400)
+        StreamMonitorService._check_capacity(db)
+
+        stream = MonitoredStream(user_id=user_id, name=data.name, url=data.url, loop=data.loop,
+                                 options=data.options.model_dump())
+
+        # save to database
+        db.add(stream)
+        db.commit()
+        db.refresh(stream)
+
+        stream_monitor.start_stream(stream)
+        db.refresh(stream)
+        return StreamResponse(data=StreamMonitorService._to_response(stream), message=MESSAGE.STREAM_STARTED)
+
+    @staticmethod
+    async def get_streams(db: Session) -> StreamsResponse:
+        streams = db.exec(select(MonitoredStream).order_by(MonitoredStream.created_at)).all()
+
+        return StreamsResponse(data=[StreamMonitorService._to_response(stream) for stream in streams])
+
+    @staticmethod
+    async def get_stream(stream_id: uuid.UUID, db: Session) -> StreamResponse:
+        stream = await StreamMonitorService._find_by_id(stream_id, db)
+
+        return StreamResponse(data=StreamMonitorService._to_response(stream))
+
+    @staticmethod
+    async def update_stream(stream_id: uuid.UUID, data: StreamUpdate, db: Session) -> StreamResponse:
+        """Pause or resume monitoring a stream."""
+        stream = await StreamMonitorService._find_by_id(stream_id, db)
+        if data.is_active and not stream.is_active:
+            StreamMonitorService._check_capacity(db)
+
+        stream.is_active = data.is_active
+        stream.updated_at = datetime.now()
+        db.add(stream)
+        db.commit()
+        db.refresh(stream)
+
+        if stream.is_active:
+            stream_monitor.start_stream(stream)
+        else:
+            stream_monitor.stop_stream(stream.id)
+        db.refresh(stream)
+        return StreamResponse(data=StreamMonitorService._to_response(stream), message=MESSAGE.UPDATED)
+
+    @staticmethod
+    async def delete_stream(stream_id: uuid.UUID, db: Session) -> StreamDeleteResponse:
+        stream = await StreamMonitorService._find_by_id(stream_id, db)
+        stream_monitor.stop_stream(stream.id)
+
+        db.delete(stream)
+        db.commit()
+
+        return StreamDeleteResponse()
+
+
+class _RateMeter:
+    """Events per second over a sliding window; marked and read from different threads."""
+
+    def __init__(self, window_seconds: float = 5.0):
+        self.window = window_seconds
+        self._events: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._events and now - self._events[0] > self.window:
+            self._events.popleft()
+
+    def mark(self, now: float):
+        with self._lock:
+            self._events.append(now)
+            self._expire(now)
+
+    def rate(self, now: float) -> float:
+        with self._lock:
+            self._expire(now)
+            return len(self._events) / self.window
+
+
+class _StreamWorker:
+    """
+    Watches one stream with two threads.
+
+    The reader keeps pulling frames at the feed's pace (grabbing the ones the sampler skips)
+    and pushes sampled frames into a small buffer; when the detector falls behind, the oldest
+    buffered frames are dropped so it always works on recent footage. The detector sends
+    whatever is buffered to the inference executor, merges results into incidents and alerts
+    the notification dispatcher once one is confirmed (has INCIDENT_MIN_FRAMES positive frames).
+    """
+
+    def __init__(self, stream: MonitoredStream):
+        self.id = stream.id
+        self.name = stream.name
+        self.url = stream.url
+        self.user_id = stream.user_id
+        self.loop = stream.loop
+        self.options = DetectionOptions(**stream.options)
+        self.local_file = is_local_source(self.url) and os.path.isfile(self.url)
+
+        self._buffer: deque[tuple[int, float, np.ndarray, dict[str, Any] | None]] = deque(
+            maxlen=settings.STREAM_BUFFER_FRAMES)
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._reader_done = False
+        self._threads: list[threading.Thread] = []
+
+        self.fps = 0.0
+        self.frame_stride = 0
+        self.aggregator: IncidentAggregator | None = None
+        self.state = "starting"
+        self.last_error: str | None = None
+        self.started_at = datetime.now()
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_dropped = 0
+        self.frames_inferred = 0
+        self.reconnects = 0
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.notifications = 0
+        self.last_detection_at: datetime | None = None
+        self.recent_incidents: deque[dict[str, Any]] = deque(maxlen=settings.STREAM_RECENT_INCIDENTS)
+        self._read_rate = _RateMeter()
+        self._inference_rate = _RateMeter()
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._run_safely, args=(self._read,), name=f"stream-{self.id}-read", daemon=True),
+            threading.Thread(target=self._run_safely, args=(self._detect,), name=f"stream-{self.id}-detect",
+                             daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        if self.state not in ("finished", "failed"):
+            self.state = "stopped"
+
+    @property
+    def exited(self) -> bool:
+        """Both threads are done: the source finished, the worker crashed, or it was stopped."""
+        return bool(self._threads) and not any(thread.is_alive() for thread in self._threads)
+
+    def _run_safely(self, target):
+        try:
+            target()
+        except Exception as e:
+            logger.error(f"Stream {self.name} ({self.id}) crashed: {e}")
+            self.state = "failed"
+            self.last_error = str(e)
+            self._stop.set()
+            with self._ready:
+                self._ready.notify_all()
+
+    def _open(self) -> cv2.VideoCapture:
+        source: str | int = int(self.url) if self.url.isdigit() else self.url
+        return cv2.VideoCapture(source)
+
+    def _read(self):
+        delay = settings.STREAM_RECONNECT_SECONDS
+        timings = StageTimings()
+        gate: MotionGate | None = None
+        try:
+            while not self._stop.is_set():
+                cap = self._open()
+                if not cap.isOpened():
+                    cap.release()
+                    self.state = "reconnecting"
+                    self.last_error = "Could not open stream"
+                    if self.local_file and not os.path.exists(self.url):
+                        raise RuntimeError(f"{self.url} does not exist")
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, settings.STREAM_RECONNECT_MAX_SECONDS)
+                    self.reconnects += 1
+                    continue
+
+                if self.aggregator is None:
+                    reported_fps = cap.get(cv2.CAP_PROP_FPS)
+                    # Some feeds report nonsense (0 or 90000) for their frame rate
+                    self.fps = reported_fps if 0 < reported_fps <= 240 else DEFAULT_STREAM_FPS
+                    self.frame_stride = self.options.resolve_frame_stride(self.fps)
+                    self.aggregator = IncidentAggregator(self.fps, self.frame_stride)
+                    if self.options.adaptive_sampling:
+                        gate = MotionGate(self.frame_stride, timings)
+                read_stride = gate.probe_stride if gate else self.frame_stride
+
+                self.state = "running"
+                self.last_error = None
+                delay = settings.STREAM_RECONNECT_SECONDS
+                ended = self._read_capture(cap, read_stride, gate)
+                cap.release()
+                if self._stop.is_set():
+                    break
+                if self.local_file and not self.loop and ended:
+                    self.state = "finished"
+                    break
+                self.reconnects += 1
+                self.state = "reconnecting"
+        finally:
+            self._reader_done = True
+            with self._ready:
+                self._ready.notify_all()
+
+    def _read_capture(self, cap: cv2.VideoCapture, read_stride: int, gate: MotionGate | None) -> bool:
+        """Read until the capture ends or fails; True if a local file reached its end."""
+        # Local files are paced at their frame rate so they behave like a live feed
+        paced_since = time.monotonic()
+        paced_frames = 0
+        while not self._stop.is_set():
+            if self.local_file:
+                wait = paced_since + paced_frames / self.fps - time.monotonic()
+                if wait > 0:
+                    self._stop.wait(wait)
+
+            sample = self.frames_read % read_stride == 0
+            if sample:
+                success, frame = cap.read()
+            else:
+                success, frame = cap.grab(), None
+            if not success:
+                if self.local_file and self.loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0) and paced_frames:
+                    paced_since, paced_frames = time.monotonic(), 0
+                    continue
+                return self.local_file
+
+            now = time.monotonic()
+            frame_index = self.frames_read
+            self.frames_read += 1
+            paced_frames += 1
+            self._read_rate.mark(now)
+            if not sample:
+                continue
+
+            sampling = None
+            if gate is not None:
+                sampling = gate.admit(frame_index, frame)
+                if sampling is None:
+                    continue
+            self.frames_sampled += 1
+            with self._ready:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.frames_dropped += 1
+                self._buffer.append((frame_index, now, frame, sampling))
+                self._ready.notify()
+        return False
+
+    def _take_batch(self) -> list[tuple[int, float, np.ndarray, dict[str, Any] | None]] | None:
+        with self._ready:
+            while not self._buffer:
+                if self._stop.is_set() or self._reader_done:
+                    return None
+                self._ready.wait(1.0)
+            batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.options.batch_size))]
+        return batch
+
+    def _detect(self):
+        while (batch := self._take_batch()) is not None:
+            try:
+                results = inference_executor.run_threadsafe("detect_batch", [frame for _, _, frame, _ in batch],
+                                                            [self.options] * len(batch))
+            except InferenceExecutorStopped:
+                break
+            except ServiceOverloadedException:
+                # Requests and other streams have every slot; these frames go stale like any dropped ones
+                self.frames_dropped += len(batch)
+                self._stop.wait(settings.STREAM_OVERLOAD_BACKOFF_SECONDS)
+                continue
+            except Exception as e:
+                # Keep watching; the frames of a failed batch are simply lost
+                logger.error(f"Inference failed on stream {self.name} ({self.id}): {e}")
+                self.last_error = str(e)
+                self._stop.wait(settings.STREAM_RECONNECT_SECONDS)
+                continue
+            now = time.monotonic()
+            for (frame_index, captured_at, _, sampling), result in zip(batch, results):
+                result["frame"] = frame_index
+                result["seconds"] = round(frame_index / self.fps, 3)
+                if sampling is not None:
+                    result["sampling"] = sampling
+                self._inference_rate.mark(now)
+            self.frames_inferred += len(batch)
+            # How far behind the feed the newest result is
+            self.lag_seconds = now - batch[-1][1]
+            self.max_lag_seconds = max(self.max_lag_seconds, self.lag_seconds)
+            self._handle_results(results)
+
+        if self.aggregator is not None:
+            self.recent_incidents.extend(self.aggregator.finish())
+
+    def _handle_results(self, results: list[dict[str, Any]]):
+        confirmed_before = self.aggregator.confirmed_count
+        self.recent_incidents.extend(self.aggregator.update(results))
+        if self.aggregator.confirmed_count == confirmed_before:
+            return
+
+        detected = max(results, key=lambda result: result.get("confidence", 0.0))
+        self.last_detection_at = datetime.now()
+        classes = sorted({detection["class_name"] for detection in detected["detections"]})
+        if notification_dispatcher.publish(DetectionAlert(
+            key=f"stream:{self.id}",
+            title=f"Violence detected on {self.name}",
+            body=f"Confidence {detected['confidence']:.2f} at {self.last_detection_at:%Y-%m-%d %H:%M:%S}"
+                 + (f" ({', '.join(classes)})" if classes else ""),
+            confidence=detected["confidence"],
+            detected_at=self.last_detection_at,
+            owner_id=self.user_id,
+        )):
+            self.notifications += 1
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "state": self.state,
+            "last_error": self.last_error,
+            "started_at": self.started_at,
+            "fps": round(self.fps, 2),
+            "frame_stride": self.frame_stride,
+            "read_fps": round(self._read_rate.rate(now), 2),
+            "inference_fps": round(self._inference_rate.rate(now), 2),
+            "lag_seconds": round(self.lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "frames_read": self.frames_read,
+            "frames_sampled": self.frames_sampled,
+            "frames_dropped": self.frames_dropped,
+            "frames_inferred": self.frames_inferred,
+            "buffered": len(self._buffer),
+            "reconnects": self.reconnects,
+            "notifications": self.notifications,
+            "last_detection_at": self.last_detection_at,
+            "recent_incidents": list(self.recent_incidents),
+        }
+
+
+class StreamMonitor:
+    """
+    Process-wide owner of the workers watching the active streams.
+
+    With several API processes each stream is watched by exactly one of them: a process only
+    starts a worker after atomically claiming the stream's lease, like detection jobs are
+    claimed. A supervisor thread renews the leases of its workers (stopping those it lost,
+    e.g. because the stream was paused or deleted through another process), removes workers
+    that exited, and claims active streams nobody holds, so streams move to a surviving
+    process when one dies. The lease of a stream whose worker crashed is kept, with its
+    expiry pushed out by an exponential backoff, so a stream that crashes on start isn't
+    restarted on every supervision pass by this or any other process.
+    """
+
+    def __init__(self):
+        self._workers: dict[uuid.UUID, _StreamWorker] = {}
+        self._crashes: dict[uuid.UUID, int] = {}  # crashes in a row, per stream
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def start(self):
+        """Start watching the active streams no other API process holds, including those left by the last run."""
+        self._claim_available()
+        self._ensure_supervisor()
+
+    def _ensure_supervisor(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._supervise, name="stream-monitor", daemon=True)
+        self._thread.start()
+
+    def _supervise(self):
+        while not self._stopping.wait(settings.STREAM_LEASE_SECONDS / 3):
+            try:
+                self._reap()
+                self._renew()
+                self._claim_available()
+            except Exception as e:
+                logger.error(f"Stream supervision failed: {e}")
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.now() + timedelta(seconds=settings.STREAM_LEASE_SECONDS)
+
+    def _claim(self, db: Session, stream_id: uuid.UUID) -> bool:
+        """Atomically take the lease of an active stream that nobody else holds."""
+        result = db.exec(update(MonitoredStream)
+                         .where((MonitoredStream.id == stream_id) & (MonitoredStream.is_active == True)  # noqa: E712
+                                & ((MonitoredStream.lease_owner == None)  # noqa: E711
+                                   | (MonitoredStream.lease_owner == self.instance_id)
+                                   | (MonitoredStream.lease_expires_at < datetime.now())))
+                         .values(lease_owner=self.instance_id, lease_expires_at=self._lease_expiry()))
+        db.commit()
+        return result.rowcount == 1
+
+    def _release(self, stream_ids: list[uuid.UUID], **values: Any):
+        with Session(engine) as db:
+            db.exec(update(MonitoredStream)
+                    .where(MonitoredStream.id.in_(stream_ids) & (MonitoredStream.lease_owner == self.instance_id))
+                    .values(lease_owner=None, lease_expires_at=None, **values))
+            db.commit()
+
+    def _claim_available(self):
+        with Session(engine) as db:
+            streams = db.exec(select(MonitoredStream).where(
+                (MonitoredStream.is_active == True)  # noqa: E712
+                & ((MonitoredStream.lease_owner == None)  # noqa: E711
+                   | (MonitoredStream.lease_expires_at < datetime.now())))).all()
+        started = sum(1 for stream in streams if self.start_stream(stream))
+        if started:
+            logger.info(f"Monitoring {started} more stream(s)")
+
+    def _renew(self):
+        """Extend the leases this process holds and stop the workers whose lease is gone."""
+        with self._lock:
+            stream_ids = list(self._workers)
+        if not stream_ids:
+            return
+        with Session(engine) as db:
+            db.exec(update(MonitoredStream)
+                    .where(MonitoredStream.id.in_(stream_ids) & (MonitoredStream.lease_owner == self.instance_id)
+                           & (MonitoredStream.is_active == True))  # noqa: E712
+                    .values(lease_expires_at=self._lease_expiry()))
+            db.commit()
+            held = set(db.exec(select(MonitoredStream.id).where(
+                MonitoredStream.id.in_(stream_ids) & (MonitoredStream.lease_owner == self.instance_id)
+                & (MonitoredStream.is_active == True))).all())  # noqa: E712
+        for stream_id in set(stream_ids) - held:
+            # Paused, deleted or taken over elsewhere
+            with self._lock:
+                worker = self._workers.pop(stream_id, None)
+            if worker is not None:
+                worker.stop()
+
+    def _reap(self):
+        """Drop workers whose threads ended, so the stream can be watched again."""
+        with self._lock:
+            exited = [worker for worker in self._workers.values() if worker.exited]
+            for worker in exited:
+                del self._workers[worker.id]
+        finished = [worker.id for worker in exited if worker.state == "finished"]
+        # A file that played to its end is done; a crashed worker is retried once its backoff passed
+        if finished:
+            self._release(finished, is_active=False, updated_at=datetime.now())
+            for stream_id in finished:
+                self._crashes.pop(stream_id, None)
+        for worker in exited:
+            if worker.state != "finished":
+                delay = self._hold_back(worker)
+                logger.warning(f"Stream {worker.name} ({worker.id}) stopped: {worker.last_error}; "
+                               f"retrying in {delay:.0f}s")
+
+    def _hold_back(self, worker: _StreamWorker) -> float:
+        """Keep a crashed stream's lease for a backoff that doubles while it keeps crashing."""
+        # A worker that ran longer than the longest backoff was not crash-looping
+        if (datetime.now() - worker.started_at).total_seconds() > settings.STREAM_RESTART_MAX_SECONDS:
+            self._crashes.pop(worker.id, None)
+        crashes = self._crashes[worker.id] = self._crashes.get(worker.id, 0) + 1
+        delay = min(settings.STREAM_RESTART_SECONDS * 2 ** (crashes - 1), settings.STREAM_RESTART_MAX_SECONDS)
+        with Session(engine) as db:
+            db.exec(update(MonitoredStream)
+                    .where((MonitoredStream.id == worker.id) & (MonitoredStream.lease_owner == self.instance_id))
+                    .values(lease_expires_at=datetime.now() + timedelta(seconds=delay)))
+            db.commit()
+        return delay
+
+    def start_stream(self, stream: MonitoredStream) -> bool:
+        """Watch `stream` in this process if it can claim it; False if it is already watched."""
+        with self._lock:
+            if stream.id in self._workers:
+                return False
+        with Session(engine) as db:
+            if not self._claim(db, stream.id):
+                return False
+        with self._lock:
+            if stream.id in self._workers:
+                return False
+            worker = self._workers[stream.id] = _StreamWorker(stream)
+        worker.start()
+        self._ensure_supervisor()
+        return True
+
+    def stop_stream(self, stream_id: uuid.UUID):
+        with self._lock:
+            worker = self._workers.pop(stream_id, None)
+        self._crashes.pop(stream_id, None)
+        if worker is not None:
+            worker.stop()
+            self._release([stream_id])
+
+    def shutdown(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        with self._lock:
+            workers, self._workers = list(self._workers.values()), {}
+        for worker in workers:
+            worker.stop()
+        # Let another API process take the streams over straight away
+        if workers:
+            try:
+                self._release([worker.id for worker in workers])
+            except Exception as e:
+                logger.error(f"Could not release stream leases: {e}")
+
+    def stats(self, stream_id: uuid.UUID) -> dict[str, Any] | None:
+        worker = self._workers.get(stream_id)
+        return worker.stats() if worker else None
+
+
+stream_monitor = StreamMonitor()
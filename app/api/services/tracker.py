@@ -0,0 +1,195 @@
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two sets of xyxy boxes, shape (len(boxes_a), len(boxes_b))."""
+    width = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) - np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    height = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) - np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    intersection = np.maximum(width, 0) * np.maximum(height, 0)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def centroid_affinity(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise closeness of box centres, 1 at the same centre and 0 one box diagonal (of `a`) away."""
+    centres_a = (boxes_a[:, :2] + boxes_a[:, 2:]) / 2
+    centres_b = (boxes_b[:, :2] + boxes_b[:, 2:]) / 2
+    distance = np.linalg.norm(centres_a[:, None, :] - centres_b[None, :, :], axis=2)
+    diagonal = np.maximum(np.linalg.norm(boxes_a[:, 2:] - boxes_a[:, :2], axis=1), 1e-9)
+    return 1 - distance / diagonal[:, None]
+
+
+def _greedy_match(scores: np.ndarray, threshold: float) -> list[tuple[int, int]]:
+    """Pair rows with columns by descending score, each used at most once."""
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    matched_rows, matched_cols, pairs = set(), set(), []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in matched_rows and col not in matched_cols:
+            matched_rows.add(row)
+            matched_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+
+class _Track:
+    def __init__(self, track_id: int, frame: int, detection: dict[str, Any]):
+        self.track_id = track_id
+        self.class_id = detection["class_id"]
+        self.class_name = detection["class_name"]
+        self.box = np.asarray(detection["bbox"], dtype=np.float64)
+        self.velocity = np.zeros(4)  # box change per frame
+        self.confidence = detection["confidence"]
+        self.peak_confidence = detection["confidence"]
+        self.first_frame = frame
+        self.last_frame = frame
+        self.hits = 1
+
+    def predict(self, frame: int) -> np.ndarray:
+        return self.box + self.velocity * (frame - self.last_frame)
+
+    def update(self, frame: int, detection: dict[str, Any]):
+        box = np.asarray(detection["bbox"], dtype=np.float64)
+        # Smoothed constant-velocity estimate
+        self.velocity = (self.velocity + (box - self.box) / (frame - self.last_frame)) / 2
+        self.box = box
+        self.confidence = detection["confidence"]
+        self.peak_confidence = max(self.peak_confidence, detection["confidence"])
+        self.last_frame = frame
+        self.hits += 1
+
+
+class IoUTracker:
+    """
+    Assigns stable track ids to detections across sampled frames.
+
+    Each frame's detections are matched to the live tracks of the same class, first by IoU
+    with the tracks' constant-velocity predictions, then (for what is left) by centre
+    distance, which still links boxes that moved too far between sparse samples to overlap.
+    Tracks not seen for `max_age` frames are retired.
+
+    With `fill_stride`, results for every `fill_stride`-th frame between two inferred frames
+    are synthesised from the tracks (interpolated when the track is seen again, extrapolated
+    otherwise) and marked `propagated`, so the model can run on a larger stride.
+    """
+
+    def __init__(self, iou_threshold: float | None = None, centroid_threshold: float | None = None,
+                 max_age: int | None = None, fill_stride: int | None = None):
+        self.iou_threshold = settings.TRACK_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.centroid_threshold = (settings.TRACK_CENTROID_THRESHOLD if centroid_threshold is None
+                                   else centroid_threshold)
+        self.max_age = settings.TRACK_MAX_AGE_FRAMES if max_age is None else max_age
+        self.fill_stride = fill_stride
+
+        self._active: list[_Track] = []
+        self._finished: list[_Track] = []
+        self._next_id = 1
+        self._last_frame: int | None = None
+
+    def process(self, results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Track a batch of frame results in frame order, returning them with any propagated frames added."""
+        output = []
+        for result in results:
+            if "error" in result:
+                output.append(result)
+                continue
+            output.extend(self.update(result))
+        return output
+
+    def update(self, result: dict[str, Any]) -> list[dict[str, Any]]:
+        """Track one frame result in place; returns the propagated frames before it, then the result."""
+        frame = result["frame"]
+        detections = result["detections"]
+        previous_frame = self._last_frame
+        self._retire(frame)
+        # State of the tracks at the previous inferred frame, for filling the frames in between
+        before = {track.track_id: (track, track.box.copy(), track.last_frame) for track in self._active}
+
+        unmatched_tracks = list(range(len(self._active)))
+        unmatched_detections = list(range(len(detections)))
+        for affinity, threshold in ((iou_matrix, self.iou_threshold), (centroid_affinity, self.centroid_threshold)):
+            if not unmatched_tracks or not unmatched_detections:
+                break
+            tracks = [self._active[i] for i in unmatched_tracks]
+            candidates = [detections[j] for j in unmatched_detections]
+            scores = affinity(np.array([track.predict(frame) for track in tracks]),
+                              np.array([detection["bbox"] for detection in candidates], dtype=np.float64))
+            same_class = (np.array([track.class_id for track in tracks])[:, None]
+                          == np.array([detection["class_id"] for detection in candidates])[None, :])
+            pairs = _greedy_match(np.where(same_class, scores, -np.inf), threshold)
+            for row, col in pairs:
+                tracks[row].update(frame, candidates[col])
+                candidates[col]["track_id"] = tracks[row].track_id
+            matched_tracks = {unmatched_tracks[row] for row, _ in pairs}
+            matched_detections = {unmatched_detections[col] for _, col in pairs}
+            unmatched_tracks = [i for i in unmatched_tracks if i not in matched_tracks]
+            unmatched_detections = [j for j in unmatched_detections if j not in matched_detections]
+
+        for j in unmatched_detections:
+            track = _Track(self._next_id, frame, detections[j])
+            self._next_id += 1
+            self._active.append(track)
+            detections[j]["track_id"] = track.track_id
+
+        self._last_frame = frame
+        filled = self._fill(previous_frame, frame, before, result) if previous_frame is not None else []
+        return filled + [result]
+
+    def _fill(self, start: int, end: int, before: dict[int, tuple], result: dict[str, Any]) -> list[dict[str, Any]]:
+        if not self.fill_stride or end - start <= self.fill_stride or not before:
+            return []
+        tracks = [track for track, _, _ in before.values()]
+        boxes = np.array([box for _, box, _ in before.values()])
+        last_frames = np.array([last_frame for _, _, last_frame in before.values()])
+        seen_again = np.array([track.last_frame == end for track in tracks])
+        # Per-frame box change: towards the new observation if the track was seen again, else its velocity
+        steps = np.where(seen_again[:, None],
+                         (np.array([track.box for track in tracks]) - boxes) / (end - last_frames)[:, None],
+                         np.array([track.velocity for track in tracks]))
+
+        frames = np.arange(start + self.fill_stride, end, self.fill_stride)
+        elapsed = frames[:, None] - last_frames[None, :]
+        all_boxes = (boxes[None] + steps[None] * elapsed[:, :, None]).tolist()
+        alive = (elapsed <= self.max_age).tolist()
+
+        filled = []
+        for frame, frame_boxes, frame_alive in zip(frames.tolist(), all_boxes, alive):
+            detections = [{"bbox": box, "confidence": track.confidence, "class_id": track.class_id,
+                           "class_name": track.class_name, "track_id": track.track_id}
+                          for track, box, is_alive in zip(tracks, frame_boxes, frame_alive) if is_alive]
+            filled.append({
+                "frame": frame,
+                "violence_detected": bool(detections),
+                "confidence": max((detection["confidence"] for detection in detections), default=0.0),
+                "detections": detections,
+                "frame_size": result["frame_size"],
+                "propagated": True,
+            })
+        return filled
+
+    def _retire(self, frame: int):
+        alive = []
+        for track in self._active:
+            (alive if frame - track.last_frame <= self.max_age else self._finished).append(track)
+        self._active = alive
+
+    def summary(self, fps: float | None = None) -> list[dict[str, Any]]:
+        """Per-track extent and duration, in order of first appearance."""
+        fps = fps if fps and fps > 0 else None
+        tracks = sorted(self._finished + self._active, key=lambda track: track.track_id)
+        return [{
+            "track_id": track.track_id,
+            "class_id": track.class_id,
+            "class_name": track.class_name,
+            "first_frame": track.first_frame,
+            "last_frame": track.last_frame,
+            "hits": track.hits,
+            "peak_confidence": track.peak_confidence,
+            "start_seconds": round(track.first_frame / fps, 3) if fps else None,
+            "duration_seconds": round((track.last_frame - track.first_frame) / fps, 3) if fps else None,
+        } for track in tracks]
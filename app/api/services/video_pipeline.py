@@ -0,0 +1,326 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Iterator
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.detection import DetectionOptions
+
+# (frame_index, frame, sampling decision metadata or None)
+SampledFrame = tuple[int, np.ndarray, dict[str, Any] | None]
+# (frames_decoded, preprocessed frames, their frame indices, their sampling metadata)
+Batch = tuple[int, list[np.ndarray], list[int], list[dict[str, Any] | None]]
+
+_END = object()
+_ERROR = object()
+
+
+@dataclass
+class StageTimings:
+    """Wall-clock seconds spent in each stage of a video run."""
+    decode_seconds: float = 0.0
+    preprocess_seconds: float = 0.0
+    inference_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    tracking_seconds: float = 0.0
+    # Backpressure: time the decoder waited on a full queue / inference waited on an empty one
+    decode_blocked_seconds: float = 0.0
+    inference_starved_seconds: float = 0.0
+    total_seconds: float = 0.0
+    frames_decoded: int = 0
+    frames_sampled: int = 0
+    frames_gated: int = 0  # candidate frames the motion gate kept away from the model
+    frame_stride: int = 0
+    sampling: str = "grab"
+    pipelined: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        return {key: round(value, 4) if isinstance(value, float) else value for key, value in asdict(self).items()}
+
+
+class MotionGate:
+    """
+    Adaptive sampler deciding which candidate frames are worth running the model on.
+
+    Candidates come every `frame_stride / MOTION_PROBE_DIVISOR` frames. Each is shrunk to a
+    small grayscale thumbnail and compared with the previous candidate (motion spike) and
+    with the last frame sent to the model (change since then):
+
+    - a spike at or above MOTION_HIGH_THRESHOLD is inferred straight away ("motion"), which
+      densifies sampling up to every candidate while the scene is busy;
+    - on the regular stride, a frame is inferred only if it changed by at least
+      MOTION_LOW_THRESHOLD ("regular"), otherwise it is skipped as static;
+    - after MOTION_MAX_SKIPPED_STRIDES strides without inference one frame is inferred
+      regardless ("keepalive"), so slow changes are never missed entirely.
+    """
+
+    def __init__(self, frame_stride: int, timings: StageTimings):
+        self.frame_stride = frame_stride
+        self.probe_stride = max(1, frame_stride // settings.MOTION_PROBE_DIVISOR)
+        self.max_gap = frame_stride * settings.MOTION_MAX_SKIPPED_STRIDES
+        self.timings = timings
+        self._previous: np.ndarray | None = None
+        self._last_inferred: np.ndarray | None = None
+        self._last_inferred_index = 0
+
+    @staticmethod
+    def thumbnail(frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (settings.MOTION_THUMBNAIL_WIDTH, max(1, round(settings.MOTION_THUMBNAIL_WIDTH * height / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    @staticmethod
+    def difference(a: np.ndarray, b: np.ndarray) -> float:
+        """Mean absolute pixel difference, from 0 (identical) to 1."""
+        return float(np.mean(cv2.absdiff(a, b))) / 255
+
+    def admit(self, frame_index: int, frame: np.ndarray) -> dict[str, Any] | None:
+        """Return the decision metadata if the frame should be inferred, None to skip it."""
+        thumbnail = self.thumbnail(frame)
+        previous, self._previous = self._previous, thumbnail
+        if self._last_inferred is None:
+            return self._infer(frame_index, thumbnail, "first", 0.0, 1.0)
+
+        motion = self.difference(thumbnail, previous)
+        change = self.difference(thumbnail, self._last_inferred)
+        gap = frame_index - self._last_inferred_index
+
+        if motion >= settings.MOTION_HIGH_THRESHOLD:
+            return self._infer(frame_index, thumbnail, "motion", motion, change)
+        if gap >= self.frame_stride:
+            if change >= settings.MOTION_LOW_THRESHOLD:
+                return self._infer(frame_index, thumbnail, "regular", motion, change)
+            if gap >= self.max_gap:
+                return self._infer(frame_index, thumbnail, "keepalive", motion, change)
+        self.timings.frames_gated += 1
+        return None
+
+    def _infer(self, frame_index: int, thumbnail: np.ndarray, decision: str, motion: float,
+               change: float) -> dict[str, Any]:
+        self._last_inferred = thumbnail
+        self._last_inferred_index = frame_index
+        return {"decision": decision, "motion_score": round(motion, 4), "change_score": round(change, 4)}
+
+
+class FrameReader:
+    """
+    Yields `(frame_index, frame, sampling_metadata)` for the frames of a capture to run the model on.
+
+    Skipped frames are only grabbed (demuxed and decoded, but never converted into a BGR
+    array); sampled frames are retrieved. When the stride is at least VIDEO_SEEK_MIN_STRIDE
+    the reader seeks straight to the next sampled frame instead, provided a probe shows the
+    container lands on the requested frame (otherwise it keeps grabbing). With
+    `adaptive_sampling` the retrieved frames are candidates filtered by a MotionGate.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, options: DetectionOptions, timings: StageTimings):
+        self.cap = cap
+        self.options = options
+        self.timings = timings
+        self.frame_stride = options.resolve_frame_stride(cap.get(cv2.CAP_PROP_FPS))
+        self.gate = MotionGate(self.frame_stride, timings) if options.adaptive_sampling else None
+        self.read_stride = self.gate.probe_stride if self.gate else self.frame_stride
+        self.frames_decoded = 0
+
+        seek_min_stride = settings.VIDEO_SEEK_MIN_STRIDE
+        self.seek = bool(seek_min_stride) and self.read_stride >= seek_min_stride and self._can_seek()
+        timings.frame_stride = self.frame_stride
+        timings.sampling = ("seek" if self.seek else "grab") + ("+motion" if self.gate else "")
+
+    def __iter__(self) -> Iterator[SampledFrame]:
+        if self.seek:
+            yield from self._seek_frames()
+        else:
+            yield from self._grab_frames()
+
+    def _read(self, retrieve: bool) -> tuple[bool, np.ndarray | None]:
+        started = time.perf_counter()
+        if retrieve:
+            success, frame = self.cap.read()
+        else:
+            success, frame = self.cap.grab(), None
+        self.timings.decode_seconds += time.perf_counter() - started
+        return success, frame
+
+    def _sample(self, frame_index: int, frame: np.ndarray) -> Iterator[SampledFrame]:
+        self.timings.frames_decoded = self.frames_decoded
+        sampling = None
+        if self.gate is not None:
+            sampling = self.gate.admit(frame_index, frame)
+            if sampling is None:
+                return
+        self.timings.frames_sampled += 1
+        yield frame_index, frame, sampling
+
+    def _can_seek(self) -> bool:
+        """Probe whether the container lands on the exact frame requested."""
+        landed = (self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.read_stride)
+                  and int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == self.read_stride)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return landed and int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == 0
+
+    def _grab_frames(self) -> Iterator[SampledFrame]:
+        frame_index = 0
+        while self.cap.isOpened():
+            # Only process every Nth frame
+            sampled = frame_index % self.read_stride == 0
+            success, frame = self._read(retrieve=sampled)
+            if not success:
+                break
+
+            self.frames_decoded = frame_index + 1
+            if sampled:
+                yield from self._sample(frame_index, frame)
+            frame_index += 1
+        self.timings.frames_decoded = self.frames_decoded
+
+    def _seek_frames(self) -> Iterator[SampledFrame]:
+        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_index = 0
+        while self.cap.isOpened():
+            started = time.perf_counter()
+            if frame_index:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            # Label the sample with where the decoder actually is, in case it snapped elsewhere
+            position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            self.timings.decode_seconds += time.perf_counter() - started
+
+            success, frame = self._read(retrieve=True)
+            if not success:
+                break
+            self.frames_decoded = position + 1
+            yield from self._sample(position, frame)
+            frame_index = position + self.read_stride
+
+        # Seeking past the last sample skips the tail, which still counts as covered
+        self.frames_decoded = max(self.frames_decoded, total_frames)
+        self.timings.frames_decoded = self.frames_decoded
+
+
+def _preprocess(preprocess: Callable[[np.ndarray, int], np.ndarray], frame: np.ndarray,
+                options: DetectionOptions, timings: StageTimings) -> np.ndarray:
+    started = time.perf_counter()
+    processed_frame = preprocess(frame, options.input_size)
+    timings.preprocess_seconds += time.perf_counter() - started
+    return processed_frame
+
+
+def sequential_batches(cap: cv2.VideoCapture, options: DetectionOptions,
+                       preprocess: Callable[[np.ndarray, int], np.ndarray], timings: StageTimings) -> Iterator[Batch]:
+    """Decode, preprocess and batch on the calling thread, one frame after another."""
+    reader = FrameReader(cap, options, timings)
+    batch_frames = []
+    batch_indices = []
+    batch_sampling = []
+
+    for frame_index, frame, sampling in reader:
+        batch_frames.append(_preprocess(preprocess, frame, options, timings))
+        batch_indices.append(frame_index)
+        batch_sampling.append(sampling)
+
+        # Hand over the batch when it reaches the desired size
+        if len(batch_frames) >= options.batch_size:
+            yield frame_index + 1, batch_frames, batch_indices, batch_sampling
+            batch_frames = []
+            batch_indices = []
+            batch_sampling = []
+
+    # Any remaining frames make up the last batch
+    if batch_frames:
+        yield reader.frames_decoded, batch_frames, batch_indices, batch_sampling
+
+
+def pipelined_batches(cap: cv2.VideoCapture, options: DetectionOptions,
+                      preprocess: Callable[[np.ndarray, int], np.ndarray], timings: StageTimings,
+                      queue_size: int) -> Iterator[Batch]:
+    """
+    Same batches as sequential_batches, produced by concurrent stages.
+
+    A decoder thread feeds sampled frames into a bounded queue, a preprocess thread resizes
+    them and assembles batches into a second bounded queue, and the caller (the inference
+    stage) consumes full batches. Full queues block the stage upstream of them, so memory
+    stays bounded however far ahead decoding gets.
+    """
+    timings.pipelined = True
+    stop = threading.Event()
+    decoded_frames: queue.Queue = queue.Queue(maxsize=queue_size)
+    batches: queue.Queue = queue.Queue(maxsize=max(1, queue_size // options.batch_size))
+
+    def put(target: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode_stage():
+        try:
+            reader = FrameReader(cap, options, timings)
+            for item in reader:
+                started = time.perf_counter()
+                if not put(decoded_frames, item):
+                    return
+                timings.decode_blocked_seconds += time.perf_counter() - started
+            put(decoded_frames, (_END, reader.frames_decoded, None))
+        except Exception as e:
+            put(decoded_frames, (_ERROR, e, None))
+
+    def preprocess_stage():
+        batch_frames = []
+        batch_indices = []
+        batch_sampling = []
+        try:
+            while not stop.is_set():
+                try:
+                    frame_index, frame, sampling = decoded_frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                if frame_index is _END:
+                    if batch_frames:
+                        put(batches, (frame, batch_frames, batch_indices, batch_sampling))
+                    put(batches, (_END, None, None, None))
+                    return
+                if frame_index is _ERROR:
+                    put(batches, (_ERROR, frame, None, None))
+                    return
+
+                batch_frames.append(_preprocess(preprocess, frame, options, timings))
+                batch_indices.append(frame_index)
+                batch_sampling.append(sampling)
+                if len(batch_frames) >= options.batch_size:
+                    if not put(batches, (frame_index + 1, batch_frames, batch_indices, batch_sampling)):
+                        return
+                    batch_frames = []
+                    batch_indices = []
+                    batch_sampling = []
+        except Exception as e:
+            put(batches, (_ERROR, e, None, None))
+
+    stages = [threading.Thread(target=decode_stage, name="video-decode", daemon=True),
+              threading.Thread(target=preprocess_stage, name="video-preprocess", daemon=True)]
+    for stage in stages:
+        stage.start()
+
+    try:
+        while True:
+            started = time.perf_counter()
+            batch = batches.get()
+            timings.inference_starved_seconds += time.perf_counter() - started
+            if batch[0] is _END:
+                return
+            if batch[0] is _ERROR:
+                raise batch[1]
+            yield batch
+    finally:
+        # Also runs when the consumer stops early; the stages notice and exit
+        stop.set()
+        for stage in stages:
+            stage.join()
@@ -1,195 +1,362 @@
 import pathlib
-from typing import Any
+import threading
+import time
+from typing import Any, Iterator
 
 import cv2
 import numpy as np
 import torch
-from huggingface_hub import hf_hub_download
 from ultralytics import YOLO
 
+from app.api.services.incident_aggregator import IncidentAggregator
+from app.api.services.inference_backends import prepare_model
+from app.api.services.model_resolver import resolve_model
+from app.api.services.tracker import IoUTracker
+from app.api.services.video_pipeline import StageTimings, pipelined_batches, sequential_batches
 from app.core.config import settings
+from app.schemas.detection import DetectionOptions, VideoOutput
 
 
 class ViolenceDetectionService:
-    def __init__(self,model_path: str = None, use_huggingface:bool = True):
+    def __init__(self,model_path: str = None, use_huggingface:bool = True, backend: str | None = None,
+                 replicas: int = 1):
         """
         Initialize teh violence detection service with the YOLO model.
 
         Args:
             model_path: Path to the YOLO model (optional).
+            backend: Inference backend (defaults to INFERENCE_BACKEND).
+            replicas: Copies of the model concurrent callers may run on at once; the extra
+                copies are loaded the first time they are needed.
         """
-        if model_path is None:
-            if use_huggingface:
-                model_path = self._download_from_huggingface()
-            else:
-                base_path = pathlib.Path(__file__).parent.parent.parent.parent
-                model_path =str(base_path / "data" / "best.pt")
+        if model_path is None and not use_huggingface:
+            base_path = pathlib.Path(__file__).parent.parent.parent.parent
+            model_path =str(base_path / "data" / "best.pt")
+        # Local path or HuggingFace cache first; the hub is only contacted if allowed
+        resolved = resolve_model(model_path)
+        model_path = resolved.path
 
         # Use GPU if available
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         print(f"Using device: {self.device}")
+        self.backend = backend or settings.INFERENCE_BACKEND
         # Use half precision for faster inference
-        self.half = True if self.device == 'cuda' else False
-
-        self.model = self._load_model(model_path)
-
-        # YOLOv8 specific parameters
-        self.input_size = (640, 640)
-        self.confidence_threshold = 0.25
-
-        # Move model to appropriate device
-        if hasattr(self.model, 'to'):
-            self.model = self.model.to(self.device)
-
-    def _download_from_huggingface(self) -> str:
-        """Download the model from HuggingFace repository"""
-        try:
-            print("Downloading model from HuggingFace...")
-            model_path = hf_hub_download(repo_id=settings.HUGGING_REPO_ID, filename="best.pt", cache_dir="../models")
-
-            print(f"Model downloaded to: {model_path}")
-            return model_path
-        except Exception as e:
-            print(f"Error downloading from HuggingFace: {str(e)}")
-            raise RuntimeError(f"Failed to download model from HuggingFace: {e}")
+        self.half = True if self.device == 'cuda' and self.backend == 'torch' else False
+
+        self.model_path = model_path
+        self.model_source = resolved.source
+        # Identifies the weights in cache keys, stable across restarts and workers
+        self.model_sha256 = resolved.sha256
+        # Cold start breakdown, in seconds
+        self.startup_timings = {"resolve": resolved.resolve_seconds, "checksum": resolved.checksum_seconds}
+
+        started = time.perf_counter()
+        # What the backend actually loads (the weights themselves, or their cached export)
+        self.artifact_path = prepare_model(model_path, self.backend, self.model_sha256)
+        self.startup_timings["prepare_backend"] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.model = self._build_model()
+        self.startup_timings["load"] = time.perf_counter() - started
+        # Ultralytics predictors keep per-call state, so each concurrent caller checks out
+        # a model of its own; once `replicas` are busy further callers wait for one.
+        self.replicas = max(1, replicas)
+        self._idle_models = [self.model]
+        self._model_count = 1
+        self._model_available = threading.Condition()
+
+        # Defaults used when a caller doesn't pass its own options
+        self.default_options = DetectionOptions()
+        # Prediction format of the loaded model ("ultralytics", "array" or "predictions"),
+        # settled by the warm-up pass or else the first parsed result
+        self.result_format: str | None = None
+
+    def _build_model(self):
+        model = self._load_model(self.artifact_path)
+        # Move model to appropriate device (exported backends pick their device at load)
+        if self.backend == 'torch' and hasattr(model, 'to'):
+            model = model.to(self.device)
+        return model
 
     def _load_model(self, model_path: str):
         """Load the YOLOv8 model."""
         try:
             print(f"Loading model from: {model_path}")
-            model = YOLO(model_path)
+            model = YOLO(model_path, task="detect")
             return model
         except Exception as e:
             print(f"Error loading model: {str(e)}")
             raise RuntimeError(f"Failed to load model: {e}")
 
-    def process_video(self, video_path: str) -> list[dict[Any, Any]]:
+    def _acquire_model(self):
+        with self._model_available:
+            while not self._idle_models and self._model_count >= self.replicas:
+                self._model_available.wait()
+            if self._idle_models:
+                return self._idle_models.pop()
+            self._model_count += 1
+        try:
+            return self._build_model()
+        except Exception:
+            with self._model_available:
+                self._model_count -= 1
+                self._model_available.notify()
+            raise
+
+    def _release_model(self, model):
+        with self._model_available:
+            self._idle_models.append(model)
+            self._model_available.notify()
+
+    def predict(self, source, **kwargs):
+        """
+        Run the model on a frame or a list of frames. Safe to call from several threads; up
+        to `replicas` calls run in parallel.
+        """
+        model = self._acquire_model()
+        try:
+            return model(source, **kwargs)
+        finally:
+            self._release_model(model)
+
+    def warmup(self):
+        """Run a dummy forward pass so the first real request doesn't pay for lazy initialisation."""
+        started = time.perf_counter()
+        size = self.default_options.input_size
+        dummy_frame = np.zeros((size, size, 3), dtype=np.uint8)
+        results = self.predict([dummy_frame], **self._model_kwargs(self.default_options))
+        self.result_format = self._detect_result_format(results[0])
+        self.startup_timings["warmup"] = time.perf_counter() - started
+
+    def _model_kwargs(self, options: DetectionOptions) -> dict[str, Any]:
+        """Per-call keyword arguments for the forward pass."""
+        kwargs = {"conf": options.confidence, "imgsz": options.input_size, "max_det": options.max_detections,
+                  "verbose": False}
+        # Only pass `half` when it's on; an explicit half=False is flagged as deprecated for exported models
+        if self.half:
+            kwargs["half"] = True
+        return kwargs
+
+    @staticmethod
+    def open_video(video_path: str) -> tuple[cv2.VideoCapture, dict[str, Any]]:
+        """Open a video once and read its metadata from the same capture handle."""
         cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return [{"error": "Could not open video file."}]
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = float(cap.get(cv2.CAP_PROP_FPS))
+        metadata = {
+            "total_frames": total_frames,
+            "fps": fps,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "duration_seconds": round(total_frames / fps, 3) if fps > 0 else None,
+        }
+        return cap, metadata
 
+    def process_video(self, video_path: str, options: DetectionOptions | None = None) -> list[dict[Any, Any]]:
+        """Run detection over the sampled frames of a video and return every frame result."""
         frames_results = []
-        frame_count = 0
-        batch_size = 4  # Process 4 frames at once
-        batch_frames = []
-        batch_indices = []
-
-        while cap.isOpened():
-            success, frame = cap.read()
-            if not success:
-                break
-
-            # Only process every Nth frame
-            if frame_count % 10 == 0:
-                processed_frame = self._preprocess_frame(frame)
-                batch_frames.append(processed_frame)
-                batch_indices.append(frame_count)
-
-                # Process batch when it reaches the desired size
-                if len(batch_frames) >= batch_size:
-                    results = self.model(batch_frames, verbose=False)  # Add verbose=False to reduce logging
-
-                    for i, result in enumerate(results):
-                        frame_results = self._parse_result(result, batch_indices[i], batch_frames[i].shape)
-                        frames_results.append(frame_results)
-
-                    batch_frames = []
-                    batch_indices = []
-
-            frame_count += 1
+        for _, batch_results in self.iter_video(video_path, options):
+            frames_results.extend(batch_results)
+        return frames_results
 
+    def analyze_video(self, video_path: str, options: DetectionOptions | None = None,
+                      output: VideoOutput = "frames") -> dict[str, Any]:
+        """
+        Like process_video, but also returns the video metadata read from the same capture handle.
 
-        # Process any remaining frames in the last batch
-        if batch_frames:
-            results = self.model(batch_frames, verbose=False)
-            for i, result in enumerate(results):
-                frame_results = self._parse_result(result, batch_indices[i], batch_frames[i].shape)
-                frames_results.append(frame_results)
+        With `output` "incidents" or "both" the frame results are merged into incidents as they
+        are produced; "incidents" alone doesn't keep the frame results at all.
+        """
+        options = options or self.default_options
+        cap, metadata = self.open_video(video_path)
+        timings = StageTimings()
+        aggregator = self.incident_aggregator(metadata, options) if output != "frames" else None
+        tracker = self.tracker(options, metadata["fps"]) if options.tracking else None
+        results = []
+        incidents = []
+        processed_frames = 0
+        for _, batch_results in self.iter_video(video_path, options, capture=cap, timings=timings, tracker=tracker):
+            processed_frames += len(batch_results)
+            if output != "incidents":
+                results.extend(batch_results)
+            if aggregator is not None:
+                incidents.extend(aggregator.update(batch_results))
+
+        analysis = {}
+        if output != "incidents":
+            analysis["results"] = results
+        if aggregator is not None:
+            analysis["incidents"] = incidents + aggregator.finish()
+        if tracker is not None:
+            analysis["tracks"] = tracker.summary(metadata["fps"])
+        analysis["metadata"] = {**metadata, "processed_frames": processed_frames, "timings": timings.as_dict()}
+        return analysis
+
+    def incident_aggregator(self, metadata: dict[str, Any], options: DetectionOptions | None = None
+                            ) -> IncidentAggregator:
+        """Incident aggregator for a video with the given metadata, sampled with `options`."""
+        options = options or self.default_options
+        return IncidentAggregator(metadata["fps"], frame_stride=options.resolve_frame_stride(metadata["fps"]))
+
+    @staticmethod
+    def tracker(options: DetectionOptions, fps: float) -> IoUTracker:
+        """Tracker for a video at `fps` sampled with `options`; tracks survive at least two strides."""
+        max_age = max(settings.TRACK_MAX_AGE_FRAMES, 2 * options.resolve_frame_stride(fps))
+        return IoUTracker(max_age=max_age, fill_stride=options.track_fill_stride)
+
+    def stream_video(self, video_path: str, options: DetectionOptions | None = None,
+                     output: VideoOutput = "frames") -> Iterator[tuple[str, Any]]:
+        """
+        Streaming counterpart of analyze_video.
 
-        cap.release()
-        return frames_results
+        Yields `("metadata", metadata)` once, then `("batch", (frames_decoded, batch_results))`
+        for every processed batch and finally `("timings", stage_timings)`. Unless `output` is
+        "frames", `("incidents", closed_incidents)` follows every batch that closed incidents
+        (batch results are still yielded for progress; callers decide whether to forward them).
+        With tracking enabled, `("tracks", track_summary)` comes right before the timings.
+        """
+        options = options or self.default_options
+        cap, metadata = self.open_video(video_path)
+        timings = StageTimings()
+        aggregator = self.incident_aggregator(metadata, options) if output != "frames" else None
+        tracker = self.tracker(options, metadata["fps"]) if options.tracking else None
+        yield "metadata", metadata
+        for batch in self.iter_video(video_path, options, capture=cap, timings=timings, tracker=tracker):
+            yield "batch", batch
+            if aggregator is not None and (incidents := aggregator.update(batch[1])):
+                yield "incidents", incidents
+        if aggregator is not None and (incidents := aggregator.finish()):
+            yield "incidents", incidents
+        if tracker is not None:
+            yield "tracks", tracker.summary(metadata["fps"])
+        yield "timings", timings.as_dict()
+
+    def iter_video(self, video_path: str, options: DetectionOptions | None = None,
+                   capture: cv2.VideoCapture | None = None, timings: StageTimings | None = None,
+                   tracker: IoUTracker | None = None) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+        """
+        Run detection over the sampled frames of a video, yielding as each batch completes.
 
-    def _preprocess_frame(self, frame):
+        Yields `(frames_decoded, batch_results)` so callers can stream results or report
+        progress without holding the whole video's results in memory. An already opened
+        `capture` is used (and released) instead of opening `video_path` again, and per-stage
+        timings are accumulated into `timings` if one is passed. With `options.tracking` the
+        results go through `tracker` (a new one unless passed), which may add propagated frames.
+        """
+        options = options or self.default_options
+        cap = capture if capture is not None else cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            yield 0, [{"error": "Could not open video file."}]
+            return
+
+        timings = timings if timings is not None else StageTimings()
+        if options.tracking and tracker is None:
+            tracker = self.tracker(options, cap.get(cv2.CAP_PROP_FPS))
+        if settings.VIDEO_PIPELINE_ENABLED:
+            batches = pipelined_batches(cap, options, self._preprocess_frame, timings, settings.VIDEO_PIPELINE_QUEUE_SIZE)
+        else:
+            batches = sequential_batches(cap, options, self._preprocess_frame, timings)
+
+        started = time.perf_counter()
+        try:
+            for frames_decoded, batch_frames, batch_indices, batch_sampling in batches:
+                batch_results = self._process_batch(batch_frames, batch_indices, batch_sampling, options, timings)
+                if tracker is not None:
+                    tracking_started = time.perf_counter()
+                    batch_results = tracker.process(batch_results)
+                    timings.tracking_seconds += time.perf_counter() - tracking_started
+                yield frames_decoded, batch_results
+        finally:
+            # Stop the decode/preprocess stages before the capture they read from is released
+            batches.close()
+            cap.release()
+            timings.total_seconds = time.perf_counter() - started
+
+    def _process_batch(self, batch_frames: list[np.ndarray], batch_indices: list[int],
+                       batch_sampling: list[dict[str, Any] | None], options: DetectionOptions,
+                       timings: StageTimings) -> list[dict[str, Any]]:
+        started = time.perf_counter()
+        results = self.predict(batch_frames, **self._model_kwargs(options))
+        parse_started = time.perf_counter()
+        parsed = [self._parse_result(result, batch_indices[i], batch_frames[i].shape, options)
+                  for i, result in enumerate(results)]
+        for frame_result, sampling in zip(parsed, batch_sampling):
+            if sampling is not None:
+                # Why the adaptive sampler picked this frame
+                frame_result["sampling"] = sampling
+        timings.inference_seconds += parse_started - started
+        timings.parse_seconds += time.perf_counter() - parse_started
+        return parsed
+
+    def _preprocess_frame(self, frame, input_size: int = 320):
         """
              Preprocess a frame for the YOLOv8 model.
              For YOLOv8, we typically just need to ensure it's in the right format.
              """
         # YOLOv8 from Ultralytics can handle preprocessing internally
         # We just need to make sure the image is in BGR format (OpenCV default)
-        resized_frame = cv2.resize(frame, (320, 320)) # Half the standard 640x640
+        resized_frame = cv2.resize(frame, (input_size, input_size))
         return resized_frame
 
-    def _parse_result(self, results,  frame_number:int, original_shape: tuple)->dict[str, Any]:
-        """Parse the model predictions into a standardized format"""
-        violence_detected = False
-        max_confidence = 0.0
-        detections = []
+    def _prepare_image(self, image: np.ndarray, options: DetectionOptions) -> tuple[np.ndarray, tuple[float, float]]:
+        """
+        Turn a decoded image into the model input according to IMAGE_INFERENCE_MODE.
+
+        Returns the frame to feed the model and the (x, y) factors mapping its box coordinates
+        back onto the original image.
+        """
+        if settings.IMAGE_INFERENCE_MODE == "native":
+            # The model letterboxes to imgsz itself and reports boxes in original coordinates
+            return image, (1.0, 1.0)
+
+        height, width = image.shape[:2]
+        frame = self._preprocess_frame(image, options.input_size)
+        return frame, (width / options.input_size, height / options.input_size)
+
+    @staticmethod
+    def _detect_result_format(result) -> str:
+        """Work out which of the supported prediction formats the loaded model produces."""
+        # Modern Ultralytics YOLO format
+        if hasattr(result, 'boxes') and hasattr(result, 'names'):
+            return "ultralytics"
+        # Older YOLOv8 or pickle exports: rows of [x1, y1, x2, y2, confidence, class_id]
+        if isinstance(result, np.ndarray) and result.ndim == 2:
+            return "array"
+        # Plain dictionary of predictions
+        if isinstance(result, dict) and 'predictions' in result:
+            return "predictions"
+        raise ValueError(f"Unsupported prediction format: {type(result).__name__}")
+
+    def _parse_result(self, results, frame_number: int, original_shape: tuple,
+                      options: DetectionOptions | None = None,
+                      scale: tuple[float, float] = (1.0, 1.0)) -> dict[str, Any]:
+        """
+        Parse the model predictions into a standardized format.
 
-        try:
-            # Handle different possible formats of YOLOv8 results
-
-            # If results is a list (common format for newer YOLOv8)
-            if hasattr(results, 'boxes') and hasattr(results, 'names'):
-                # Modern Ultralytics YOLO format
-                boxes = results.boxes.cpu().numpy()
-                for box in boxes:
-                    # Extract data from the box
-                    x1, y1, x2, y2 = box.xyxy[0]  # Box coordinates
-                    confidence = box.conf[0]  # Confidence score
-                    class_id = int(box.cls[0])  # Class ID
-                    class_name = results.names[class_id]  # Class name
-
-                    if confidence > self.confidence_threshold:
-                        violence_detected = True
-                        max_confidence = max(max_confidence, float(confidence))
-
-                        detections.append({
-                            "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                            "confidence": float(confidence),
-                            "class_id": class_id,
-                            "class_name": class_name
-                        })
-
-            # Alternative format for older YOLOv8 or pickle exports
-            elif isinstance(results, np.ndarray) and results.ndim == 2:
-                # Format: [x1, y1, x2, y2, confidence, class_id]
-                for detection in results:
-                    if len(detection) >= 6:  # Make sure we have all needed values
-                        x1, y1, x2, y2, confidence, class_id = detection[:6]
-
-                        if confidence > self.confidence_threshold:
-                            violence_detected = True
-                            max_confidence = max(max_confidence, float(confidence))
-
-                            detections.append({
-                                "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                                "confidence": float(confidence),
-                                "class_id": int(class_id),
-                                "class_name": f"class_{int(class_id)}"  # No class names available
-                            })
-
-            # Another possible format
-            elif isinstance(results, list):
-                for result in results:
-                    if hasattr(result, 'boxes'):
-                        # Process each result's boxes
-                        for box in result.boxes.cpu().numpy():
-                            # Similar processing as above
-                            confidence = box.conf[0]
-                            if confidence > self.confidence_threshold:
-                                violence_detected = True
-                                max_confidence = max(max_confidence, confidence)
-                                # Add detection (similar to above)
-
-            # Yet another possible format (plain dictionary)
-            elif isinstance(results, dict) and 'predictions' in results:
-                for pred in results['predictions']:
-                    confidence = pred.get('confidence', 0)
-                    if confidence > self.confidence_threshold:
-                        violence_detected = True
-                        max_confidence = max(max_confidence, confidence)
-                        # Add detection with available data
+        `scale` maps box coordinates from the model input back to `original_shape`. The
+        prediction format is detected on the first result (normally the warm-up pass) and
+        reused for every frame after that.
+        """
+        options = options or self.default_options
 
+        try:
+            if self.result_format is None:
+                self.result_format = self._detect_result_format(results)
+
+            if self.result_format == "ultralytics":
+                # One device-to-host copy; conf and cls are the last two columns (a track id may precede them)
+                data = results.boxes.data.cpu().numpy()
+                max_confidence, detections = self._parse_boxes(data[:, :4], data[:, -2], data[:, -1], results.names,
+                                                               options, scale)
+            elif self.result_format == "array":
+                rows = results[:, :6] if results.shape[1] >= 6 else np.empty((0, 6), dtype=np.float32)
+                max_confidence, detections = self._parse_boxes(rows[:, :4], rows[:, 4], rows[:, 5], None,
+                                                               options, scale)
+            else:
+                confidences = np.array([pred.get('confidence', 0) for pred in results['predictions']], dtype=float)
+                confidences = confidences[confidences > options.confidence]
+                max_confidence = float(confidences.max()) if confidences.size else 0.0
+                # No box data available in this format
+                detections = []
         except Exception as e:
             return {
                 "frame": frame_number,
@@ -198,33 +365,84 @@ class ViolenceDetectionService:
 
         return {
             "frame": frame_number,
-            "violence_detected": violence_detected,
-            "confidence": float(max_confidence),
+            # Only predictions above the (non-negative) threshold count, so any of them makes this positive
+            "violence_detected": max_confidence > 0,
+            "confidence": max_confidence,
             "detections": detections,
             "frame_size": {"height": original_shape[0], "width": original_shape[1]}
         }
 
+    @staticmethod
+    def _parse_boxes(xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray, names: dict | None,
+                     options: DetectionOptions, scale: tuple[float, float]) -> tuple[float, list[dict[str, Any]]]:
+        """Threshold and convert box arrays in bulk, returning the max confidence and the detections."""
+        keep = confidences > options.confidence
+        if not keep.any():
+            return 0.0, []
+
+        confidences = confidences[keep]
+        max_confidence = float(confidences.max())
+        limit = options.max_detections
+        bboxes = xyxy[keep][:limit].astype(np.float64) * np.array([scale[0], scale[1], scale[0], scale[1]])
+        class_ids = class_ids[keep][:limit].astype(int).tolist()
+        class_names = [names[class_id] for class_id in class_ids] if names is not None \
+            else [f"class_{class_id}" for class_id in class_ids]  # No class names available
+
+        return max_confidence, [
+            {"bbox": bbox, "confidence": confidence, "class_id": class_id, "class_name": class_name}
+            for bbox, confidence, class_id, class_name
+            in zip(bboxes.tolist(), confidences[:limit].tolist(), class_ids, class_names)
+        ]
+
+    @staticmethod
+    def decode_image(image_data: bytes) -> np.ndarray | None:
+        """Decode an encoded image (JPEG, PNG, ...) into a BGR array, or None if it can't be decoded."""
+        nparr = np.frombuffer(image_data, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    def detect_batch(self, images: list[np.ndarray], options: list[DetectionOptions]) -> list[dict[str, Any]]:
+        """
+        Detect on several decoded images with as few forward passes as possible.
 
-    def detect_from_image(self, image_data):
+        Images are grouped by input size (one forward pass per group) and each result is parsed
+        with the options of the request it belongs to.
+        """
+        parsed: list[dict[str, Any] | None] = [None] * len(images)
+        groups: dict[int, list[int]] = {}
+        for i, image_options in enumerate(options):
+            groups.setdefault(image_options.input_size, []).append(i)
+
+        for input_size, indices in groups.items():
+            prepared = [self._prepare_image(images[i], options[i]) for i in indices]
+            # Run with the loosest settings in the group; each request is filtered by its own options when parsing
+            group_options = DetectionOptions(
+                confidence=min(options[i].confidence for i in indices),
+                input_size=input_size,
+                max_detections=max(options[i].max_detections for i in indices),
+            )
+            results = self.predict([frame for frame, _ in prepared], **self._model_kwargs(group_options))
+            for i, (_, scale), result in zip(indices, prepared, results):
+                parsed[i] = self._parse_result(result, 0, images[i].shape, options[i], scale)
+
+        return parsed
+
+    def detect_from_image(self, image_data, options: DetectionOptions | None = None):
         """Process a single image for violence/crime detection."""
+        options = options or self.default_options
         try:
             # Convert from bytes to OpenCV format if needed
             if isinstance(image_data, bytes):
-                nparr = np.frombuffer(image_data, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                image = self.decode_image(image_data)
             else:
                 image = image_data
 
-            # Get predictions
-            results = self.model(image)
-
-            # Resize image for faster processing
-            image = cv2.resize(image, (320, 320))
+            if image is None:
+                return {"error": "Could not decode image"}
 
-            # Get predictions with optimized parameters
-            results = self.model(image, half=self.half, verbose=False)
+            # Single forward pass; boxes come back in the uploaded image's coordinates
+            frame, scale = self._prepare_image(image, options)
+            results = self.predict([frame], **self._model_kwargs(options))
 
-            # Parse results
-            return self._parse_result(results, 0, image.shape)
+            return self._parse_result(results[0], 0, image.shape, options, scale)
         except Exception as e:
             return {"error": str(e)}
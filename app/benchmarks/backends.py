@@ -0,0 +1,220 @@
+"""
+Check exported inference backends against PyTorch fp32 and compare their speed and memory.
+
+    python -m app.benchmarks.backends FIXTURES [--backends onnx onnx-int8 onnx-int8-static]
+        [--calibration CALIBRATION] [--frames 64] [--input-size 320] [--batch-size 4]
+        [--confidence 0.25] [--strict]
+
+FIXTURES is a video, an image, or a directory of them; frames are spread evenly over it.
+CALIBRATION (QUANT_CALIBRATION_PATH by default) is what the static int8 export calibrates
+on. Both should be footage of the cameras the service watches, and they must not share
+files, so quantized backends are scored on frames they weren't calibrated on; the command
+refuses to run otherwise. The accuracy delta treats the PyTorch detections as ground
+truth: mAP@0.5 of each backend's detections, frame verdict and detection count agreement,
+mean IoU of paired boxes and the largest confidence difference. With `--strict` the
+command exits non-zero if a backend falls outside its PARITY_TOLERANCES. Throughput is
+measured over the same frames at the given batch size, and the resident memory of a
+worker is measured in a fresh process per backend (needs psutil: `pip install .[benchmarks]`).
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # only needed for worker_rss_mb
+    psutil = None
+
+from app.api.services.inference_backends import media_sources, sample_frames
+from app.api.services.tracker import iou_matrix
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.core.config import settings
+from app.schemas.detection import DetectionOptions
+
+# Minimum verdict agreement / paired IoU / mAP and maximum confidence difference a backend must
+# meet; fp32 exports should match PyTorch closely, int8 ones are allowed to drift a little
+PARITY_TOLERANCES = {
+    "onnx": {"verdict_agreement": 0.98, "mean_iou": 0.9, "map50": 0.9, "max_confidence_delta": 0.05},
+    "openvino": {"verdict_agreement": 0.98, "mean_iou": 0.9, "map50": 0.9, "max_confidence_delta": 0.05},
+    "onnx-int8": {"verdict_agreement": 0.95, "mean_iou": 0.85, "map50": 0.8, "max_confidence_delta": 0.1},
+    "onnx-int8-static": {"verdict_agreement": 0.95, "mean_iou": 0.85, "map50": 0.8, "max_confidence_delta": 0.1},
+}
+
+
+def detect(service: ViolenceDetectionService, frames: list[np.ndarray], options: DetectionOptions
+           ) -> tuple[list[dict], float]:
+    results = []
+    started = time.perf_counter()
+    for start in range(0, len(frames), options.batch_size):
+        batch = [service._preprocess_frame(frame, options.input_size) for frame in frames[start:start + options.batch_size]]
+        predictions = service.predict(batch, **service._model_kwargs(options))
+        results.extend(service._parse_result(prediction, start + i, batch[i].shape, options)
+                       for i, prediction in enumerate(predictions))
+    return results, time.perf_counter() - started
+
+
+def average_precision(reference: list[dict], candidate: list[dict], iou_threshold: float = 0.5) -> float:
+    """mAP of `candidate` detections against `reference` detections taken as ground truth."""
+    aps = []
+    classes = {d["class_id"] for result in reference for d in result["detections"]}
+    for class_id in classes:
+        truth = {r["frame"]: np.array([d["bbox"] for d in r["detections"] if d["class_id"] == class_id]).reshape(-1, 4)
+                 for r in reference}
+        total = sum(len(boxes) for boxes in truth.values())
+        predictions = sorted(((d["confidence"], r["frame"], d["bbox"]) for r in candidate for d in r["detections"]
+                              if d["class_id"] == class_id), key=lambda p: -p[0])
+        used = {frame: np.zeros(len(boxes), dtype=bool) for frame, boxes in truth.items()}
+        hits = []
+        for _, frame, box in predictions:
+            boxes = truth.get(frame, np.empty((0, 4)))
+            overlap = iou_matrix(np.array([box]), boxes)[0] if len(boxes) else np.empty(0)
+            overlap[used[frame]] = 0
+            best = int(overlap.argmax()) if overlap.size else -1
+            hit = best >= 0 and overlap[best] >= iou_threshold
+            if hit:
+                used[frame][best] = True
+            hits.append(hit)
+        hits = np.array(hits, dtype=float)
+        true_positives = np.cumsum(hits)
+        recall = true_positives / total
+        precision = true_positives / np.arange(1, len(hits) + 1)
+        # All-point interpolation of the precision/recall curve
+        precision = np.maximum.accumulate(np.concatenate([precision, [0.0]])[::-1])[::-1]
+        aps.append(float(np.sum(np.diff(np.concatenate([[0.0], recall])) * precision[:-1])) if len(hits) else 0.0)
+    return float(np.mean(aps)) if aps else 1.0
+
+
+def compare(reference: list[dict], candidate: list[dict]) -> dict:
+    verdicts = counts = 0
+    ious, confidence_deltas = [], [0.0]
+    for expected, actual in zip(reference, candidate):
+        verdicts += expected["violence_detected"] == actual["violence_detected"]
+        counts += len(expected["detections"]) == len(actual["detections"])
+        if not expected["detections"] or not actual["detections"]:
+            continue
+        overlap = iou_matrix(np.array([d["bbox"] for d in expected["detections"]]),
+                             np.array([d["bbox"] for d in actual["detections"]]))
+        best = overlap.argmax(axis=1)
+        for i, j in enumerate(best.tolist()):
+            ious.append(float(overlap[i, j]))
+            confidence_deltas.append(abs(expected["detections"][i]["confidence"] - actual["detections"][j]["confidence"]))
+    frames = len(reference)
+    return {
+        "map50": round(average_precision(reference, candidate), 4),
+        "verdict_agreement": round(verdicts / frames, 4),
+        "count_agreement": round(counts / frames, 4),
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else 1.0,
+        "max_confidence_delta": round(max(confidence_deltas), 4),
+    }
+
+
+def within_tolerance(parity: dict, backend: str) -> bool:
+    tolerances = PARITY_TOLERANCES[backend]
+    return (parity["verdict_agreement"] >= tolerances["verdict_agreement"]
+            and parity["mean_iou"] >= tolerances["mean_iou"]
+            and parity["map50"] >= tolerances["map50"]
+            and parity["max_confidence_delta"] <= tolerances["max_confidence_delta"])
+
+
+def shared_sources(fixtures: str | pathlib.Path, calibration: str | pathlib.Path) -> list[pathlib.Path]:
+    """Evaluation files that are also calibration files, by content so copies count too."""
+    def digest(path: pathlib.Path) -> str:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+    calibrated = {digest(path) for path in media_sources(calibration)}
+    return [path for path in media_sources(fixtures) if digest(path) in calibrated]
+
+
+def _worker_memory(model_path: str, backend: str, frames: list[np.ndarray], options: DetectionOptions, queue):
+    service = ViolenceDetectionService(model_path=model_path, backend=backend)
+    service.warmup()
+    detect(service, frames, options)
+    queue.put(psutil.Process().memory_info().rss)
+
+
+def worker_memory_mb(model_path: str, backend: str, frames: list[np.ndarray], options: DetectionOptions
+                     ) -> float | None:
+    """
+    Resident memory of a fresh process that loaded `backend` and ran a batch, like an
+    inference worker. None when psutil isn't installed.
+    """
+    if psutil is None:
+        return None
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_worker_memory, args=(model_path, backend, frames, options, queue))
+    process.start()
+    rss = queue.get()
+    process.join()
+    return round(rss / (1024 * 1024), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    parser.add_argument("--calibration", default=settings.QUANT_CALIBRATION_PATH)
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--input-size", type=int, default=320)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--confidence", type=float, default=0.25)
+    parser.add_argument("--model-path")
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+
+    if "onnx-int8-static" in args.backends:
+        if not args.calibration:
+            sys.exit("onnx-int8-static needs --calibration (or QUANT_CALIBRATION_PATH)")
+        if shared := shared_sources(args.fixtures, args.calibration):
+            sys.exit(f"Evaluation fixtures are also calibration inputs: {', '.join(map(str, shared))}")
+        # The environment too, for the worker_rss_mb processes
+        settings.QUANT_CALIBRATION_PATH = os.environ["QUANT_CALIBRATION_PATH"] = args.calibration
+
+    frames = sample_frames(media_sources(args.fixtures), args.frames)
+    model_path = args.model_path or settings.MODEL_PATH
+    options = DetectionOptions(confidence=args.confidence, input_size=args.input_size, batch_size=args.batch_size)
+    report = {"fixtures": args.fixtures, "calibration": args.calibration, "frames": len(frames),
+              "input_size": args.input_size, "batch_size": args.batch_size, "backends": {}}
+
+    reference = None
+    failed = []
+    for backend in ["torch", *args.backends]:
+        load_started = time.perf_counter()
+        service = ViolenceDetectionService(model_path=model_path, backend=backend)
+        service.warmup()
+        load_seconds = time.perf_counter() - load_started
+        detect(service, frames[:args.batch_size], options)  # settle allocations before timing
+        results, seconds = detect(service, frames, options)
+
+        artifact = pathlib.Path(service.artifact_path)
+        entry = {"artifact": str(artifact), "load_seconds": round(load_seconds, 3),
+                 "artifact_mb": round(sum(p.stat().st_size for p in ([artifact] if artifact.is_file()
+                                                                      else artifact.rglob("*"))) / (1024 * 1024), 1),
+                 "worker_rss_mb": worker_memory_mb(model_path, backend, frames[:args.batch_size], options),
+                 "frames_per_second": round(len(frames) / seconds, 2),
+                 "ms_per_frame": round(seconds / len(frames) * 1000, 2)}
+        if reference is None:
+            reference = results
+        else:
+            entry["accuracy"] = compare(reference, results)
+            entry["within_tolerance"] = within_tolerance(entry["accuracy"], backend)
+            entry["speedup"] = round(entry["frames_per_second"] / report["backends"]["torch"]["frames_per_second"], 2)
+            if not entry["within_tolerance"]:
+                failed.append(backend)
+        report["backends"][backend] = entry
+
+    print(json.dumps(report, indent=2))
+    if args.strict and failed:
+        sys.exit(f"Backends outside parity tolerance: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Sweep process/thread layouts for CPU inference and report the fastest one.
+
+    python -m app.benchmarks.cpu_threads FIXTURES [--processes 1 2 4] [--threads 1 2 4 8]
+        [--frames 32] [--batch-size 4] [--input-size 320] [--affinity]
+
+For every combination, that many processes (like web workers or process-mode inference
+workers) each load the model with the given intra-op threads, wait for each other and then
+run the same frames concurrently. The report lists aggregate throughput and median batch
+latency per layout, the auto-sized plan CpuResourceManager would pick on this host, and the
+best layout with the settings that reproduce it.
+"""
+import argparse
+import json
+import multiprocessing
+import pathlib
+import statistics
+import time
+
+from app.api.services.inference_backends import sample_frames
+from app.core.cpu_resources import CpuPlan, available_cores, cpu_resources, plan
+from app.core.config import settings
+from app.schemas.detection import DetectionOptions
+
+
+def _worker(index: int, cpu_plan: CpuPlan, frames, options: DetectionOptions, barrier, queue):
+    import os
+
+    from app.api.services.violence_detection_service import ViolenceDetectionService
+
+    cpu_resources.configure(cpu_plan, pin=False)
+    if cpu_plan.affinity:
+        os.sched_setaffinity(0, cpu_plan.affinity)
+    service = ViolenceDetectionService(model_path=settings.MODEL_PATH)
+    service.warmup()
+    kwargs = service._model_kwargs(options)
+    batches = [[service._preprocess_frame(frame, options.input_size) for frame in frames[start:start + options.batch_size]]
+               for start in range(0, len(frames), options.batch_size)]
+
+    barrier.wait()
+    latencies = []
+    started = time.perf_counter()
+    for batch in batches:
+        batch_started = time.perf_counter()
+        service.predict(batch, **kwargs)
+        latencies.append(time.perf_counter() - batch_started)
+    queue.put((index, time.perf_counter() - started, latencies))
+
+
+def run_layout(processes: int, threads: int, frames, options: DetectionOptions, affinity: bool) -> dict:
+    cores = available_cores()
+    share = max(1, len(cores) // processes)
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    queue = context.Queue()
+    workers = []
+    for index in range(processes):
+        cpu_plan = CpuPlan(cores=len(cores), processes=processes, intra_op_threads=threads, inter_op_threads=1,
+                           opencv_threads=max(1, threads // 2), slot=index if affinity else None,
+                           affinity=(cores[index * share:(index + 1) * share] or cores) if affinity else None)
+        worker = context.Process(target=_worker, args=(index, cpu_plan, frames, options, barrier, queue))
+        worker.start()
+        workers.append(worker)
+    outcomes = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    elapsed = max(seconds for _, seconds, _ in outcomes)
+    latencies = [latency for _, _, worker_latencies in outcomes for latency in worker_latencies]
+    return {
+        "processes": processes,
+        "intra_op_threads": threads,
+        "total_threads": processes * threads,
+        "frames_per_second": round(processes * len(frames) / elapsed, 2),
+        "median_batch_ms": round(statistics.median(latencies) * 1000, 1),
+    }
+
+
+def main():
+    cores = len(available_cores())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures")
+    parser.add_argument("--processes", type=int, nargs="+", default=sorted({1, 2, 4} | {max(1, cores // 2)}))
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=sorted({1, 2, 4, max(1, cores // 2), cores}))
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--input-size", type=int, default=320)
+    parser.add_argument("--affinity", action="store_true")
+    args = parser.parse_args()
+
+    fixtures = pathlib.Path(args.fixtures)
+    sources = sorted(p for p in fixtures.rglob("*") if p.is_file()) if fixtures.is_dir() else [fixtures]
+    frames = sample_frames(sources, args.frames)
+    options = DetectionOptions(input_size=args.input_size, batch_size=args.batch_size)
+
+    layouts = [run_layout(processes, threads, frames, options, args.affinity)
+               for processes in args.processes for threads in args.threads]
+    best = max(layouts, key=lambda layout: layout["frames_per_second"])
+    print(json.dumps({
+        "cores": cores,
+        "affinity": args.affinity,
+        "layouts": layouts,
+        "auto_plans": {processes: plan(processes).as_dict() for processes in args.processes},
+        "best": best,
+        "best_settings": {"CPU_INTRA_OP_THREADS": best["intra_op_threads"],
+                          "model processes (WEB_CONCURRENCY x INFERENCE_WORKERS)": best["processes"]},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
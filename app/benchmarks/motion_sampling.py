@@ -0,0 +1,88 @@
+"""
+Compare fixed-stride and motion-gated adaptive frame sampling on a video.
+
+    python -m app.benchmarks.motion_sampling VIDEO [--frame-stride 10] [--confidence 0.25]
+
+A dense run over every frame is the reference: consecutive positive frames form an event,
+and a sampling strategy recalls an event if at least one of its sampled frames inside the
+event is positive. The report shows, per strategy, how many frames went through the model,
+the event and frame recall and the wall-clock time.
+"""
+import argparse
+import json
+import time
+
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.api.services.video_pipeline import StageTimings
+from app.core.config import settings
+from app.schemas.detection import DetectionOptions
+
+
+def run(service: ViolenceDetectionService, video_path: str, options: DetectionOptions) -> dict:
+    timings = StageTimings()
+    started = time.perf_counter()
+    results = [result for _, batch in service.iter_video(video_path, options, timings=timings) for result in batch]
+    return {"results": results, "seconds": time.perf_counter() - started, "timings": timings}
+
+
+def events(positive_frames: list[int]) -> list[tuple[int, int]]:
+    """Group sorted positive frame numbers into inclusive (start, end) runs."""
+    runs = []
+    for frame in positive_frames:
+        if runs and frame == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], frame)
+        else:
+            runs.append((frame, frame))
+    return runs
+
+
+def score(reference: list[tuple[int, int]], results: list[dict]) -> dict:
+    hits = sorted(result["frame"] for result in results if result.get("violence_detected"))
+    recalled = sum(1 for start, end in reference if any(start <= frame <= end for frame in hits))
+    return {
+        "inferences": len(results),
+        "positive_samples": len(hits),
+        "event_recall": recalled / len(reference) if reference else 1.0,
+        "events_recalled": recalled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--frame-stride", type=int, default=10)
+    parser.add_argument("--confidence", type=float, default=0.25)
+    parser.add_argument("--input-size", type=int, default=320)
+    parser.add_argument("--model-path")
+    args = parser.parse_args()
+
+    service = ViolenceDetectionService(model_path=args.model_path or settings.MODEL_PATH)
+    service.warmup()
+    common = {"confidence": args.confidence, "input_size": args.input_size}
+
+    dense = run(service, args.video, DetectionOptions(frame_stride=1, **common))
+    reference = events(sorted(r["frame"] for r in dense["results"] if r.get("violence_detected")))
+
+    report = {"video": args.video, "frames": len(dense["results"]), "reference_events": len(reference),
+              "dense_seconds": round(dense["seconds"], 3), "strategies": {}}
+    for name, options in {
+        "fixed": DetectionOptions(frame_stride=args.frame_stride, **common),
+        "adaptive": DetectionOptions(frame_stride=args.frame_stride, adaptive_sampling=True, **common),
+    }.items():
+        outcome = run(service, args.video, options)
+        decisions = {}
+        for result in outcome["results"]:
+            decision = result.get("sampling", {}).get("decision", "stride")
+            decisions[decision] = decisions.get(decision, 0) + 1
+        report["strategies"][name] = {
+            **score(reference, outcome["results"]),
+            "seconds": round(outcome["seconds"], 3),
+            "gated_frames": outcome["timings"].frames_gated,
+            "decisions": decisions,
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
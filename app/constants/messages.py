@@ -9,6 +9,8 @@ class MESSAGE(str, Enum):
     NOTIFICATION_UPDATED = 'Notification updated successfully'
     NOTIFICATION_NOT_FOUND = 'Notification not found'
     NOTIFICATION_MARKED_AS_READ = 'Notification marked as read'
+    JOB_CREATED = 'Detection job queued'
+    STREAM_STARTED = 'Stream monitoring started'
 
     # Error messages
     USER_NOT_FOUND = 'User not found'
@@ -20,3 +22,11 @@ class MESSAGE(str, Enum):
     CANNOT_UPDATE_APPROVED_SHIFT = 'You cannot update approved shift'
     SHIFT_TIME_CONFLICT = 'Shift time conflict'
     INVALID_FILE_TYPE = 'Invalid file type. please upload a video.'
+    JOB_NOT_FOUND = 'Detection job not found'
+    ADMIN_ONLY = 'Only administrators can perform this action'
+    MODEL_RELOADED = 'Model reloaded successfully'
+    MODEL_PATH_NOT_ALLOWED = 'model_path must point at weights inside the model reload directory'
+    STREAM_NOT_FOUND = 'Stream not found'
+    INVALID_CURSOR = 'Invalid notification cursor'
+    STREAM_LIMIT_REACHED = 'The maximum number of monitored streams is already active'
+    STREAM_LOCAL_SOURCE_FORBIDDEN = 'Local files and devices cannot be monitored on this server'
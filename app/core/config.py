@@ -1,4 +1,6 @@
 import os
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,6 +12,138 @@ class Settings (BaseSettings):
     # DATABASE_URL: str = os.getenv('DATABASE_URL')
     DATABASE_URL: str
     HUGGING_REPO_ID:str
+    # Detection model
+    MODEL_PATH: str | None = None  # local weights; falls back to HuggingFace when unset
+    MODEL_FILENAME: str = "best.pt"  # file in HUGGING_REPO_ID
+    MODEL_REVISION: str | None = None  # pin a branch, tag or commit of the HuggingFace repo
+    MODEL_CACHE_DIR: str | None = None  # HuggingFace cache; None uses HF_HOME / HF_HUB_CACHE
+    MODEL_ALLOW_DOWNLOAD: bool = True  # contact the hub when the weights aren't cached (off for air-gapped nodes)
+    MODEL_SHA256: str | None = None  # refuse to load weights with a different checksum
+    # /model/reload only takes a model_path inside this directory (weights are unpickled on
+    # load); without it, reloads always use the configured source
+    MODEL_RELOAD_DIR: str | None = None
+    MODEL_PRELOAD: bool = True  # load the model during startup instead of on first request
+    MODEL_WARMUP: bool = True
+    # "torch" runs best.pt as is; the others export it once to an optimized CPU format, cached
+    # next to the weights (or in MODEL_EXPORT_DIR) and reused on later starts
+    INFERENCE_BACKEND: Literal["torch", "onnx", "onnx-int8", "onnx-int8-static", "openvino"] = "torch"
+    MODEL_EXPORT_DIR: str | None = None
+    ONNX_OPSET: int | None = None  # None lets ultralytics pick the newest supported opset
+    # Calibration set for onnx-int8-static: an image/video file or a directory of them
+    QUANT_CALIBRATION_PATH: str | None = None
+    QUANT_CALIBRATION_FRAMES: int = 64
+    QUANT_CALIBRATION_SIZE: int = 320  # calibrate at the input_size the service mostly runs at
+    # "downscaled" resizes images to the request's input_size before inference, "native" lets
+    # the model letterbox the full-resolution image. Boxes are reported in original coordinates either way.
+    IMAGE_INFERENCE_MODE: Literal["native", "downscaled"] = "downscaled"
+    # Bounded pool running inference off the event loop: "thread", "process", or "farm" (model
+    # processes supervised by the web process, fed frames through shared memory)
+    INFERENCE_EXECUTOR: Literal["thread", "process", "farm"] = "thread"
+    INFERENCE_WORKERS: int = 2  # in thread mode each worker gets its own copy of the model
+    INFERENCE_QUEUE_SIZE: int = 8  # calls allowed to wait for a worker before new ones get a 503
+    INFERENCE_RETRY_AFTER_SECONDS: int = 5  # Retry-After sent before any call duration has been measured
+    # Shared memory ring the web process writes frames into for farm workers; calls whose
+    # frames don't fit a free slot fall back to pickling them. The ring is capped to
+    # WORKER_FARM_SHM_FRACTION of the free /dev/shm (see shm_size in compose.yaml)
+    WORKER_FARM_RING_SLOTS: int = 16
+    WORKER_FARM_SLOT_BYTES: int = 8 * 1024 * 1024
+    WORKER_FARM_SHM_FRACTION: float = 0.5
+    WORKER_FARM_STREAM_WINDOW: int = 8  # stream items a worker may run ahead of a slow reader
+    WORKER_FARM_HEALTH_SECONDS: float = 1.0  # how often dead workers are looked for
+    WORKER_FARM_RESTART_DELAY_SECONDS: float = 1.0  # doubles while restarted workers keep dying
+    # CPU threads per model process; unset counts are derived from the available cores split
+    # between all processes running the model (web workers x process-mode inference workers)
+    CPU_MANAGEMENT_ENABLED: bool = True
+    CPU_WEB_WORKERS: int | None = None  # defaults to WEB_CONCURRENCY, else 1
+    CPU_INTRA_OP_THREADS: int | None = None
+    CPU_INTER_OP_THREADS: int | None = None
+    CPU_OPENCV_THREADS: int | None = None
+    CPU_AFFINITY: bool = False  # pin each model process to its own share of the cores
+    CPU_SLOT_DIR: str | None = None  # where processes claim their share (temp dir by default)
+    # Sampling strides of at least this many frames seek to each sample instead of grabbing
+    # every frame in between (0 disables seeking)
+    VIDEO_SEEK_MIN_STRIDE: int = 250
+    # Motion-gated adaptive sampling (DetectionOptions.adaptive_sampling); scores are mean
+    # absolute differences of small grayscale thumbnails, from 0 to 1
+    MOTION_THUMBNAIL_WIDTH: int = 64
+    MOTION_PROBE_DIVISOR: int = 4  # candidates are checked this many times per stride
+    MOTION_LOW_THRESHOLD: float = 0.01  # change below this since the last inference counts as static
+    MOTION_HIGH_THRESHOLD: float = 0.05  # motion between candidates above this is inferred immediately
+    MOTION_MAX_SKIPPED_STRIDES: int = 5
+    # Merging per-frame hits into incidents: a frame at or above the start confidence opens one,
+    # frames at or above the end confidence extend it, and it closes after the gap without them
+    INCIDENT_START_CONFIDENCE: float = 0.5
+    INCIDENT_END_CONFIDENCE: float = 0.35
+    INCIDENT_GAP_SECONDS: float = 1.0
+    INCIDENT_MIN_FRAMES: int = 1
+    # Multi-object tracking across sampled frames (DetectionOptions.tracking)
+    TRACK_IOU_THRESHOLD: float = 0.3
+    TRACK_CENTROID_THRESHOLD: float = 0.5  # fallback match: centres within half a box diagonal
+    TRACK_MAX_AGE_FRAMES: int = 30  # at least two sampling strides are always allowed
+    # Run video decode, preprocessing and inference as concurrent stages
+    VIDEO_PIPELINE_ENABLED: bool = True
+    VIDEO_PIPELINE_QUEUE_SIZE: int = 16  # decoded frames buffered ahead of preprocessing
+    # Video uploads are parsed as the request body arrives and written to disk in chunks; small
+    # ones go to a memory-backed directory as long as it keeps room for the farm's frame ring
+    UPLOAD_MAX_BYTES: int = 512 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes gathered per write
+    UPLOAD_MEMORY_MAX_BYTES: int = 32 * 1024 * 1024
+    UPLOAD_MEMORY_DIR: str | None = "/dev/shm"
+    # Background video detection jobs
+    VIDEO_JOB_DIR: str = "data/jobs"  # where uploaded videos wait to be processed
+    VIDEO_JOB_WORKERS: int = 1
+    VIDEO_JOB_FLUSH_SECONDS: float = 2.0  # how often partial results are written to the database
+    VIDEO_JOB_STALE_SECONDS: int = 300  # running jobs without a heartbeat for this long are resumed on startup
+    # Cross-request micro-batching for /detect/image
+    IMAGE_BATCHING_ENABLED: bool = True
+    IMAGE_BATCH_MAX_SIZE: int = 8
+    IMAGE_BATCH_MAX_WAIT_MS: float = 10.0
+    IMAGE_BATCH_QUEUE_SIZE: int = 256
+    # Multi-image uploads (/detect/images): files, or images inside zip archives, per request
+    IMAGES_MAX_FILES: int = 500
+    IMAGES_CHUNK_SIZE: int | None = None  # images per forward pass; sized from the CPU plan when unset
+    IMAGES_DECODE_WORKERS: int | None = None  # decode threads; one per available core when unset
+    # Detection results cached by content hash, model and options; the persistent tier is a
+    # table in the application database shared by all workers
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 1024
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    RESULT_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    RESULT_CACHE_PERSISTENT: bool = False
+    # Live stream monitoring (/detect/streams)
+    STREAM_MONITOR_ENABLED: bool = True  # resume active streams on startup
+    STREAM_MAX_ACTIVE: int = 8
+    STREAM_BUFFER_FRAMES: int = 8  # sampled frames waiting for inference; the oldest are dropped beyond this
+    STREAM_RECONNECT_SECONDS: float = 2.0  # doubles while a feed stays unreachable
+    STREAM_RECONNECT_MAX_SECONDS: float = 60.0
+    STREAM_OVERLOAD_BACKOFF_SECONDS: float = 0.5  # pause after the inference executor turned a batch away
+    # Each stream is watched by one API process, which renews its claim every third of this;
+    # another process takes the stream over once a claim lapses
+    STREAM_LEASE_SECONDS: float = 30.0
+    # A stream whose worker crashed is held back this long before any process claims it again,
+    # doubling with every crash in a row
+    STREAM_RESTART_SECONDS: float = 10.0
+    STREAM_RESTART_MAX_SECONDS: float = 600.0
+    STREAM_RECENT_INCIDENTS: int = 20  # closed incidents kept in each stream's stats
+    STREAM_ALLOW_LOCAL_SOURCES: bool = False  # accept file paths / device indices (e.g. to loop a test video)
+    # Notifications raised from detections (stream monitors, background jobs) for the users on an
+    # active shift; alerts for the same source within the dedup window are folded into one
+    NOTIFY_MIN_CONFIDENCE: float = 0.5
+    NOTIFY_DEDUP_SECONDS: float = 300.0
+    NOTIFY_DEDUP_MAX_KEYS: int = 10_000
+    NOTIFY_APPROVED_SHIFTS_ONLY: bool = True
+    NOTIFY_FLUSH_SECONDS: float = 1.0  # how long alerts are buffered before being written together
+    NOTIFY_BATCH_SIZE: int = 500  # rows per multi-row insert
+    NOTIFY_MAX_BUFFERED: int = 10_000  # alerts kept for retry while the database is unreachable
+    # Pushing notifications to connected clients (WebSocket / SSE). "local" delivers within this
+    # process; "postgres" fans out through LISTEN/NOTIFY so every API worker sees every notification
+    NOTIFY_PUSH_BACKEND: Literal["local", "postgres"] = "local"
+    NOTIFY_PUSH_CHANNEL: str = "notifications"
+    NOTIFY_PUSH_QUEUE_SIZE: int = 256  # per connection; a client further behind re-reads from the database
+    NOTIFY_PUSH_HEARTBEAT_SECONDS: float = 15.0
+    NOTIFY_REPLAY_PAGE_SIZE: int = 500  # missed notifications read per query on reconnect
+    # Catching up re-reads this far before the client's cursor for notifications that committed late
+    NOTIFY_REPLAY_OVERLAP_SECONDS: float = 5.0
     SECRET_KEY: str = ''
     # SECRET_KEY: str = os.getenv('SECRET_KEY')
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -0,0 +1,126 @@
+import logging
+import os
+import pathlib
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import cv2
+import torch
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> list[int]:
+    """CPUs this process may run on (respects cgroup/taskset restrictions where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def model_processes() -> int:
+    """How many processes on this host run the model at the same time."""
+    web_workers = settings.CPU_WEB_WORKERS or int(os.environ.get("WEB_CONCURRENCY", 1))
+    per_web_worker = settings.INFERENCE_WORKERS if settings.INFERENCE_EXECUTOR in ("process", "farm") else 1
+    return max(1, web_workers * per_web_worker)
+
+
+@dataclass
+class CpuPlan:
+    cores: int  # CPUs available to the whole deployment
+    processes: int  # processes sharing them
+    intra_op_threads: int
+    inter_op_threads: int
+    opencv_threads: int
+    slot: int | None = None  # which share of the cores this process claimed
+    affinity: list[int] | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def plan(processes: int | None = None, cores: list[int] | None = None) -> CpuPlan:
+    """
+    Thread counts for one model process: the cores are split evenly between `processes`
+    (see model_processes) unless CPU_* settings pin them explicitly.
+    """
+    cores = cores if cores is not None else available_cores()
+    processes = processes or model_processes()
+    share = max(1, len(cores) // processes)
+    return CpuPlan(
+        cores=len(cores),
+        processes=processes,
+        intra_op_threads=settings.CPU_INTRA_OP_THREADS or share,
+        inter_op_threads=settings.CPU_INTER_OP_THREADS or 1,
+        # Decoding and resizing run beside inference, so OpenCV gets a smaller share
+        opencv_threads=settings.CPU_OPENCV_THREADS or max(1, share // 2),
+    )
+
+
+class CpuResourceManager:
+    """
+    Applies a CpuPlan to the current process: torch intra/inter-op threads, OpenCV's pool and,
+    with CPU_AFFINITY, pinning to this process's share of the cores.
+
+    Processes find their share by claiming the first free slot lock file; the lock is held
+    for the life of the process and released by the OS when it exits, so a restarted worker
+    takes over the slot of the one it replaces.
+    """
+
+    def __init__(self):
+        self.plan: CpuPlan | None = None
+        self._slot_lock = None
+
+    def configure(self, cpu_plan: CpuPlan | None = None, pin: bool = True) -> CpuPlan:
+        """Apply `cpu_plan` (the auto-sized plan by default); `pin` = False never claims a core slot."""
+        cpu_plan = cpu_plan or plan()
+        torch.set_num_threads(cpu_plan.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(cpu_plan.inter_op_threads)
+        except RuntimeError:
+            # Only possible before torch's first parallel work; keep whatever is in place
+            cpu_plan.inter_op_threads = torch.get_num_interop_threads()
+        cv2.setNumThreads(cpu_plan.opencv_threads)
+
+        if pin and settings.CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+            cpu_plan.slot = self._claim_slot(cpu_plan.processes)
+            if cpu_plan.slot is not None:
+                cores = available_cores()
+                share = max(1, len(cores) // cpu_plan.processes)
+                cpu_plan.affinity = cores[cpu_plan.slot * share:(cpu_plan.slot + 1) * share] or cores
+                os.sched_setaffinity(0, cpu_plan.affinity)
+
+        self.plan = cpu_plan
+        logger.info(f"CPU plan for pid {os.getpid()}: {cpu_plan}")
+        return cpu_plan
+
+    def _claim_slot(self, slots: int) -> int | None:
+        import fcntl
+
+        if self._slot_lock is not None:
+            return self.plan.slot if self.plan else None
+        directory = pathlib.Path(settings.CPU_SLOT_DIR or tempfile.gettempdir())
+        for slot in range(slots):
+            lock = open(directory / f"crime-detection-cpu-slot-{slot}.lock", "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self._slot_lock = lock
+            return slot
+        logger.warning(f"All {slots} CPU slots are taken; running without affinity")
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "plan": self.plan.as_dict() if self.plan else None,
+            "torch_threads": torch.get_num_threads(),
+            "torch_interop_threads": torch.get_num_interop_threads(),
+            "opencv_threads": cv2.getNumThreads(),
+        }
+
+
+cpu_resources = CpuResourceManager()
@@ -1,7 +1,8 @@
 class AppException(Exception):
-    def __init__(self, message: str, status_code: int = 400):
+    def __init__(self, message: str, status_code: int = 400, headers: dict[str, str] | None = None):
         self.message = message
         self.status_code = status_code
+        self.headers = headers
 
 class NotFoundException(AppException):
     def __init__(self, message: str = "Resource not found"):
@@ -19,4 +20,19 @@ class UserNotFoundException(AppException):
 
 class IncorrectCredentialsException(AppException):
     def __init__(self, message: str = "Incorrect credentials"):
-        super().__init__(message, 401)
\ No newline at end of file
+        super().__init__(message, 401)
+
+class ForbiddenException(AppException):
+    def __init__(self, message: str = "Forbidden"):
+        super().__init__(message, 403)
+
+
+class ServiceOverloadedException(AppException):
+    def __init__(self, message: str = "Detection service is busy, please retry later", retry_after: int | None = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+        super().__init__(message, 503, headers)
+
+
+class FileTooLargeException(AppException):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File is too large, the limit is {round(max_bytes / (1024 * 1024), 2):g} MB", 413)
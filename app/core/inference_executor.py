@@ -0,0 +1,437 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import queue as queue_module
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+from app.core.config import settings
+from app.core.cpu_resources import cpu_resources
+from app.core.exceptions import ServiceOverloadedException
+from app.core.model_registry import model_registry
+from app.core.worker_farm import WorkerFarm
+
+logger = logging.getLogger(__name__)
+
+# How often a process-mode stream checks on its worker while waiting for the next item
+STREAM_POLL_SECONDS = 1.0
+
+
+class InferenceExecutorStopped(RuntimeError):
+    """The executor shut down while a background thread was waiting on it."""
+
+# Model instance owned by a worker process when running with INFERENCE_EXECUTOR=process
+_worker_service = None
+
+
+def _init_worker_process(model_path: str | None):
+    global _worker_service
+    from app.api.services.violence_detection_service import ViolenceDetectionService
+
+    if settings.CPU_MANAGEMENT_ENABLED:
+        cpu_resources.configure()
+    _worker_service = ViolenceDetectionService(model_path=model_path)
+    if settings.MODEL_WARMUP:
+        _worker_service.warmup()
+
+
+def _call_worker_service(method: str, *args):
+    return getattr(_worker_service, method)(*args)
+
+
+def _stream_worker_service(method: str, queue, stop, *args):
+    """
+    Drive a generator method inside a worker process, forwarding its items through `queue`
+    until it ends or `stop` is set by a consumer that went away.
+    """
+    items = getattr(_worker_service, method)(*args)
+    try:
+        for item in items:
+            if stop.is_set():
+                break
+            queue.put(("item", item))
+    except Exception as e:
+        queue.put(("error", str(e)))
+    finally:
+        items.close()
+        queue.put(("end", None))
+
+
+_STREAM_END = object()
+
+
+def _next_item(generator: Iterator, lock: threading.Lock):
+    with lock:
+        return next(generator, _STREAM_END)
+
+
+def _close_generator(generator: Iterator, lock: threading.Lock):
+    # Waits for a next() that is still running in another worker thread
+    with lock:
+        generator.close()
+
+
+class AdmittedStream:
+    """
+    Async iterator over an executor stream that holds its slot from admission until it is
+    exhausted or closed. Closing also frees the slot of a stream that was never iterated,
+    which a bare async generator can't do because its body (and `finally`) never ran.
+    """
+
+    def __init__(self, items: AsyncIterator[Any], release: Callable[[], None]):
+        self._items = items
+        self._release = release
+        self._held = True
+
+    def __aiter__(self) -> "AdmittedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return await self._items.__anext__()
+        except BaseException:
+            # Exhausted or failed: the generator has finished either way
+            self._free()
+            raise
+
+    async def aclose(self):
+        try:
+            await self._items.aclose()
+        finally:
+            self._free()
+
+    def _free(self):
+        if self._held:
+            self._held = False
+            self._release()
+
+
+class InferenceExecutor:
+    """
+    Runs blocking ViolenceDetectionService calls off the event loop on a bounded pool.
+
+    At most `max_workers` calls run at once and `max_queue_size` more may wait; anything beyond
+    that is rejected straight away with a 503 and a Retry-After estimate instead of piling up.
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue_size: int):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool: Executor | None = None
+        self._farm: WorkerFarm | None = None
+        self._manager = None  # multiprocessing manager providing queues for streams in process mode
+        self._worker_model_info: dict[str, Any] | None = None  # what process-mode workers load
+        # Registry version the process pool was started with, so hot-swaps restart the workers
+        self._pool_model_version: int | None = None
+        self._pending = 0
+        # Event loop the executor was started on; background threads submit their calls to it
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped = threading.Event()
+
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self._total_seconds = 0.0
+
+    def start(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        self._stopped.clear()
+        if self._pool is not None or self._farm is not None:
+            return
+        if self.kind == "farm":
+            self._farm = WorkerFarm(workers=self.max_workers, model_path=self._model_path(),
+                                    slots=settings.WORKER_FARM_RING_SLOTS, slot_bytes=settings.WORKER_FARM_SLOT_BYTES)
+            self._farm.start()
+            self._pool_model_version = model_registry.version
+        elif self.kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker_process, initargs=(self._model_path(),))
+            if self._pool_model_version != model_registry.version or self._worker_model_info is None:
+                self._worker_model_info = self._describe_model(self._model_path())
+            self._pool_model_version = model_registry.version
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        logger.info(f"Inference executor started: {self.kind} x{self.max_workers}")
+
+    @staticmethod
+    def _model_path() -> str | None:
+        return model_registry.info()["model_path"] or settings.MODEL_PATH
+
+    @staticmethod
+    def _describe_model(model_path: str | None) -> dict[str, Any]:
+        """Identify the weights worker processes will load, without loading them here."""
+        from app.api.services.model_resolver import resolve_model
+
+        resolved = resolve_model(model_path)
+        return {"loaded": True, "model_path": resolved.path, "sha256": resolved.sha256,
+                "source": resolved.source, "backend": settings.INFERENCE_BACKEND}
+
+    def shutdown(self, wait: bool = True):
+        self._stopped.set()
+        self._loop = None
+        if self._farm is not None:
+            self._farm.shutdown()
+            self._farm = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def _ensure_pool(self):
+        if self._pool is None and self._farm is None:
+            self.start()
+        elif self.kind == "farm" and self._pool_model_version != model_registry.version:
+            # Rolling replacement: old workers drain their queues while new ones load the swapped model
+            self._farm.reload(self._model_path())
+            self._pool_model_version = model_registry.version
+        elif self.kind == "process" and self._pool_model_version != model_registry.version:
+            # Let the old workers finish what they are running while new ones load the swapped model
+            old_pool, self._pool = self._pool, None
+            old_pool.shutdown(wait=False)
+            self.start()
+
+    async def reload_model(self, model_path: str | None = None) -> dict[str, Any]:
+        """
+        Hot-swap the model the calls run on. Threads share the registry's service, which is
+        rebuilt next to the old one; worker processes are replaced by ones loading the new
+        weights, which are checked here first but not loaded into this process.
+        """
+        if self.kind == "thread":
+            await asyncio.to_thread(model_registry.reload, model_path)
+        else:
+            info = await asyncio.to_thread(self._describe_model, model_path)
+            model_registry.retarget(info["model_path"])
+            if self._pool is not None or self._farm is not None:
+                self._ensure_pool()
+        return self.model_info()
+
+    def _replace_broken_pool(self, pool: Executor):
+        """A worker process died and took the pool with it; start a fresh one for the next calls."""
+        if self._pool is not pool:
+            return
+        logger.error("Inference process pool broke, restarting it")
+        self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until a slot frees up, based on the average call duration."""
+        if not self.completed:
+            return settings.INFERENCE_RETRY_AFTER_SECONDS
+        average = self._total_seconds / self.completed
+        queued = max(self._pending - self.max_workers, 0) + 1
+        return max(1, math.ceil(average * queued / self.max_workers))
+
+    def _admit(self):
+        if self._pending >= self.max_workers + self.max_queue_size:
+            self.rejected += 1
+            raise ServiceOverloadedException(retry_after=self.retry_after())
+        self._pending += 1
+
+    async def run(self, method: str, *args) -> Any:
+        """Call `method` on the detection service in the pool and await its result."""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            self._ensure_pool()
+            loop = asyncio.get_running_loop()
+            if self.kind == "farm":
+                result = await asyncio.wrap_future(self._farm.call(method, *args))
+            else:
+                if self.kind == "process":
+                    call = partial(_call_worker_service, method, *args)
+                else:
+                    call = partial(getattr(model_registry.get_service(), method), *args)
+                pool = self._pool
+                try:
+                    result = await loop.run_in_executor(pool, call)
+                except BrokenProcessPool:
+                    self._replace_broken_pool(pool)
+                    raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        self.completed += 1
+        self._total_seconds += time.perf_counter() - started
+        return result
+
+    def stream(self, method: str, *args) -> AdmittedStream:
+        """
+        Iterate a generator method of the detection service in the pool.
+
+        Admission is checked immediately (so callers can still answer 503 before starting a
+        response); the slot is held until the returned iterator is exhausted or closed, so
+        callers must close it even if they never iterate it.
+        """
+        self._admit()
+        return AdmittedStream(self._stream(method, *args), self._release)
+
+    def _release(self):
+        self._pending -= 1
+
+    async def _stream(self, method: str, *args) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        try:
+            self._ensure_pool()
+            if self.kind == "farm":
+                items = self._farm.stream(method, *args)
+            elif self.kind == "process":
+                items = self._stream_from_process(method, *args)
+            else:
+                items = self._stream_from_thread(method, *args)
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                await items.aclose()
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.completed += 1
+        self._total_seconds += time.perf_counter() - started
+
+    async def _stream_from_thread(self, method: str, *args) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        generator = getattr(model_registry.get_service(), method)(*args)
+        lock = threading.Lock()
+        try:
+            while True:
+                item = await loop.run_in_executor(self._pool, _next_item, generator, lock)
+                if item is _STREAM_END:
+                    break
+                yield item
+        finally:
+            # Runs when the consumer goes away too, releasing the video handle without blocking the loop
+            if self._pool is not None:
+                self._pool.submit(_close_generator, generator, lock)
+            else:
+                _close_generator(generator, lock)
+
+    async def _stream_from_process(self, method: str, *args) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        queue = self._manager.Queue()
+        stop = self._manager.Event()
+        pool = self._pool
+        worker = loop.run_in_executor(pool, partial(_stream_worker_service, method, queue, stop, *args))
+        try:
+            while True:
+                try:
+                    kind, item = await loop.run_in_executor(None, partial(queue.get, timeout=STREAM_POLL_SECONDS))
+                except queue_module.Empty:
+                    # The worker puts "end" before returning, so a finished worker with nothing queued died
+                    if worker.done():
+                        try:
+                            worker.result()
+                        except BrokenProcessPool:
+                            self._replace_broken_pool(pool)
+                            raise
+                        raise RuntimeError("Inference worker stopped without finishing the stream")
+                    continue
+                if kind == "end":
+                    break
+                if kind == "error":
+                    raise RuntimeError(item)
+                yield item
+        finally:
+            # Tells a worker whose consumer went away to stop decoding and free its process
+            if not worker.done():
+                stop.set()
+
+    def _wait(self, call: Callable[[], Awaitable]) -> Any:
+        """Await `call()` on the executor's event loop, blocking the calling thread until it's done."""
+        async def wait():
+            return await call()
+
+        loop = self._loop
+        if loop is None or self._stopped.is_set():
+            raise InferenceExecutorStopped("Inference executor is not running")
+        future = asyncio.run_coroutine_threadsafe(wait(), loop)
+        while True:
+            try:
+                return future.result(timeout=STREAM_POLL_SECONDS)
+            except TimeoutError:
+                if self._stopped.is_set() or not loop.is_running():
+                    future.cancel()
+                    raise InferenceExecutorStopped("Inference executor shut down")
+
+    def _admit_threadsafe(self, method: str, *args) -> AdmittedStream:
+        """Open a stream from a background thread, waiting for a free slot instead of failing with a 503."""
+        async def open_stream():
+            return self.stream(method, *args)
+
+        while True:
+            try:
+                return self._wait(open_stream)
+            except ServiceOverloadedException as e:
+                retry_after = int(e.headers["Retry-After"]) if e.headers else settings.INFERENCE_RETRY_AFTER_SECONDS
+                if self._stopped.wait(retry_after):
+                    raise InferenceExecutorStopped("Inference executor shut down")
+
+    def run_threadsafe(self, method: str, *args) -> Any:
+        """Blocking `run` for background threads; rejected when the executor is full, like requests."""
+        return self._wait(partial(self.run, method, *args))
+
+    def stream_threadsafe(self, method: str, *args) -> Iterator[Any]:
+        """
+        Blocking `stream` for background threads such as detection jobs.
+
+        The call shares the executor's slots and admission limit with requests, but waits for a
+        slot rather than being rejected. Raises InferenceExecutorStopped if the executor shuts down.
+        """
+        items = self._admit_threadsafe(method, *args)
+        try:
+            while (item := self._wait(partial(anext, items, _STREAM_END))) is not _STREAM_END:
+                yield item
+        finally:
+            if not self._stopped.is_set():
+                self._wait(items.aclose)
+
+    def model_info(self) -> dict[str, Any]:
+        """What the calls actually run on: worker processes report their model, threads use the registry's."""
+        if self.kind == "farm" and self._farm is not None and not model_registry.is_loaded:
+            info = self._farm.model_info
+            return {"loaded": info is not None, **(info or {}), "version": self._pool_model_version}
+        if self.kind == "process" and self._worker_model_info is not None and not model_registry.is_loaded:
+            return {**self._worker_model_info, "version": self._pool_model_version}
+        return model_registry.info()
+
+    def stats(self) -> dict[str, Any]:
+        stats = {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "running": min(self._pending, self.max_workers),
+            "queued": max(self._pending - self.max_workers, 0),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "mean_seconds": self._total_seconds / self.completed if self.completed else 0.0,
+        }
+        if self._farm is not None:
+            stats["farm"] = self._farm.stats()
+        return stats
+
+
+inference_executor = InferenceExecutor(
+    kind=settings.INFERENCE_EXECUTOR,
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+)
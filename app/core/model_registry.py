@@ -0,0 +1,96 @@
+import logging
+import threading
+from datetime import datetime
+
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide owner of the loaded ViolenceDetectionService.
+
+    The model is loaded and warmed up once (from the FastAPI lifespan) and every request
+    shares the same instance. Hot-swapping builds the replacement service off to the side
+    and then swaps the reference, so requests already holding the old service finish on it.
+    """
+
+    def __init__(self):
+        self._service: ViolenceDetectionService | None = None
+        # Serialises loads/reloads; readers never take this lock.
+        self._load_lock = threading.Lock()
+        self.version = 0
+        self.loaded_at: datetime | None = None
+        # Weights worker processes should load when this process doesn't hold the model itself
+        self._target_path: str | None = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._service is not None
+
+    def _build_service(self, model_path: str | None) -> ViolenceDetectionService:
+        # Thread inference runs every worker on this one service, so give each its own model copy
+        replicas = settings.INFERENCE_WORKERS if settings.INFERENCE_EXECUTOR == "thread" else 1
+        service = ViolenceDetectionService(model_path=model_path or settings.MODEL_PATH, replicas=replicas)
+        if settings.MODEL_WARMUP:
+            service.warmup()
+        return service
+
+    def load(self, model_path: str | None = None) -> ViolenceDetectionService:
+        """Load the model if it isn't loaded yet and return the shared service."""
+        with self._load_lock:
+            if self._service is None:
+                self._swap(self._build_service(model_path))
+            return self._service
+
+    def reload(self, model_path: str | None = None) -> ViolenceDetectionService:
+        """Load a new model (e.g. a freshly published best.pt) and swap it in without dropping in-flight requests."""
+        with self._load_lock:
+            self._swap(self._build_service(model_path))
+            return self._service
+
+    def retarget(self, model_path: str):
+        """Point out-of-process workers at new weights without loading them here; they pick up the new version."""
+        with self._load_lock:
+            self._target_path = model_path
+            self.version += 1
+            self.loaded_at = datetime.now()
+            logger.info(f"Model v{self.version} selected: {model_path}")
+
+    def _swap(self, service: ViolenceDetectionService):
+        self._service = service
+        self.version += 1
+        self.loaded_at = datetime.now()
+        logger.info(f"Model v{self.version} ready: {service.model_path}")
+
+    def get_service(self) -> ViolenceDetectionService:
+        """Return the shared service, loading it lazily if the lifespan hasn't done so."""
+        service = self._service
+        if service is None:
+            service = self.load()
+        return service
+
+    def unload(self):
+        with self._load_lock:
+            self._service = None
+
+    def info(self) -> dict:
+        service = self._service
+        return {
+            "loaded": service is not None,
+            "version": self.version,
+            "model_path": service.model_path if service else self._target_path,
+            "sha256": service.model_sha256 if service else None,
+            "backend": service.backend if service else None,
+            "artifact_path": service.artifact_path if service else None,
+            "source": service.model_source if service else None,
+            "startup_seconds": {stage: round(seconds, 3) for stage, seconds in service.startup_timings.items()}
+            if service else None,
+            "device": service.device if service else None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+model_registry = ModelRegistry()
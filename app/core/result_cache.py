@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlmodel import Session, delete
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.detection_cache import DetectionCacheEntry
+from app.schemas.detection import DetectionOptions
+
+logger = logging.getLogger(__name__)
+
+# Settings that change what a detection returns, so results computed under other values aren't reused
+OUTPUT_SETTING_PREFIXES = ("INCIDENT_", "MOTION_", "TRACK_")
+OUTPUT_SETTINGS = ("IMAGE_INFERENCE_MODE", "VIDEO_SEEK_MIN_STRIDE")
+
+
+def _output_settings() -> dict[str, Any]:
+    return {name: getattr(settings, name) for name in sorted(type(settings).model_fields)
+            if name in OUTPUT_SETTINGS or name.startswith(OUTPUT_SETTING_PREFIXES)}
+
+
+def _has_error(result: Any) -> bool:
+    """Whether `result` (an image result or a video analysis) reports a failure anywhere."""
+    if not isinstance(result, dict):
+        return False
+    return "error" in result or any("error" in item for item in result.get("results", ()) if isinstance(item, dict))
+
+
+class ResultCache:
+    """
+    Detection results keyed by content hash, model fingerprint and detection options.
+
+    The first tier is an in-process LRU bounded by entry count and total size, with a TTL;
+    the optional second tier is a table in the application database, shared by every worker
+    and surviving restarts. Results are stored JSON-encoded, so a hit hands out a fresh copy
+    the caller may modify.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, persistent: bool):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()  # key -> (expires, encoded result)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped_errors = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.persistent_errors = 0
+
+    @staticmethod
+    def make_key(kind: str, content_hash: str, model_fingerprint: str, options: DetectionOptions,
+                 **extra: Any) -> str:
+        """
+        Cache key for running `options` (plus any output `extra`s) on content with the given hash,
+        under the current output-affecting settings.
+        """
+        material = json.dumps({"kind": kind, "content": content_hash, "model": model_fingerprint,
+                               "options": options.model_dump(), "settings": _output_settings(), **extra},
+                              sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, key: str) -> Any | None:
+        encoded = self._get_memory(key)
+        if encoded is not None:
+            self.memory_hits += 1
+            return json.loads(encoded)
+
+        if self.persistent:
+            encoded = await asyncio.to_thread(self._get_persistent, key)
+            if encoded is not None:
+                self.persistent_hits += 1
+                self._put_memory(key, encoded)
+                return json.loads(encoded)
+
+        self.misses += 1
+        return None
+
+    async def put(self, kind: str, key: str, result: Any):
+        # A failure (e.g. a video that couldn't be opened) may not happen next time
+        if _has_error(result):
+            self.skipped_errors += 1
+            return
+        encoded = json.dumps(result, default=str)
+        self.stores += 1
+        self._put_memory(key, encoded)
+        if self.persistent:
+            await asyncio.to_thread(self._put_persistent, kind, key, encoded)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _get_memory(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, encoded = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return encoded
+
+    def _put_memory(self, key: str, encoded: str):
+        if len(encoded) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, encoded)
+            self._size += len(encoded)
+            # Evict least recently used entries until both bounds hold
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, encoded = self._entries.pop(key)
+        self._size -= len(encoded)
+
+    def _get_persistent(self, key: str) -> str | None:
+        try:
+            with Session(engine) as db:
+                entry = db.get(DetectionCacheEntry, key)
+                if entry is None:
+                    return None
+                if entry.expires_at < datetime.now():
+                    db.delete(entry)
+                    db.commit()
+                    return None
+                return entry.result
+        except Exception as e:
+            # The cache is an optimisation; a database hiccup must not fail the request
+            self.persistent_errors += 1
+            logger.warning(f"Result cache lookup failed: {e}")
+            return None
+
+    def _put_persistent(self, kind: str, key: str, encoded: str):
+        try:
+            with Session(engine) as db:
+                db.merge(DetectionCacheEntry(key=key, kind=kind, result=encoded,
+                                             expires_at=datetime.now() + timedelta(seconds=self.ttl_seconds)))
+                db.commit()
+        except Exception as e:
+            self.persistent_errors += 1
+            logger.warning(f"Result cache store failed: {e}")
+
+    def purge_expired(self) -> int:
+        """Delete expired rows of the persistent tier; returns how many were removed."""
+        if not self.persistent:
+            return 0
+        with Session(engine) as db:
+            result = db.exec(delete(DetectionCacheEntry).where(DetectionCacheEntry.expires_at < datetime.now()))
+            db.commit()
+            return result.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        hits = self.memory_hits + self.persistent_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.persistent,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "skipped_errors": self.skipped_errors,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persistent_errors": self.persistent_errors,
+        }
+
+
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    persistent=settings.RESULT_CACHE_PERSISTENT,
+)
@@ -0,0 +1,472 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, AsyncIterator
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.cpu_resources import cpu_resources
+
+logger = logging.getLogger(__name__)
+
+SHM_PATH = "/dev/shm"
+# How often a worker whose stream reader is behind checks whether it may go on
+STREAM_POLL_SECONDS = 0.005
+
+
+@dataclass(frozen=True)
+class SharedFrames:
+    """Stands in for a list of frames (or a single frame) written to a FrameRing slot."""
+    ring: str  # shared memory block name
+    slot: int
+    layout: tuple[tuple[int, tuple[int, ...], str], ...]  # (offset, shape, dtype) per frame
+    single: bool = False
+
+
+class FrameRing:
+    """
+    Fixed-size slots in one shared memory block.
+
+    The web process copies the frames of a call into a free slot once; workers map the same
+    memory and read them in place through NumPy views, so pixels are never pickled.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        # A ring without slots (no room in /dev/shm) sends every frame inline
+        self.shm = SharedMemory(name=name, create=self.owner, size=slots * slot_bytes if self.owner else 0) \
+            if slots or not self.owner else None
+        self.name = self.shm.name if self.shm is not None else None
+        self._free: queue.SimpleQueue[int] = queue.SimpleQueue()
+        if self.owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    def acquire(self) -> int | None:
+        """Take a free slot without waiting, or None when all of them are in use."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot: int):
+        self._free.put(slot)
+
+    @property
+    def in_use(self) -> int:
+        return self.slots - self._free.qsize()
+
+    def write(self, slot: int, frames: list[np.ndarray], single: bool = False) -> SharedFrames | None:
+        """Copy `frames` into `slot`; None if they don't fit."""
+        if sum(frame.nbytes for frame in frames) > self.slot_bytes:
+            return None
+        base = slot * self.slot_bytes
+        offset = 0
+        layout = []
+        for frame in frames:
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf, offset=base + offset)
+            view[...] = frame
+            layout.append((base + offset, frame.shape, frame.dtype.str))
+            # Keep every frame 64-byte aligned
+            offset += -(-frame.nbytes // 64) * 64
+        return SharedFrames(ring=self.name, slot=slot, layout=tuple(layout), single=single)
+
+    def read(self, frames: SharedFrames) -> list[np.ndarray] | np.ndarray:
+        views = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+                 for offset, shape, dtype in frames.layout]
+        return views[0] if frames.single else views
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def fit_ring_slots(slots: int, slot_bytes: int) -> int:
+    """
+    Cap the ring to WORKER_FARM_SHM_FRACTION of the free shared memory. The block is allocated
+    lazily, so a ring bigger than /dev/shm (64 MB by default in Docker) fails with SIGBUS on
+    first write instead of at startup.
+    """
+    try:
+        free = shutil.disk_usage(SHM_PATH).free
+    except OSError:
+        return slots
+    fitting = min(slots, int(free * settings.WORKER_FARM_SHM_FRACTION) // slot_bytes)
+    if fitting < slots:
+        logger.warning(f"Only {free / (1024 * 1024):.0f} MB free in {SHM_PATH}: using {fitting} of {slots} frame "
+                       f"ring slots; raise the container's shm_size to share more frames")
+    return fitting
+
+
+class StreamControl:
+    """
+    Flow control for the streams of one worker, shared between the web process and the
+    worker: how many items the reader of the running stream has taken, and which streams
+    lost their reader.
+
+    The worker stays at most `window` items ahead of the reader, so a slow client never
+    makes the web process buffer a whole video's results, and stops a stream once it's cancelled.
+    """
+
+    def __init__(self, context, window: int):
+        self.window = window
+        self._consumed = context.Array("q", [-1, 0])  # call id, items its reader has taken
+        self._cancels = context.Queue()
+        self._cancelled: set[int] = set()  # worker side
+
+    def __getstate__(self):
+        return {**self.__dict__, "_cancelled": set()}
+
+    def consumed(self, call_id: int, count: int):
+        with self._consumed.get_lock():
+            self._consumed[:] = [call_id, count]
+
+    def cancel(self, call_id: int):
+        self._cancels.put(call_id)
+
+    def is_cancelled(self, call_id: int) -> bool:
+        while True:
+            try:
+                self._cancelled.add(self._cancels.get_nowait())
+            except queue.Empty:
+                return call_id in self._cancelled
+
+    def finished(self, call_id: int):
+        self._cancelled.discard(call_id)
+
+    def wait_for_room(self, call_id: int, produced: int) -> bool:
+        """Block the worker until the reader has room for another item; False if the stream was cancelled."""
+        while not self.is_cancelled(call_id):
+            with self._consumed.get_lock():
+                current, consumed = self._consumed[:]
+            if produced - (consumed if current == call_id else 0) < self.window:
+                return True
+            time.sleep(STREAM_POLL_SECONDS)
+        return False
+
+
+def _farm_worker_main(worker_id: int, model_path: str | None, tasks, results, control: StreamControl):
+    """Entry point of a farm worker process: load one model, then serve calls until a None task arrives."""
+    from app.api.services.violence_detection_service import ViolenceDetectionService
+
+    if settings.CPU_MANAGEMENT_ENABLED:
+        cpu_resources.configure()
+    service = ViolenceDetectionService(model_path=model_path)
+    if settings.MODEL_WARMUP:
+        service.warmup()
+    results.put(("ready", worker_id, None, {"model_path": service.model_path, "sha256": service.model_sha256,
+                                             "backend": service.backend}, 0.0))
+
+    rings: dict[str, FrameRing] = {}
+
+    def unshare(arg):
+        if not isinstance(arg, SharedFrames):
+            return arg
+        if arg.ring not in rings:
+            rings[arg.ring] = FrameRing(slots=0, slot_bytes=0, name=arg.ring)
+        return rings[arg.ring].read(arg)
+
+    while (task := tasks.get()) is not None:
+        call_id, method, args, streaming = task
+        started = time.perf_counter()
+        try:
+            call = getattr(service, method)(*[unshare(arg) for arg in args])
+            if streaming:
+                try:
+                    for produced, item in enumerate(call):
+                        if not control.wait_for_room(call_id, produced):
+                            break
+                        results.put(("item", worker_id, call_id, item, 0.0))
+                finally:
+                    call.close()
+                    control.finished(call_id)
+                call = None
+            results.put(("done", worker_id, call_id, call, time.perf_counter() - started))
+        except Exception as e:
+            results.put(("error", worker_id, call_id, str(e), time.perf_counter() - started))
+
+
+@dataclass
+class _Call:
+    worker: "_Worker"
+    slots: list[int]
+    future: Future | None = None  # plain calls
+    deliver: Any = None  # streams: callback taking (kind, payload), thread-safe
+
+
+@dataclass
+class _Worker:
+    id: int
+    process: Any
+    tasks: Any
+    control: StreamControl
+    started_at: float = field(default_factory=time.monotonic)
+    ready_at: float | None = None
+    retiring: bool = False
+    in_flight: set[int] = field(default_factory=set)
+    completed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+
+class WorkerFarm:
+    """
+    A fixed number of inference processes, each holding one copy of the model.
+
+    Calls go to the least busy live worker; their frame arguments travel through a shared
+    memory FrameRing. A monitor thread restarts workers that die (failing only the calls that
+    were assigned to them), and per-worker busy time is tracked for utilization stats.
+    """
+
+    def __init__(self, workers: int, model_path: str | None, slots: int, slot_bytes: int):
+        self.size = workers
+        self.model_path = model_path
+        self.ring = FrameRing(fit_ring_slots(slots, slot_bytes), slot_bytes)
+        self.model_info: dict[str, Any] | None = None
+        self.restarts = 0
+        self.frames_shared = 0
+        self.frames_inline = 0  # frames that didn't fit a free slot and were pickled instead
+
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._workers: dict[int, _Worker] = {}
+        self._calls: dict[int, _Call] = {}
+        self._worker_ids = itertools.count()
+        self._call_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._crash_streak = 0
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        for _ in range(self.size):
+            self._spawn()
+        self._threads = [threading.Thread(target=self._collect, name="farm-results", daemon=True),
+                         threading.Thread(target=self._monitor, name="farm-monitor", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Inference worker farm started: {self.size} process(es)")
+
+    def _spawn(self):
+        worker_id = next(self._worker_ids)
+        tasks = self._context.Queue()
+        control = StreamControl(self._context, settings.WORKER_FARM_STREAM_WINDOW)
+        process = self._context.Process(target=_farm_worker_main, name=f"inference-worker-{worker_id}",
+                                        args=(worker_id, self.model_path, tasks, self._results, control),
+                                        daemon=True)
+        process.start()
+        with self._lock:
+            self._workers[worker_id] = _Worker(id=worker_id, process=process, tasks=tasks, control=control)
+
+    def reload(self, model_path: str | None):
+        """Replace every worker with one running `model_path`; old workers finish their queued calls first."""
+        with self._lock:
+            self.model_path = model_path
+            old_workers = [worker for worker in self._workers.values() if not worker.retiring]
+            for worker in old_workers:
+                worker.retiring = True
+                worker.tasks.put(None)
+        for _ in old_workers:
+            self._spawn()
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stopping.set()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.tasks.put(None)
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            calls, self._calls = list(self._calls.values()), {}
+        for call in calls:
+            self._fail(call, "Inference worker farm shut down")
+        self._results.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self.ring.close()
+
+    def _share(self, args: tuple) -> tuple[list, list[int]]:
+        """Move frame arguments into ring slots, returning the rewritten args and the slots taken."""
+        shared_args, slots = [], []
+        for arg in args:
+            single = isinstance(arg, np.ndarray)
+            frames = [arg] if single else arg
+            if not (single or (isinstance(arg, list) and arg and all(isinstance(f, np.ndarray) for f in arg))):
+                shared_args.append(arg)
+                continue
+            slot = self.ring.acquire()
+            shared = self.ring.write(slot, frames, single) if slot is not None else None
+            if shared is None:
+                if slot is not None:
+                    self.ring.release(slot)
+                self.frames_inline += len(frames)
+                shared_args.append(arg)
+                continue
+            self.frames_shared += len(frames)
+            slots.append(slot)
+            shared_args.append(shared)
+        return shared_args, slots
+
+    def _dispatch(self, method: str, args: tuple, streaming: bool, call: _Call) -> int:
+        args, call.slots = self._share(args)
+        call_id = next(self._call_ids)
+        with self._lock:
+            candidates = [worker for worker in self._workers.values() if not worker.retiring]
+            # Workers still loading the model only get calls when nothing else is up
+            ready = [worker for worker in candidates if worker.ready_at is not None] or candidates
+            if not ready:
+                for slot in call.slots:
+                    self.ring.release(slot)
+                raise RuntimeError("No inference worker is running")
+            worker = min(ready, key=lambda w: len(w.in_flight))
+            call.worker = worker
+            worker.in_flight.add(call_id)
+            self._calls[call_id] = call
+            worker.tasks.put((call_id, method, args, streaming))
+        return call_id
+
+    def call(self, method: str, *args) -> Future:
+        """Run `method` on a worker's service; the returned future resolves to its result."""
+        call = _Call(worker=None, slots=[], future=Future())
+        self._dispatch(method, args, False, call)
+        return call.future
+
+    async def stream(self, method: str, *args) -> AsyncIterator[Any]:
+        """
+        Iterate a generator method of a worker's service. The worker runs at most
+        WORKER_FARM_STREAM_WINDOW items ahead of this iterator, and stops if it is closed early.
+        """
+        loop = asyncio.get_running_loop()
+        # Room for a full window of items plus the final done/error message
+        items: asyncio.Queue = asyncio.Queue(maxsize=settings.WORKER_FARM_STREAM_WINDOW + 1)
+        call = _Call(worker=None, slots=[],
+                     deliver=lambda kind, payload: loop.call_soon_threadsafe(items.put_nowait, (kind, payload)))
+        call_id = self._dispatch(method, args, True, call)
+        control = call.worker.control
+        consumed = 0
+        finished = False
+        try:
+            while True:
+                kind, payload = await items.get()
+                if kind != "item":
+                    finished = True
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise RuntimeError(payload)
+                consumed += 1
+                control.consumed(call_id, consumed)
+                yield payload
+        finally:
+            # The reader went away: tell the worker to drop the stream and take its next call
+            if not finished:
+                control.cancel(call_id)
+
+    def _collect(self):
+        """Route results coming back from the workers to their callers."""
+        while (message := self._results.get()) is not None:
+            kind, worker_id, call_id, payload, busy_seconds = message
+            with self._lock:
+                worker = self._workers.get(worker_id)
+                if kind == "ready":
+                    if worker is not None:
+                        worker.ready_at = time.monotonic()
+                    self.model_info = payload
+                    self._crash_streak = 0
+                    continue
+                call = self._calls.get(call_id) if kind == "item" else self._calls.pop(call_id, None)
+                if call is None:
+                    continue
+                if kind != "item" and worker is not None:
+                    worker.in_flight.discard(call_id)
+                    worker.busy_seconds += busy_seconds
+                    if kind == "done":
+                        worker.completed += 1
+                    else:
+                        worker.failed += 1
+            if kind != "item":
+                for slot in call.slots:
+                    self.ring.release(slot)
+            if call.deliver is not None:
+                call.deliver(kind, payload)
+            elif kind == "done":
+                call.future.set_result(payload)
+            else:
+                call.future.set_exception(RuntimeError(payload))
+
+    def _fail(self, call: _Call, reason: str):
+        for slot in call.slots:
+            self.ring.release(slot)
+        if call.deliver is not None:
+            call.deliver("error", reason)
+        elif not call.future.done():
+            call.future.set_exception(RuntimeError(reason))
+
+    def _monitor(self):
+        """Replace workers that exited, failing the calls they were holding."""
+        while not self._stopping.wait(settings.WORKER_FARM_HEALTH_SECONDS):
+            with self._lock:
+                exited = [worker for worker in self._workers.values() if not worker.process.is_alive()]
+                lost = {}
+                for worker in exited:
+                    del self._workers[worker.id]
+                    lost[worker.id] = [self._calls.pop(call_id) for call_id in worker.in_flight
+                                       if call_id in self._calls]
+            for worker in exited:
+                for call in lost[worker.id]:
+                    self._fail(call, f"Inference worker {worker.id} exited with code {worker.process.exitcode}")
+                worker.tasks.close()
+                if worker.retiring:
+                    continue
+                logger.error(f"Inference worker {worker.id} exited with code {worker.process.exitcode}, restarting")
+                self.restarts += 1
+                self._crash_streak += 1
+                # Back off when workers keep dying before they get the model loaded
+                if self._stopping.wait(min(settings.WORKER_FARM_RESTART_DELAY_SECONDS * 2 ** (self._crash_streak - 1),
+                                           60)):
+                    return
+                self._spawn()
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            workers = [{
+                "id": worker.id,
+                "pid": worker.process.pid,
+                "alive": worker.process.is_alive(),
+                "ready": worker.ready_at is not None,
+                "retiring": worker.retiring,
+                "in_flight": len(worker.in_flight),
+                "completed": worker.completed,
+                "failed": worker.failed,
+                "busy_seconds": round(worker.busy_seconds, 3),
+                # Share of the time since the model was ready spent running calls
+                "utilization": round(min(1.0, worker.busy_seconds / (now - worker.ready_at)), 3)
+                if worker.ready_at is not None and now > worker.ready_at else 0.0,
+            } for worker in self._workers.values()]
+        return {
+            "workers": workers,
+            "restarts": self.restarts,
+            "ring_slots": self.ring.slots,
+            "ring_slot_mb": round(self.ring.slot_bytes / (1024 * 1024), 2),
+            "ring_slots_in_use": self.ring.in_use,
+            "frames_shared": self.frames_shared,
+            "frames_inline": self.frames_inline,
+        }
@@ -7,17 +7,50 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.routers import router as api_router
+from app.api.services.detection_job_service import detection_job_worker
+from app.api.services.micro_batcher import image_batcher
+from app.api.services.notification_dispatcher import notification_dispatcher
+from app.api.services.notification_hub import notification_hub
+from app.api.services.stream_monitor_service import stream_monitor
 from app.core.config import settings
+from app.core.cpu_resources import cpu_resources
 from app.core.database import create_db_and_tables
 from app.core.exceptions import AppException
+from app.core.inference_executor import inference_executor
+from app.core.model_registry import model_registry
+from app.core.result_cache import result_cache
+from app.middlewares.upload_limit import UploadLimitMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("Starting up...")
+    if settings.CPU_MANAGEMENT_ENABLED:
+        # With process or farm inference the workers run the model and claim the core slots
+        cpu_resources.configure(pin=settings.INFERENCE_EXECUTOR == "thread")
     create_db_and_tables()
+    if settings.RESULT_CACHE_ENABLED:
+        result_cache.purge_expired()
+    # Process and farm workers load their own copies; the web process only needs one for thread inference
+    if settings.MODEL_PRELOAD and settings.INFERENCE_EXECUTOR == "thread":
+        model_registry.load()
+    inference_executor.start()
+    notification_hub.start()
+    notification_dispatcher.start()
+    detection_job_worker.start()
+    if settings.STREAM_MONITOR_ENABLED:
+        stream_monitor.start()
+    if settings.IMAGE_BATCHING_ENABLED:
+        await image_batcher.start()
     yield
     logging.info("Shutting down database...")
+    await image_batcher.stop()
+    stream_monitor.shutdown()
+    detection_job_worker.shutdown()
+    notification_dispatcher.shutdown()
+    notification_hub.shutdown()
+    inference_executor.shutdown()
+    model_registry.unload()
 
 
 app = FastAPI(
@@ -28,6 +61,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject oversized uploads before their bodies are spooled
+app.add_middleware(UploadLimitMiddleware, max_bytes=settings.UPLOAD_MAX_BYTES)
+
 # set up CORS
 if settings.CORS_ORIGINS:
     app.add_middleware(CORSMiddleware, allow_origins=[str(origin) for origin in settings.CORS_ORIGINS],
@@ -60,6 +96,7 @@ async def app_exception_handler(request: Request, exc: AppException):
     return JSONResponse(
         status_code=exc.status_code if exc.status_code else http.HTTPStatus.INTERNAL_SERVER_ERROR,
         content={"success": False, "error": exc.message if exc.message else "Internal server error"},
+        headers=exc.headers,
     )
 
 
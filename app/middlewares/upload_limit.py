@@ -0,0 +1,66 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.exceptions import FileTooLargeException
+
+# Room for multipart boundaries, part headers and the small form fields next to the files
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadLimitMiddleware:
+    """
+    Turns away request bodies over `max_bytes` before Starlette spools them to disk.
+
+    A declared Content-Length over the limit is answered with a 413 straight away; bodies
+    sent without one are counted as they arrive and cut off once they pass it.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_bytes + FORM_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        rejected = started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    if not started:
+                        await self._reject(scope, receive, send)
+                    # The app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal started
+            # Our 413 has already gone out; drop whatever the app answers after it
+            if not rejected:
+                started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send):
+        error = FileTooLargeException(self.max_bytes)
+        response = JSONResponse(status_code=error.status_code, content={"success": False, "error": error.message},
+                                headers={"Connection": "close"})
+        await response(scope, receive, send)
@@ -27,6 +27,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.models.user import User
 from app.models.shift import Shift
+from app.models.detection_job import DetectionJob, DetectionJobFrame
+from app.models.detection_cache import DetectionCacheEntry
+from app.models.monitored_stream import MonitoredStream
 
 target_metadata = SQLModel.metadata
 
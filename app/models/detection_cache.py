@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Text
+from sqlmodel import SQLModel, Field
+
+
+class DetectionCacheEntry(SQLModel, table=True):
+    """Persistent tier of the detection result cache (see app.core.result_cache)."""
+    __tablename__ = 'detection_cache'
+    key: str = Field(primary_key=True, max_length=64)  # sha256 of content hash, model and options
+    kind: str = Field(index=True)  # "image" or "video"
+    result: str = Field(sa_column=Column(Text, nullable=False))  # JSON-encoded result
+    created_at: datetime = Field(default_factory=lambda: datetime.now())
+    expires_at: datetime = Field(index=True)
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column, JSON
+from sqlmodel import SQLModel, Field
+
+from app.constants.job_status import JobStatusEnum
+
+
+class DetectionJob(SQLModel, table=True):
+    __tablename__ = 'detection_jobs'
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", index=True)
+    status: JobStatusEnum = Field(default=JobStatusEnum.PENDING.value, index=True)
+    filename: str | None = Field(default=None)
+    # Uploaded video kept on disk until the job finishes so it can be resumed after a restart
+    video_path: str
+    options: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+
+    total_frames: int = Field(default=0)
+    frames_decoded: int = Field(default=0)
+    processed_frames: int = Field(default=0)
+    summary: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    error: str | None = Field(default=None)
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now())
+    updated_at: datetime = Field(default_factory=lambda: datetime.now())
+    finished_at: datetime | None = Field(default=None)
+
+
+class DetectionJobFrame(SQLModel, table=True):
+    """Per-frame result of a detection job, written in batches while the job runs."""
+    __tablename__ = 'detection_job_frames'
+    id: int | None = Field(default=None, primary_key=True)
+    job_id: uuid.UUID = Field(foreign_key="detection_jobs.id", index=True)
+    frame: int
+    result: dict[str, Any] = Field(sa_column=Column(JSON))
@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column, JSON
+from sqlmodel import SQLModel, Field
+
+
+class MonitoredStream(SQLModel, table=True):
+    """A live camera feed (or a local file/device standing in for one) watched continuously."""
+    __tablename__ = 'monitored_streams'
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", index=True)
+    name: str
+    url: str
+    options: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    # Restart a local file from the beginning when it ends, so it behaves like an endless feed
+    loop: bool = Field(default=False)
+    is_active: bool = Field(default=True, index=True)
+    # API process currently watching the stream, and until when its claim holds without renewal
+    lease_owner: str | None = Field(default=None, index=True)
+    lease_expires_at: datetime | None = Field(default=None)
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now())
+    updated_at: datetime = Field(default_factory=lambda: datetime.now())
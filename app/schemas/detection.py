@@ -0,0 +1,40 @@
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+
+# What a video analysis returns: per-frame results, merged incidents, or both
+VideoOutput = Literal["frames", "incidents", "both"]
+
+
+class DetectionOptions(BaseModel):
+    """
+    Per-call tuning for a detection run.
+
+    Instances are immutable so a single shared model can serve differently tuned requests
+    concurrently without anyone mutating service state.
+    """
+    confidence: float = Field(default=0.25, ge=0.0, le=1.0)
+    frame_stride: int = Field(default=10, ge=1)  # process every Nth video frame
+    # Alternatives to frame_stride, resolved against the video's FPS (the interval wins if both are set)
+    sample_fps: float | None = Field(default=None, gt=0)  # target sampled frames per second of video
+    sample_interval_seconds: float | None = Field(default=None, gt=0)  # seconds of video between samples
+    # Gate sampled frames on motion: skip static scenes, sample densely when motion spikes
+    adaptive_sampling: bool = False
+    # Link detections across frames with track ids, optionally synthesising tracked boxes every
+    # Nth frame between inferred frames so the model can run less often
+    tracking: bool = False
+    track_fill_stride: int | None = Field(default=None, ge=1)
+    input_size: int = Field(default=320, ge=32, le=1280)  # square side frames are resized to
+    batch_size: int = Field(default=4, ge=1, le=64)  # video frames per forward pass
+    max_detections: int = Field(default=300, ge=1, le=1000)
+
+    model_config = ConfigDict(frozen=True)
+
+    def resolve_frame_stride(self, fps: float) -> int:
+        """Number of frames between samples for a video playing at `fps`."""
+        if fps > 0:
+            if self.sample_interval_seconds is not None:
+                return max(1, round(self.sample_interval_seconds * fps))
+            if self.sample_fps is not None:
+                return max(1, round(fps / self.sample_fps))
+        return self.frame_stride
@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, computed_field
+
+from app.constants.job_status import JobStatusEnum
+
+
+class DetectionJobBaseResponse(BaseModel):
+    id: uuid.UUID
+    status: JobStatusEnum
+    filename: str | None = None
+    options: dict[str, Any]
+    total_frames: int
+    frames_decoded: int
+    processed_frames: int
+    summary: dict[str, Any] | None = None
+    error: str | None = None
+
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+    # This allows direct conversion from SQLModel DetectionJob to this Pydantic model
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        """Fraction of the video decoded so far."""
+        if self.status == JobStatusEnum.COMPLETED:
+            return 1.0
+        if not self.total_frames:
+            return 0.0
+        return round(min(self.frames_decoded / self.total_frames, 1.0), 4)
+
+
+class DetectionJobResponse(BaseModel):
+    success: bool = True
+    data: DetectionJobBaseResponse
+    message: str | None = None
+
+
+class DetectionJobsResponse(BaseModel):
+    success: bool = True
+    data: list[DetectionJobBaseResponse]
+
+
+class DetectionJobResultsResponse(BaseModel):
+    success: bool = True
+    status: JobStatusEnum
+    data: list[dict[str, Any]]
+    offset: int
+    limit: int
+    total: int
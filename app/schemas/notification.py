@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, computed_field
 
 from app.constants.messages import MESSAGE
 
@@ -28,6 +28,12 @@ class NotificationBaseResponse(BaseModel):
     # This allows direct conversion from SQLModel User to this Pydantic model
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def cursor(self) -> str:
+        """Pass back as `since` (or Last-Event-ID) to get only what came after this notification."""
+        return f"{self.created_at.strftime('%Y-%m-%dT%H:%M:%S.%f')}|{self.id}"
+
 
 class NotificationResponse(BaseModel):
     success: bool = True
@@ -37,6 +43,7 @@ class NotificationResponse(BaseModel):
 class NotificationsResponse(BaseModel):
     success: bool = True
     data: list[NotificationBaseResponse]
+    cursor: str | None = None  # position of the last notification returned
 
 class NotificationDeleteResponse(BaseModel):
     success: bool = True
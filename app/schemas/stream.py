@@ -0,0 +1,61 @@
+import uuid
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from pydantic import BaseModel, ConfigDict, field_serializer
+
+from app.constants.messages import MESSAGE
+from app.schemas.detection import DetectionOptions
+
+
+class StreamCreate(BaseModel):
+    name: str
+    url: str  # rtsp://, http(s):// URL, or a local file path / device index where allowed
+    options: DetectionOptions = DetectionOptions()
+    loop: bool = False
+
+
+class StreamUpdate(BaseModel):
+    is_active: bool
+
+
+class StreamBaseResponse(BaseModel):
+    id: uuid.UUID
+    name: str
+    url: str
+    options: dict[str, Any]
+    loop: bool
+    is_active: bool
+    lease_owner: str | None = None  # API process watching the stream; stats come from that process
+    stats: dict[str, Any] | None = None
+
+    created_at: datetime
+    updated_at: datetime
+
+    # This allows direct conversion from SQLModel MonitoredStream to this Pydantic model
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer('url')
+    def redact_url(self, url: str) -> str:
+        """Camera URLs often embed credentials; never echo the password back."""
+        parts = urlsplit(url)
+        if not parts.password:
+            return url
+        return urlunsplit(parts._replace(netloc=f"{parts.username}:***@{parts.netloc.rsplit('@', 1)[1]}"))
+
+
+class StreamResponse(BaseModel):
+    success: bool = True
+    data: StreamBaseResponse
+    message: str | None = None
+
+
+class StreamsResponse(BaseModel):
+    success: bool = True
+    data: list[StreamBaseResponse]
+
+
+class StreamDeleteResponse(BaseModel):
+    success: bool = True
+    message: str = MESSAGE.DELETED
@@ -0,0 +1,112 @@
+import base64
+import json
+from typing import Any
+
+import msgpack
+import numpy as np
+
+# Media types for video results; the columnar layout is opt-in through the Accept header
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.columnar+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def negotiate_media_type(accept: str | None) -> str:
+    """Pick the response media type for video results from an Accept header (JSON by default)."""
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type == COLUMNAR_JSON_MEDIA_TYPE or media_type in MSGPACK_MEDIA_TYPES:
+            return media_type
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def to_columnar(results: list[dict[str, Any]], metadata: dict[str, Any]) -> dict[str, Any]:
+    """
+    Convert per-frame results into parallel arrays with a single shared header.
+
+    `frames` holds one entry per processed frame and `detections` one per box, linked by
+    frame number. Boxes are packed as a little-endian float32 block of shape (n, 4), returned
+    as raw bytes; class names live once in the header instead of on every detection.
+    """
+    frames: dict[str, list] = {"frame": [], "violence_detected": [], "confidence": [], "detection_count": []}
+    detection_frames: list[int] = []
+    bboxes: list[list[float]] = []
+    confidences: list[float] = []
+    class_ids: list[int] = []
+    class_names: dict[int, str] = {}
+    track_ids: list[int | None] = []
+    sampling: list[str | None] = []
+    propagated: list[bool] = []
+    errors = []
+
+    for result in results:
+        if "error" in result:
+            # Errors about the whole video (it couldn't be opened) have no frame
+            errors.append({"frame": result.get("frame"), "error": result["error"]})
+            continue
+        detections = result["detections"]
+        frames["frame"].append(result["frame"])
+        frames["violence_detected"].append(result["violence_detected"])
+        frames["confidence"].append(result["confidence"])
+        frames["detection_count"].append(len(detections))
+        sampling.append(result["sampling"]["decision"] if "sampling" in result else None)
+        propagated.append(result.get("propagated", False))
+        for detection in detections:
+            detection_frames.append(result["frame"])
+            bboxes.append(detection["bbox"])
+            confidences.append(detection["confidence"])
+            class_ids.append(detection["class_id"])
+            track_ids.append(detection.get("track_id"))
+            class_names[detection["class_id"]] = detection["class_name"]
+
+    if any(decision is not None for decision in sampling):
+        frames["sampling"] = sampling
+    if any(propagated):
+        frames["propagated"] = propagated
+
+    header = {**metadata, "class_names": {str(class_id): name for class_id, name in sorted(class_names.items())}}
+    if "frame_size" not in header and results and "frame_size" in results[0]:
+        header["frame_size"] = results[0]["frame_size"]
+
+    return {
+        "layout": "columnar",
+        "metadata": header,
+        "frames": frames,
+        "detections": {
+            "frame": detection_frames,
+            "bbox": np.asarray(bboxes, dtype="<f4").reshape(-1, 4).tobytes(),
+            "bbox_dtype": "float32",
+            "bbox_shape": [len(bboxes), 4],
+            "confidence": confidences,
+            "class_id": class_ids,
+            **({"track_id": track_ids} if any(track_id is not None for track_id in track_ids) else {}),
+        },
+        "errors": errors,
+    }
+
+
+def encode_json(columnar: dict[str, Any]) -> bytes:
+    """Compact JSON; the packed box block is base64-encoded."""
+    detections = columnar["detections"]
+    payload = {**columnar, "detections": {**detections, "bbox": base64.b64encode(detections["bbox"]).decode("ascii"),
+                                          "bbox_encoding": "base64"}}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_msgpack(columnar: dict[str, Any]) -> bytes:
+    """MessagePack; the packed box block is sent as a binary value."""
+    return msgpack.packb(columnar, use_bin_type=True)
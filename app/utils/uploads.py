@@ -0,0 +1,221 @@
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.exceptions import AppException, FileTooLargeException
+
+# Limit on the plain (non-file) form fields sent next to an upload, all together
+MAX_FIELD_BYTES = 64 * 1024
+
+
+@dataclass
+class StoredUpload:
+    """A file part written to disk while the request body arrived, plus the form fields around it."""
+    path: str
+    filename: str
+    content_type: str
+    size: int = 0
+    sha256: str | None = None
+    fields: dict[str, str] = field(default_factory=dict)
+
+
+def _memory_dir(size: int) -> str | None:
+    """
+    Memory-backed directory (tmpfs) for a small upload, if the host has one with room to
+    spare. The farm's frame ring lives in /dev/shm as well, so its full size is kept free.
+    """
+    directory = settings.UPLOAD_MEMORY_DIR
+    if not directory or not os.path.isdir(directory) or not os.access(directory, os.W_OK):
+        return None
+    reserved = (settings.WORKER_FARM_RING_SLOTS * settings.WORKER_FARM_SLOT_BYTES
+                if settings.INFERENCE_EXECUTOR == "farm" else 0)
+    if shutil.disk_usage(directory).free - size < reserved:
+        return None
+    return directory
+
+
+def _write_chunk(f: BinaryIO, chunk: bytes, hasher: Any | None):
+    f.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+class _MultipartReceiver:
+    """
+    Feeds request body chunks through python-multipart and writes the file part straight to
+    a temp file. Parser callbacks only record events; the (blocking) writes happen afterwards
+    in the threadpool, UPLOAD_CHUNK_SIZE at a time.
+    """
+
+    def __init__(self, boundary: bytes, file_field: str, directory: str | None, max_bytes: int,
+                 hash_content: bool):
+        self.file_field = file_field
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256() if hash_content else None
+        self.upload: StoredUpload | None = None
+        self.fields: dict[str, str] = {}
+
+        self._events: list[tuple[str, bytes]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._part: str | None = None  # "file", "field", or None for parts that are ignored
+        self._field_name = ""
+        self._field_bytes = 0
+        self._value = bytearray()
+        self._pending = bytearray()
+        self._file: BinaryIO | None = None
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": lambda: self._events.append(("begin", b"")),
+            "on_header_field": lambda data, start, end: self._events.append(("header_field", data[start:end])),
+            "on_header_value": lambda data, start, end: self._events.append(("header_value", data[start:end])),
+            "on_header_end": lambda: self._events.append(("header_end", b"")),
+            "on_headers_finished": lambda: self._events.append(("headers_finished", b"")),
+            "on_part_data": lambda data, start, end: self._events.append(("data", data[start:end])),
+            "on_part_end": lambda: self._events.append(("end", b"")),
+        })
+
+    async def feed(self, chunk: bytes):
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise AppException(f"Malformed multipart body: {e}", 400)
+        events, self._events = self._events, []
+        for kind, data in events:
+            if kind == "begin":
+                self._headers = {}
+            elif kind == "header_field":
+                self._header_field += data
+            elif kind == "header_value":
+                self._header_value += data
+            elif kind == "header_end":
+                self._headers[self._header_field.lower()] = self._header_value
+                self._header_field = self._header_value = b""
+            elif kind == "headers_finished":
+                self._begin_part()
+            elif kind == "data":
+                self._part_data(data)
+            elif kind == "end":
+                await self._end_part()
+        if len(self._pending) >= settings.UPLOAD_CHUNK_SIZE:
+            await self._flush()
+
+    def _begin_part(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part = "field"
+            self._field_name = name
+            self._value = bytearray()
+        elif name == self.file_field and self.upload is None:
+            self._part = "file"
+            filename = filename.decode("utf-8", errors="replace")
+            # Keep the extension, some containers are only recognised by it
+            fd, path = tempfile.mkstemp(suffix=pathlib.Path(filename).suffix, dir=self.directory)
+            self._file = os.fdopen(fd, "wb")
+            content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+            self.upload = StoredUpload(path=path, filename=filename, content_type=content_type)
+        else:
+            self._part = None
+
+    def _part_data(self, data: bytes):
+        if self._part == "file":
+            self.upload.size += len(data)
+            if self.upload.size > self.max_bytes:
+                raise FileTooLargeException(self.max_bytes)
+            self._pending += data
+        elif self._part == "field":
+            self._field_bytes += len(data)
+            if self._field_bytes > MAX_FIELD_BYTES:
+                raise AppException("Form fields are too large", 413)
+            self._value += data
+
+    async def _end_part(self):
+        if self._part == "file":
+            await self._flush()
+            self._file.close()
+            self._file = None
+        elif self._part == "field":
+            self.fields[self._field_name] = self._value.decode("utf-8", errors="replace")
+        self._part = None
+
+    async def _flush(self):
+        if self._pending and self._file is not None:
+            chunk, self._pending = bytes(self._pending), bytearray()
+            await run_in_threadpool(_write_chunk, self._file, chunk, self.hasher)
+
+    async def finish(self):
+        try:
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise AppException(f"Malformed multipart body: {e}", 400)
+        if self._part == "file":
+            raise AppException("The upload ended before the file was complete", 400)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+async def receive_upload(request: Request, file_field: str = "file", directory: str | None = None,
+                         max_bytes: int | None = None, hash_content: bool = False) -> StoredUpload:
+    """
+    Parse a multipart/form-data request as it arrives and write its `file_field` file to a
+    temp file; the caller removes it. The body is never spooled anywhere else first.
+
+    At most `max_bytes` (UPLOAD_MAX_BYTES by default) are accepted, checked against the
+    declared Content-Length up front and against the bytes actually received. Without an
+    explicit `directory`, uploads small enough to fit UPLOAD_MEMORY_MAX_BYTES go to a tmpfs
+    (when configured) so the decoder reads them from memory, everything else to the regular
+    temp directory. With `hash_content` the file's SHA-256 is computed on the way, saving a
+    second pass to fingerprint it. The other form fields come back as strings in `fields`.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise AppException("Expected a multipart/form-data body", 400)
+    content_length = request.headers.get("content-length")
+    length = int(content_length) if content_length and content_length.isdigit() else None
+    if length is not None and length > max_bytes + MAX_FIELD_BYTES + 64 * 1024:
+        raise FileTooLargeException(max_bytes)
+
+    if directory is None and length is not None and length <= settings.UPLOAD_MEMORY_MAX_BYTES:
+        directory = _memory_dir(length)
+    elif directory is not None:
+        pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+
+    receiver = _MultipartReceiver(options[b"boundary"], file_field, directory, max_bytes, hash_content)
+    try:
+        async for chunk in request.stream():
+            await receiver.feed(chunk)
+        await receiver.finish()
+    except BaseException:
+        receiver.close()
+        if receiver.upload is not None:
+            os.unlink(receiver.upload.path)
+        raise
+    finally:
+        receiver.close()
+
+    upload = receiver.upload
+    if upload is None:
+        raise RequestValidationError([{"type": "missing", "loc": ("body", file_field), "msg": "Field required",
+                                       "input": None}])
+    upload.fields = receiver.fields
+    upload.sha256 = receiver.hasher.hexdigest() if receiver.hasher is not None else None
+    return upload
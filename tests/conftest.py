@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# Settings are read when app modules are imported, so point them at a throwaway database first
+_db_dir = tempfile.mkdtemp(prefix="crime-detection-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'test.db')}")
+os.environ.setdefault("HUGGING_REPO_ID", "test/test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+
+import pytest  # noqa: E402
+
+from app.core import database  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    # Every table the app declares, so foreign keys resolve
+    import app.main  # noqa: F401
+
+    database.engine.echo = False
+    database.create_db_and_tables()
+    return database.engine
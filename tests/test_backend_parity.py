@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from app.api.services.inference_backends import media_sources, sample_frames
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.benchmarks.backends import PARITY_TOLERANCES, compare, detect, shared_sources, within_tolerance
+from app.core.config import settings
+from app.schemas.detection import DetectionOptions
+
+# Exported artifacts land next to the weights, so only run against a local model
+MODEL_PATH = os.environ.get("MODEL_PATH")
+# Footage from the cameras the service watches: one set to score the backends on and a
+# different one for the static int8 export to calibrate on
+PARITY_FIXTURES = os.environ.get("PARITY_FIXTURES")
+PARITY_CALIBRATION_PATH = os.environ.get("PARITY_CALIBRATION_PATH")
+
+needs_model = pytest.mark.skipif(not MODEL_PATH or not os.path.isfile(MODEL_PATH) or not PARITY_FIXTURES,
+                                 reason="MODEL_PATH must point at local weights and PARITY_FIXTURES at "
+                                        "evaluation footage")
+
+OPTIONS = DetectionOptions(confidence=0.25, input_size=320, batch_size=2)
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return sample_frames(media_sources(PARITY_FIXTURES), 32)
+
+
+@pytest.fixture(scope="module")
+def reference(frames):
+    results, _ = detect(ViolenceDetectionService(model_path=MODEL_PATH, backend="torch"), frames, OPTIONS)
+    return results
+
+
+@needs_model
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8", "onnx-int8-static"])
+def test_backend_matches_torch(monkeypatch, frames, reference, backend):
+    if backend == "onnx-int8-static":
+        if not PARITY_CALIBRATION_PATH:
+            pytest.skip("PARITY_CALIBRATION_PATH must point at calibration footage")
+        assert not shared_sources(PARITY_FIXTURES, PARITY_CALIBRATION_PATH), "calibrated on the scoring set"
+        monkeypatch.setattr(settings, "QUANT_CALIBRATION_PATH", PARITY_CALIBRATION_PATH)
+    results, _ = detect(ViolenceDetectionService(model_path=MODEL_PATH, backend=backend), frames, OPTIONS)
+
+    parity = compare(reference, results)
+    assert within_tolerance(parity, backend), f"{backend} outside {PARITY_TOLERANCES[backend]}: {parity}"
+
+
+def test_compare_flags_drift():
+    reference = [{"frame": 0, "violence_detected": True,
+                  "detections": [{"class_id": 0, "confidence": 0.9, "bbox": [10, 10, 50, 50]}]}]
+    shifted = [{"frame": 0, "violence_detected": True,
+                "detections": [{"class_id": 0, "confidence": 0.6, "bbox": [30, 30, 70, 70]}]}]
+
+    assert within_tolerance(compare(reference, reference), "onnx")
+    assert not within_tolerance(compare(reference, shifted), "onnx-int8")
+
+
+def test_calibration_copies_of_evaluation_files_are_found(tmp_path):
+    (tmp_path / "eval").mkdir()
+    (tmp_path / "calibration").mkdir()
+    (tmp_path / "eval" / "a.jpg").write_bytes(b"frame a")
+    (tmp_path / "eval" / "b.jpg").write_bytes(b"frame b")
+    (tmp_path / "calibration" / "copy.jpg").write_bytes(b"frame b")
+    (tmp_path / "calibration" / "c.jpg").write_bytes(b"frame c")
+
+    assert shared_sources(tmp_path / "eval", tmp_path / "calibration") == [tmp_path / "eval" / "b.jpg"]
+    assert shared_sources(tmp_path / "eval" / "a.jpg", tmp_path / "calibration") == []
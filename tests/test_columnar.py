@@ -0,0 +1,78 @@
+import base64
+import json
+
+import msgpack
+import numpy as np
+
+from app.utils.columnar import (COLUMNAR_JSON_MEDIA_TYPE, JSON_MEDIA_TYPE, encode_json, encode_msgpack,
+                                negotiate_media_type, to_columnar)
+
+
+def _frame(frame, boxes, **extra):
+    detections = [{"bbox": bbox, "confidence": confidence, "class_id": class_id, "class_name": f"class-{class_id}"}
+                  for bbox, confidence, class_id in boxes]
+    return {"frame": frame, "violence_detected": bool(detections), "confidence": max(
+        (d["confidence"] for d in detections), default=0.0), "detections": detections,
+        "frame_size": {"height": 480, "width": 640}, **extra}
+
+
+RESULTS = [
+    _frame(0, [([1.0, 2.0, 3.0, 4.0], 0.9, 1), ([5.0, 6.0, 7.0, 8.0], 0.6, 0)]),
+    _frame(15, []),
+    {"frame": 30, "error": "Inference failed"},
+    _frame(45, [([9.5, 10.5, 11.5, 12.5], 0.7, 1)]),
+]
+
+
+def test_negotiate_media_type():
+    assert negotiate_media_type(None) == JSON_MEDIA_TYPE
+    assert negotiate_media_type("text/html, */*") == JSON_MEDIA_TYPE
+    assert negotiate_media_type(COLUMNAR_JSON_MEDIA_TYPE) == COLUMNAR_JSON_MEDIA_TYPE
+    assert negotiate_media_type("application/json;q=0.5, application/msgpack") == "application/msgpack"
+    assert negotiate_media_type("application/msgpack;q=0") == JSON_MEDIA_TYPE
+
+
+def test_to_columnar_matches_row_results():
+    columnar = to_columnar(RESULTS, {"fps": 30.0})
+
+    assert columnar["frames"] == {"frame": [0, 15, 45], "violence_detected": [True, False, True],
+                                  "confidence": [0.9, 0.0, 0.7], "detection_count": [2, 0, 1]}
+    detections = columnar["detections"]
+    assert detections["frame"] == [0, 0, 45]
+    assert detections["class_id"] == [1, 0, 1]
+    assert detections["bbox_shape"] == [3, 4]
+    boxes = np.frombuffer(detections["bbox"], dtype="<f4").reshape(3, 4)
+    assert boxes.tolist() == [[1, 2, 3, 4], [5, 6, 7, 8], [9.5, 10.5, 11.5, 12.5]]
+    assert columnar["metadata"]["class_names"] == {"0": "class-0", "1": "class-1"}
+    assert columnar["metadata"]["frame_size"] == {"height": 480, "width": 640}
+    assert columnar["errors"] == [{"frame": 30, "error": "Inference failed"}]
+    assert "track_id" not in detections
+
+
+def test_to_columnar_keeps_track_ids_and_sampling():
+    result = _frame(0, [([1.0, 2.0, 3.0, 4.0], 0.9, 1)], sampling={"decision": "motion"})
+    result["detections"][0]["track_id"] = 7
+
+    columnar = to_columnar([result], {})
+
+    assert columnar["detections"]["track_id"] == [7]
+    assert columnar["frames"]["sampling"] == ["motion"]
+
+
+def test_to_columnar_handles_videos_that_could_not_be_opened():
+    columnar = to_columnar([{"error": "Could not open video file."}], {})
+
+    assert columnar["errors"] == [{"frame": None, "error": "Could not open video file."}]
+    assert columnar["frames"]["frame"] == []
+    assert columnar["detections"]["bbox_shape"] == [0, 4]
+
+
+def test_encodings_round_trip():
+    columnar = to_columnar(RESULTS, {"fps": 30.0})
+
+    decoded = json.loads(encode_json(columnar))
+    assert decoded["detections"]["bbox_encoding"] == "base64"
+    assert base64.b64decode(decoded["detections"]["bbox"]) == columnar["detections"]["bbox"]
+    assert decoded["frames"] == columnar["frames"]
+
+    assert msgpack.unpackb(encode_msgpack(columnar), raw=False) == columnar
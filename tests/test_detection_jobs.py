@@ -0,0 +1,35 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.api.services.detection_job_service import _JobHeartbeat, detection_job_worker
+from app.constants.job_status import JobStatusEnum
+from app.core.config import settings
+from app.models.detection_job import DetectionJob
+
+
+def test_heartbeat_keeps_a_quiet_running_job_from_being_resumed(monkeypatch, db_engine):
+    monkeypatch.setattr(settings, "VIDEO_JOB_STALE_SECONDS", 0.3)
+    long_ago = datetime.now() - timedelta(hours=1)
+    quiet = DetectionJob(user_id=uuid.uuid4(), video_path="quiet.mp4", status=JobStatusEnum.RUNNING,
+                         updated_at=long_ago)
+    orphaned = DetectionJob(user_id=uuid.uuid4(), video_path="orphaned.mp4", status=JobStatusEnum.RUNNING,
+                            updated_at=long_ago)
+    with Session(db_engine) as db:
+        db.add_all([quiet, orphaned])
+        db.commit()
+        quiet_id, orphaned_id = quiet.id, orphaned.id
+
+    submitted = []
+    monkeypatch.setattr(detection_job_worker, "submit", submitted.append)
+    # No batch output at all, only the heartbeat
+    with _JobHeartbeat(quiet_id):
+        time.sleep(0.25)
+        detection_job_worker.resume_pending()
+
+    with Session(db_engine) as db:
+        assert db.get(DetectionJob, quiet_id).status == JobStatusEnum.RUNNING
+        assert db.get(DetectionJob, orphaned_id).status == JobStatusEnum.PENDING
+    assert quiet_id not in submitted and orphaned_id in submitted
@@ -0,0 +1,85 @@
+import pytest
+
+from app.api.services.incident_aggregator import IncidentAggregator
+
+
+def _frame(frame: int, confidence: float, class_name: str = "violence") -> dict:
+    detections = [{"class_name": class_name, "confidence": confidence}] if confidence else []
+    return {"frame": frame, "violence_detected": bool(confidence), "confidence": confidence, "detections": detections}
+
+
+@pytest.fixture
+def aggregator():
+    return IncidentAggregator(fps=10.0, start_confidence=0.5, end_confidence=0.3, gap_seconds=1.0, min_frames=1)
+
+
+def test_hysteresis_keeps_one_incident_open(aggregator):
+    closed = aggregator.update([_frame(0, 0.4), _frame(1, 0.6), _frame(2, 0.35), _frame(3, 0.45), _frame(4, 0.8)])
+
+    assert closed == []
+    [incident] = aggregator.finish()
+    assert (incident["start_frame"], incident["end_frame"]) == (1, 4)
+    assert incident["positive_frames"] == 4
+    assert (incident["peak_confidence"], incident["peak_frame"], incident["peak_seconds"]) == (0.8, 4, 0.4)
+    assert incident["classes"] == {"violence": {"detections": 4, "peak_confidence": 0.8}}
+
+
+def test_below_start_confidence_never_opens(aggregator):
+    aggregator.update([_frame(i, 0.45) for i in range(20)])
+
+    assert aggregator.finish() == []
+    assert aggregator.opened_count == 0
+
+
+def test_gap_longer_than_gap_seconds_splits_incidents(aggregator):
+    closed = aggregator.update([_frame(0, 0.9), _frame(10, 0.9), _frame(21, 0.9)])
+
+    # Frame 10 is exactly one second after frame 0 and extends it; frame 21 is 1.1 s later
+    assert [(i["start_frame"], i["end_frame"]) for i in closed] == [(0, 10)]
+    assert [(i["incident"], i["start_frame"]) for i in aggregator.finish()] == [(2, 21)]
+    assert aggregator.opened_count == 2
+
+
+def test_short_incidents_are_dropped():
+    aggregator = IncidentAggregator(fps=10.0, start_confidence=0.5, end_confidence=0.3, gap_seconds=1.0,
+                                    min_frames=3)
+    closed = aggregator.update([_frame(0, 0.9), _frame(1, 0.9), _frame(30, 0.9), _frame(31, 0.9), _frame(32, 0.9)])
+
+    assert closed == []
+    [incident] = aggregator.finish()
+    assert (incident["incident"], incident["start_frame"], incident["positive_frames"]) == (1, 30, 3)
+
+
+def test_error_results_are_skipped(aggregator):
+    aggregator.update([_frame(0, 0.9), {"frame": 1, "error": "Inference failed"}, _frame(2, 0.9)])
+
+    [incident] = aggregator.finish()
+    assert incident["positive_frames"] == 2
+
+
+def test_without_fps_gap_is_measured_in_strides():
+    aggregator = IncidentAggregator(fps=0, frame_stride=5, start_confidence=0.5, end_confidence=0.3,
+                                    gap_seconds=1.0, min_frames=1)
+    closed = aggregator.update([_frame(0, 0.9), _frame(5, 0.9), _frame(11, 0.9)])
+
+    assert [(i["start_frame"], i["end_frame"], i["start_seconds"]) for i in closed] == [(0, 5, None)]
+
+
+def test_sampling_stride_never_splits_an_incident():
+    aggregator = IncidentAggregator(fps=30.0, frame_stride=10, start_confidence=0.5, end_confidence=0.3,
+                                    gap_seconds=0.1, min_frames=1)
+    closed = aggregator.update([_frame(0, 0.9), _frame(10, 0.9), _frame(20, 0.9)])
+
+    assert closed == []
+    assert len(aggregator.finish()) == 1
+
+
+def test_incident_is_confirmed_once_it_reaches_min_frames():
+    aggregator = IncidentAggregator(fps=10.0, start_confidence=0.5, end_confidence=0.3, gap_seconds=1.0,
+                                    min_frames=3)
+    aggregator.update([_frame(0, 0.9), _frame(1, 0.9)])
+    assert (aggregator.opened_count, aggregator.confirmed_count) == (1, 0)
+
+    # A blip that closes short of min_frames is never confirmed
+    aggregator.update([_frame(2, 0.9), _frame(3, 0.9), _frame(40, 0.9)])
+    assert (aggregator.opened_count, aggregator.confirmed_count) == (2, 1)
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.api.services import micro_batcher as micro_batcher_module
+from app.api.services import violence_detection_service as service_module
+from app.api.services.micro_batcher import MicroBatcher
+from app.api.services.model_resolver import ResolvedModel
+from app.api.services.violence_detection_service import ViolenceDetectionService
+from app.core.exceptions import ServiceOverloadedException
+from app.core.inference_executor import InferenceExecutor
+from app.core.model_registry import model_registry
+from app.schemas.detection import DetectionOptions
+
+
+class _SlowExecutor:
+    """Stands in for the inference executor, recording how many batches run at once."""
+
+    def __init__(self, max_workers: int, delay: float = 0.05):
+        self.max_workers = max_workers
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+
+    def retry_after(self) -> int:
+        return 7
+
+    async def run(self, method: str, images, options):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return [{"value": int(image[0, 0])} for image in images]
+
+
+def _image(value: int) -> np.ndarray:
+    return np.full((2, 2), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = _SlowExecutor(max_workers=3)
+    monkeypatch.setattr(micro_batcher_module, "inference_executor", executor)
+    return executor
+
+
+def test_batches_run_concurrently_up_to_worker_count(executor):
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=2, max_wait_ms=1, max_queue_size=64)
+        results = await asyncio.gather(*(batcher.detect(_image(i), DetectionOptions()) for i in range(20)))
+        await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+
+    assert [r["value"] for r in results] == list(range(20))
+    assert executor.peak == executor.max_workers
+    assert batcher.images_processed == 20
+    assert batcher.stats()["batches_in_flight"] == 0
+
+
+def test_stop_fails_waiting_and_running_requests(executor):
+    executor.delay = 10
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=1, max_wait_ms=1, max_queue_size=64)
+        requests = [asyncio.create_task(batcher.detect(_image(i), DetectionOptions())) for i in range(5)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    outcomes = asyncio.run(scenario())
+
+    assert all(isinstance(outcome, ServiceOverloadedException) for outcome in outcomes)
+    assert all(outcome.headers == {"Retry-After": "7"} for outcome in outcomes)
+    assert executor.running == 0
+
+
+def test_full_queue_answers_with_retry_after(executor):
+    executor.delay = 10
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=1, max_wait_ms=1, max_queue_size=1)
+        requests = []
+        # One batch per worker, then one request waiting in the queue
+        for i in range(executor.max_workers + 1):
+            requests.append(asyncio.create_task(batcher.detect(_image(i), DetectionOptions())))
+            await asyncio.sleep(0.01)
+        try:
+            await batcher.detect(_image(9), DetectionOptions())
+        finally:
+            await batcher.stop()
+            await asyncio.gather(*requests, return_exceptions=True)
+
+    with pytest.raises(ServiceOverloadedException) as error:
+        asyncio.run(scenario())
+    assert error.value.headers == {"Retry-After": "7"}
+
+
+class _SlowModel:
+    """Model stand-in recording how many forward passes overlap across all its copies."""
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __call__(self, source, **kwargs):
+        with self.lock:
+            _SlowModel.running += 1
+            _SlowModel.peak = max(_SlowModel.peak, _SlowModel.running)
+        time.sleep(0.1)
+        with self.lock:
+            _SlowModel.running -= 1
+        return [np.empty((0, 6)) for _ in source]
+
+
+@pytest.fixture
+def thread_service(monkeypatch):
+    monkeypatch.setattr(service_module, "resolve_model", lambda path: ResolvedModel(path, "local", "0" * 64, 0.0, 0.0))
+    monkeypatch.setattr(service_module, "prepare_model", lambda path, backend, sha256: path)
+    monkeypatch.setattr(ViolenceDetectionService, "_load_model", lambda self, path: _SlowModel())
+    monkeypatch.setattr(_SlowModel, "peak", 0)
+    service = ViolenceDetectionService(model_path="best.pt", backend="onnx", replicas=2)
+    monkeypatch.setattr(model_registry, "_service", service)
+    return service
+
+
+def test_thread_workers_run_batches_in_parallel(monkeypatch, thread_service):
+    executor = InferenceExecutor("thread", max_workers=2, max_queue_size=8)
+    monkeypatch.setattr(micro_batcher_module, "inference_executor", executor)
+
+    async def scenario():
+        executor.start()
+        batcher = MicroBatcher(max_batch_size=1, max_wait_ms=1, max_queue_size=64)
+        try:
+            return await asyncio.gather(*(batcher.detect(np.zeros((32, 32, 3), np.uint8), DetectionOptions())
+                                          for _ in range(4)))
+        finally:
+            await batcher.stop()
+            executor.shutdown()
+
+    results = asyncio.run(scenario())
+
+    assert len(results) == 4
+    assert _SlowModel.peak == 2
+    assert thread_service._model_count == 2
@@ -0,0 +1,20 @@
+from app.api.services.model_resolver import reloadable_model_path
+from app.core.config import settings
+
+
+def test_reload_paths_must_stay_inside_the_reload_dir(monkeypatch, tmp_path):
+    models = tmp_path / "models"
+    models.mkdir()
+    models = models.resolve()
+    (models / "best.pt").write_bytes(b"weights")
+    (tmp_path / "elsewhere.pt").write_bytes(b"weights")
+    (models / "link.pt").symlink_to(tmp_path / "elsewhere.pt")
+
+    monkeypatch.setattr(settings, "MODEL_RELOAD_DIR", None)
+    assert reloadable_model_path(str(models / "best.pt")) is None
+
+    monkeypatch.setattr(settings, "MODEL_RELOAD_DIR", str(models))
+    assert reloadable_model_path("best.pt") == str(models / "best.pt")
+    assert reloadable_model_path(str(models / "best.pt")) == str(models / "best.pt")
+    for outside in ("../elsewhere.pt", str(tmp_path / "elsewhere.pt"), "link.pt", "/etc/passwd"):
+        assert reloadable_model_path(outside) is None
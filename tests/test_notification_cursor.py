@@ -0,0 +1,158 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, delete, select
+
+from app.api.services.notification_dispatcher import DetectionAlert, NotificationDispatcher
+from app.api.services.notification_hub import decode_cursor, notification_hub, to_payload
+from app.api.services.notification_service import NotificationService
+from app.core.config import settings
+from app.models.notification import Notification
+
+
+def _rows(user_id, count, created_at):
+    return [{"id": uuid.uuid4(), "title": f"n{i}", "body": "b", "is_read": False, "user_id": user_id,
+             "created_at": created_at, "updated_at": created_at} for i in range(count)]
+
+
+def _store(engine, rows):
+    with Session(engine) as db:
+        db.exec(delete(Notification))
+        db.add_all(Notification(**row) for row in rows)
+        db.commit()
+
+
+async def _take(feed, count):
+    return [await asyncio.wait_for(feed.__anext__(), 5) for _ in range(count)]
+
+
+def _live(user_id, since, payloads, count):
+    """Run a feed, publish `payloads` once it is subscribed, and collect `count` notifications."""
+    async def run():
+        notification_hub.start()
+        feed = NotificationService.feed(user_id, since)
+        try:
+            first = asyncio.ensure_future(feed.__anext__())
+            await asyncio.sleep(0.05)
+            notification_hub.publish(payloads)
+            return [await asyncio.wait_for(first, 5)] + await _take(feed, count - 1)
+        finally:
+            await feed.aclose()
+            notification_hub.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trips():
+    payload = to_payload(_rows(uuid.uuid4(), 1, datetime(2025, 1, 2, 3, 4, 5, 678))[0])
+    created_at, notification_id = decode_cursor(payload["cursor"])
+    assert created_at == datetime(2025, 1, 2, 3, 4, 5, 678)
+    assert str(notification_id) == payload["id"]
+
+
+def test_since_pages_through_same_timestamp_rows(db_engine):
+    user_id = uuid.uuid4()
+    now = datetime.now()
+    rows = _rows(user_id, 25, now) + _rows(user_id, 5, now - timedelta(seconds=1))
+    _store(db_engine, rows)
+
+    seen, since = [], None
+    with Session(db_engine) as db:
+        while page := NotificationService._since(user_id, db, since, 7):
+            seen.extend(page)
+            since = to_payload(page[-1].model_dump())["cursor"]
+
+    assert [n.id for n in seen] == [row["id"] for row in sorted(rows, key=lambda r: (r["created_at"], r["id"]))]
+
+
+def test_live_notifications_out_of_cursor_order_are_all_delivered():
+    user_id = uuid.uuid4()
+    # Random ids, so publish order and cursor order disagree
+    payloads = [to_payload(row) for row in _rows(user_id, 200, datetime.now())]
+
+    received = _live(user_id, None, payloads, len(payloads))
+
+    assert [p["id"] for p in received] == [p["id"] for p in payloads]
+
+
+def test_catch_up_then_live_sends_each_notification_once(db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFY_REPLAY_PAGE_SIZE", 4)
+    user_id = uuid.uuid4()
+    now = datetime.now()
+    old = _rows(user_id, 1, now - timedelta(minutes=1))
+    recent = _rows(user_id, 10, now)
+    _store(db_engine, old + recent)
+    # The live copies of rows already replayed must not be sent again
+    live = [to_payload(row) for row in recent] + [to_payload(row) for row in _rows(user_id, 3, now)]
+
+    # The overlap re-sends the notification the cursor points at as well
+    received = _live(user_id, to_payload(old[0])["cursor"], live, 14)
+
+    ids = [p["id"] for p in received]
+    assert len(set(ids)) == 14
+    assert set(ids) == {p["id"] for p in live} | {str(old[0]["id"])}
+
+
+def test_catch_up_reaches_back_for_late_commits(db_engine):
+    user_id = uuid.uuid4()
+    now = datetime.now()
+    seen = _rows(user_id, 1, now)
+    # Another worker stamped this one first but committed it after the client saw `seen`
+    late = _rows(user_id, 1, now - timedelta(milliseconds=200))
+    _store(db_engine, seen + late)
+
+    async def run():
+        notification_hub.start()
+        feed = NotificationService.feed(user_id, to_payload(seen[0])["cursor"])
+        try:
+            return await _take(feed, 2)
+        finally:
+            await feed.aclose()
+            notification_hub.shutdown()
+
+    received = asyncio.run(run())
+    assert {p["id"] for p in received} == {str(late[0]["id"]), str(seen[0]["id"])}
+
+
+def test_dispatcher_rows_are_in_cursor_order(db_engine):
+    owners = [uuid.uuid4() for _ in range(20)]
+    alerts = [DetectionAlert(key=f"k{i}", title="t", body="b", confidence=0.9, detected_at=datetime.now(),
+                             owner_id=owner) for i, owner in enumerate(owners)]
+    with Session(db_engine) as db:
+        rows = NotificationDispatcher._rows(db, alerts)
+
+    keys = [(row["created_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys)
+
+
+def test_dispatcher_retries_alerts_of_a_failed_flush(db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFY_FLUSH_SECONDS", 60.0)
+    owner = uuid.uuid4()
+    dispatcher = NotificationDispatcher()
+    rows = NotificationDispatcher._rows
+    calls = []
+
+    def flaky_rows(db, alerts):
+        calls.append(alerts)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return rows(db, alerts)
+
+    monkeypatch.setattr(NotificationDispatcher, "_rows", staticmethod(flaky_rows))
+    try:
+        alert = DetectionAlert(key="job:1", title="t", body="b", confidence=0.9, detected_at=datetime.now(),
+                               owner_id=owner)
+        assert dispatcher.publish(alert)
+        dispatcher.flush()
+        assert dispatcher.stats()["buffered"] == 1 and dispatcher.failed_flushes == 1
+
+        # Still deduplicated against the alert waiting for its retry
+        assert not dispatcher.publish(alert)
+        dispatcher.flush()
+    finally:
+        dispatcher.shutdown()
+
+    with Session(db_engine) as db:
+        written = db.exec(select(Notification).where(Notification.user_id == owner)).all()
+    assert len(written) == 1 and dispatcher.stats()["published"] == 2
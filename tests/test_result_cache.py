@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from app.core import result_cache as result_cache_module
+from app.core.config import settings
+from app.core.result_cache import ResultCache
+from app.schemas.detection import DetectionOptions
+
+
+@pytest.fixture
+def cache():
+    return ResultCache(max_entries=10, max_bytes=1 << 20, ttl_seconds=60.0, persistent=False)
+
+
+def _key(options: DetectionOptions | None = None, **extra) -> str:
+    return ResultCache.make_key("video", "abc", "model:torch", options or DetectionOptions(), **extra)
+
+
+def test_key_is_stable_and_covers_inputs():
+    assert _key() == _key()
+    assert _key() != ResultCache.make_key("video", "abd", "model:torch", DetectionOptions())
+    assert _key() != ResultCache.make_key("video", "abc", "other:torch", DetectionOptions())
+    assert _key() != _key(DetectionOptions(confidence=0.5))
+    assert _key(output="frames") != _key(output="incidents")
+
+
+@pytest.mark.parametrize("name, value", [
+    ("INCIDENT_GAP_SECONDS", 5.0),
+    ("MOTION_LOW_THRESHOLD", 0.2),
+    ("TRACK_IOU_THRESHOLD", 0.9),
+    ("VIDEO_SEEK_MIN_STRIDE", 1),
+    ("IMAGE_INFERENCE_MODE", "native"),
+])
+def test_key_changes_with_output_settings(monkeypatch, name, value):
+    before = _key()
+    monkeypatch.setattr(settings, name, value)
+    assert _key() != before
+
+
+def test_key_ignores_unrelated_settings(monkeypatch):
+    before = _key()
+    monkeypatch.setattr(settings, "INFERENCE_WORKERS", settings.INFERENCE_WORKERS + 1)
+    assert _key() == before
+
+
+def test_hits_return_copies(cache):
+    asyncio.run(cache.put("image", "k", {"detections": [1]}))
+
+    hit = asyncio.run(cache.get("k"))
+    hit["detections"].append(2)
+
+    assert asyncio.run(cache.get("k")) == {"detections": [1]}
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=10, max_bytes=1 << 20, ttl_seconds=10.0, persistent=False)
+    asyncio.run(cache.put("image", "k", {"ok": True}))
+
+    now[0] += 9.0
+    assert asyncio.run(cache.get("k")) == {"ok": True}
+    now[0] += 2.0
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_entries=2, max_bytes=1 << 20, ttl_seconds=60.0, persistent=False)
+    for key in ("a", "b"):
+        asyncio.run(cache.put("image", key, {"key": key}))
+    asyncio.run(cache.get("a"))
+    asyncio.run(cache.put("image", "c", {"key": "c"}))
+
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a")) == {"key": "a"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_size_bound_is_respected():
+    cache = ResultCache(max_entries=10, max_bytes=100, ttl_seconds=60.0, persistent=False)
+    asyncio.run(cache.put("image", "big", {"data": "x" * 200}))
+    assert asyncio.run(cache.get("big")) is None
+
+    for key in "abcde":
+        asyncio.run(cache.put("image", key, {"data": "x" * 20}))
+    assert cache.stats()["bytes"] <= 100
+
+
+@pytest.mark.parametrize("result", [
+    {"error": "Could not decode image"},
+    {"results": [{"error": "Could not open video file."}], "metadata": {}},
+    {"results": [{"frame": 0, "detections": []}, {"frame": 10, "error": "Inference failed"}], "metadata": {}},
+])
+def test_error_results_are_not_stored(cache, result):
+    asyncio.run(cache.put("video", "k", result))
+
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.stats()["skipped_errors"] == 1
+
+
+@pytest.fixture
+def video_client(monkeypatch, cache):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.routers import violence_detection
+    from app.core.inference_executor import inference_executor
+
+    runs = []
+
+    async def run(method, video_path, options, output):
+        runs.append(video_path)
+        return {"results": [{"frame": 0, "detections": []}],
+                "metadata": {"fps": 25.0, "processed_frames": 1, "timings": {"inference": 1.5}}}
+
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(violence_detection, "result_cache", cache)
+    monkeypatch.setattr(inference_executor, "run", run)
+    monkeypatch.setattr(inference_executor, "model_info",
+                        lambda: {"loaded": True, "sha256": "abc", "model_path": "best.pt", "backend": "torch"})
+    app = FastAPI()
+    app.include_router(violence_detection.router)
+    with TestClient(app, headers={"Authorization": "Bearer token"}) as client:
+        yield client, runs
+
+
+def test_video_hits_report_their_own_timings(video_client):
+    client, runs = video_client
+    upload = {"file": ("clip.mp4", b"\x00" * 2048, "video/mp4")}
+
+    miss = client.post("/video", files=upload, data={"confidence": "0.4"})
+    hit = client.post("/video", files=upload, data={"confidence": "0.4"})
+
+    assert len(runs) == 1
+    assert miss.headers["X-Cache"] == "MISS" and hit.headers["X-Cache"] == "HIT"
+    assert miss.json()["metadata"]["timings"] == {"inference": 1.5}
+    assert not miss.json()["metadata"]["cached"]
+    metadata = hit.json()["metadata"]
+    assert metadata["cached"] and set(metadata["timings"]) == {"cache_lookup"}
+    assert metadata["file_size_mb"] == miss.json()["metadata"]["file_size_mb"]
+    assert hit.json()["results"] == miss.json()["results"]
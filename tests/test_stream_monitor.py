@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlmodel import Session
+
+from app.api.services.stream_monitor_service import StreamMonitor
+from app.core.config import settings
+from app.models.monitored_stream import MonitoredStream
+
+
+def test_crashing_stream_is_held_back_with_growing_delays(db_engine, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_RESTART_SECONDS", 10.0)
+    monitor = StreamMonitor()
+    stream = MonitoredStream(user_id=uuid.uuid4(), name="cam", url="rtsp://camera/stream",
+                             lease_owner=monitor.instance_id, lease_expires_at=datetime.now())
+    with Session(db_engine) as db:
+        db.add(stream)
+        db.commit()
+        stream_id = stream.id
+
+    started = []
+    monkeypatch.setattr(monitor, "start_stream", started.append)
+    delays = []
+    for _ in range(2):
+        monitor._workers[stream_id] = SimpleNamespace(id=stream_id, name="cam", state="failed", exited=True,
+                                                      last_error="boom", started_at=datetime.now())
+        monitor._reap()
+        monitor._claim_available()
+        with Session(db_engine) as db:
+            held = db.get(MonitoredStream, stream_id)
+            assert held.lease_owner == monitor.instance_id
+            delays.append(held.lease_expires_at - datetime.now())
+
+    assert started == []
+    assert timedelta(seconds=8) < delays[0] <= timedelta(seconds=10)
+    assert timedelta(seconds=18) < delays[1] <= timedelta(seconds=20)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app.api.services.tracker import IoUTracker, iou_matrix
+
+
+def _detection(box: list[float], class_id: int = 0, confidence: float = 0.9) -> dict:
+    return {"bbox": box, "class_id": class_id, "class_name": str(class_id), "confidence": confidence}
+
+
+def _result(frame: int, *detections: dict) -> dict:
+    return {"frame": frame, "violence_detected": bool(detections), "confidence": 0.9 if detections else 0.0,
+            "detections": list(detections), "frame_size": {"height": 480, "width": 640}}
+
+
+@pytest.fixture
+def tracker():
+    return IoUTracker(iou_threshold=0.3, centroid_threshold=0.5, max_age=10)
+
+
+def test_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]], dtype=np.float64)
+
+    overlap = iou_matrix(boxes, np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float64))
+
+    np.testing.assert_allclose(overlap, [[1.0, 0.0], [1 / 3, 0.0]])
+
+
+def test_overlapping_boxes_keep_their_track_ids(tracker):
+    results = tracker.process([
+        _result(0, _detection([0, 0, 10, 10]), _detection([100, 100, 110, 110])),
+        _result(1, _detection([101, 101, 111, 111]), _detection([1, 0, 11, 10])),
+    ])
+
+    assert [d["track_id"] for d in results[0]["detections"]] == [1, 2]
+    assert [d["track_id"] for d in results[1]["detections"]] == [2, 1]
+
+
+def test_classes_are_never_matched_across(tracker):
+    results = tracker.process([_result(0, _detection([0, 0, 10, 10], class_id=0)),
+                               _result(1, _detection([0, 0, 10, 10], class_id=1))])
+
+    assert results[1]["detections"][0]["track_id"] == 2
+
+
+def test_centroid_fallback_links_fast_movers(tracker):
+    # No overlap with frame 0, but the centre moved less than half a diagonal
+    results = tracker.process([_result(0, _detection([0, 0, 10, 10])), _result(5, _detection([6, 0, 16, 10]))])
+
+    assert results[1]["detections"][0]["track_id"] == 1
+
+
+def test_tracks_retire_after_max_age():
+    tracker = IoUTracker(iou_threshold=0.3, centroid_threshold=0.5, max_age=5)
+    results = tracker.process([_result(0, _detection([0, 0, 10, 10])), _result(6, _detection([0, 0, 10, 10]))])
+
+    assert results[1]["detections"][0]["track_id"] == 2
+    assert [(t["track_id"], t["first_frame"], t["last_frame"]) for t in tracker.summary()] == [(1, 0, 0), (2, 6, 6)]
+
+
+def test_fill_stride_interpolates_between_inferred_frames():
+    tracker = IoUTracker(iou_threshold=0.3, centroid_threshold=0.5, max_age=10, fill_stride=2)
+    results = tracker.process([_result(0, _detection([0, 0, 10, 10])), _result(6, _detection([6, 0, 16, 10]))])
+
+    assert [r["frame"] for r in results] == [0, 2, 4, 6]
+    assert [r.get("propagated", False) for r in results] == [False, True, True, False]
+    assert [r["detections"][0]["bbox"] for r in results[1:3]] == [[2, 0, 12, 10], [4, 0, 14, 10]]
+    assert {r["detections"][0]["track_id"] for r in results} == {1}
+
+
+def test_errors_pass_through_and_summary_uses_fps(tracker):
+    error = {"frame": 1, "error": "Inference failed"}
+    results = tracker.process([_result(0, _detection([0, 0, 10, 10])), error, _result(5, _detection([0, 0, 10, 10]))])
+
+    assert results[1] is error
+    [track] = tracker.summary(fps=10.0)
+    assert (track["hits"], track["start_seconds"], track["duration_seconds"]) == (2, 0.0, 0.5)
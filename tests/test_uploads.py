@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.exceptions import AppException
+from app.main import app_exception_handler
+from app.middlewares.upload_limit import FORM_OVERHEAD_BYTES, UploadLimitMiddleware
+from app.utils.uploads import receive_upload
+
+MAX_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_BYTES)
+    app.add_exception_handler(AppException, app_exception_handler)
+    received = []
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        stored = await receive_upload(request, directory=str(tmp_path), max_bytes=MAX_BYTES, hash_content=True)
+        received.append(stored)
+        with open(stored.path, "rb") as f:
+            content = f.read()
+        os.unlink(stored.path)
+        return {"filename": stored.filename, "content_type": stored.content_type, "size": stored.size,
+                "sha256": stored.sha256, "fields": stored.fields, "stored": hashlib.sha256(content).hexdigest()}
+
+    client = TestClient(app)
+    client.received = received
+    client.directory = tmp_path
+    return client
+
+
+def test_file_and_fields_are_received(client):
+    content = os.urandom(MAX_BYTES)
+    response = client.post("/upload", files={"file": ("clip.mp4", content, "video/mp4")},
+                           data={"confidence": "0.4", "output": "incidents"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["filename"], body["content_type"], body["size"]) == ("clip.mp4", "video/mp4", MAX_BYTES)
+    assert body["sha256"] == body["stored"] == hashlib.sha256(content).hexdigest()
+    assert body["fields"] == {"confidence": "0.4", "output": "incidents"}
+    assert client.received[0].path.endswith(".mp4")
+
+
+def test_file_over_the_limit_is_rejected_and_removed(client):
+    response = client.post("/upload", files={"file": ("clip.mp4", b"x" * (MAX_BYTES + 1), "video/mp4")})
+
+    assert response.status_code == 413
+    assert list(client.directory.iterdir()) == []
+
+
+def test_missing_file_and_non_multipart_bodies(client):
+    assert client.post("/upload", files={"video": ("clip.mp4", b"x")}).status_code == 422
+    assert client.post("/upload", json={"file": "x"}).status_code == 400
+
+
+def test_declared_length_over_limit_is_rejected_before_the_endpoint(client):
+    response = client.post("/upload", files={"file": ("clip.mp4", b"x" * (MAX_BYTES + FORM_OVERHEAD_BYTES))})
+
+    assert response.status_code == 413
+    assert response.json()["success"] is False
+    assert client.received == []
+
+
+def test_streamed_body_over_limit_is_cut_off(client):
+    def chunks():
+        for _ in range(32):
+            yield b"x" * (64 * 1024)
+
+    response = client.post("/upload", content=chunks(),
+                           headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+    assert response.status_code == 413
+    assert client.received == []
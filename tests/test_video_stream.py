@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from app.api.routers.violence_detection import _CleanupStreamingResponse
+from app.core.exceptions import ServiceOverloadedException
+from app.core.inference_executor import InferenceExecutor
+
+
+def test_unstarted_stream_frees_its_slot_on_close():
+    executor = InferenceExecutor("thread", max_workers=1, max_queue_size=0)
+    items = executor.stream("stream_video", "missing.mp4")
+
+    with pytest.raises(ServiceOverloadedException):
+        executor.stream("stream_video", "missing.mp4")
+    asyncio.run(items.aclose())
+    asyncio.run(items.aclose())
+
+    assert executor.stats()["running"] == 0
+    asyncio.run(executor.stream("stream_video", "missing.mp4").aclose())
+    assert executor.stats()["running"] == 0
+
+
+def test_response_cleans_up_when_client_left_before_the_body():
+    cleaned = []
+
+    async def body():
+        yield "never sent"
+
+    async def cleanup():
+        cleaned.append(True)
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    response = _CleanupStreamingResponse(body(), cleanup, media_type="application/x-ndjson")
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(Exception):
+        asyncio.run(response(scope, receive, send))
+
+    assert cleaned == [True]
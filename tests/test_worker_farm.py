@@ -0,0 +1,28 @@
+import multiprocessing
+import time
+
+from app.core.worker_farm import StreamControl
+
+
+def test_stream_control_keeps_worker_within_window():
+    control = StreamControl(multiprocessing.get_context("spawn"), window=2)
+
+    assert control.wait_for_room(call_id=1, produced=0)
+    assert control.wait_for_room(call_id=1, produced=1)
+    control.consumed(1, 1)
+    assert control.wait_for_room(call_id=1, produced=2)
+    # What the reader of another stream took doesn't count for this one
+    control.consumed(2, 5)
+    control.cancel(1)
+    assert not control.wait_for_room(call_id=1, produced=2)
+
+
+def test_cancel_before_the_stream_starts():
+    control = StreamControl(multiprocessing.get_context("spawn"), window=2)
+    control.cancel(3)
+    time.sleep(0.1)  # the cancel goes through a queue's feeder thread
+
+    assert control.wait_for_room(call_id=2, produced=0)
+    assert control.is_cancelled(3)
+    control.finished(3)
+    assert not control.is_cancelled(3)